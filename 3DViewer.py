@@ -16,11 +16,9 @@ import numpy as np
 import nibabel as nib
 import SimpleITK as sitk
 import setup3D
+import viewerCore
 import PyQt5
 
-from PIL import ImageQt
-from PIL import Image, ImageDraw
-
 from PyQt5.QtCore import Qt, QRectF, pyqtSignal, QT_VERSION_STR, QLineF, QRegExp, QObject, pyqtSignal
 from PyQt5.QtGui import QImage, QPixmap, QPainterPath, QPainter, QPen, QColor, QIntValidator, QTransform
 from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QFileDialog, QGroupBox,\
@@ -160,10 +158,59 @@ def handleLeftClick(x, y):
         horizScrollChange(row)
         vertScrollChange(column)
         
+def linkViews(viewerList, scrollbarList, ortlistList, linkBox):
+    #Linked views show the three orientations, a click in one pane sets the slices of the other two
+    linked = (linkBox.checkState() == 2)
+    for index, viewer in enumerate(viewerList):
+        viewer.setContiguousSlices(linked)
+        if linked:
+            ortlistList[index].setCurrentIndex(index)
+            
+    data = viewerList[0].getImageData()
+    if linked and data is not None:
+        linkedCursor(viewerList, scrollbarList, [n//2 for n in data.shape[:3]])
+    else:
+        for viewer in viewerList:
+            viewer.setLinkedCursor(None)
+            
+def linkedClick(viewer, x, y, viewerList, scrollbarList, linkBox):
+    if(linkBox.checkState() == 2):
+        voxel = viewer.sceneToVoxel(x, y)
+        if voxel is not None:
+            linkedCursor(viewerList, scrollbarList, voxel)
+        
+def linkedCursor(viewerList, scrollbarList, voxel):
+    #The slice scrollbars set the slices, the cursor lines follow once the planes are shown
+    for viewer, scrollbar in zip(viewerList, scrollbarList):
+        scrollbar.setValue(voxel[viewer.sliceAxis(viewer.getImgOrientation())])
+    for viewer in viewerList:
+        viewer.setLinkedCursor(voxel)
+        
+def linkedSlice(viewer, value, viewerList, linkBox):
+    #The cursor lines of the linked views follow the slice set in any pane
+    if(linkBox.checkState() == 2):
+        voxel = viewer.getLinkedCursor()
+        axis = viewer.sliceAxis(viewer.getImgOrientation())
+        if voxel is not None and voxel[axis] != value:
+            voxel = list(voxel)
+            voxel[axis] = value
+            for other in viewerList:
+                other.setLinkedCursor(voxel)
+        
+def hoverChanged(info, hoverLabel):
+    #Voxel under the mouse in any of the panes
+    if info is None:
+        hoverLabel.setText('')
+        return
+    text = 'value %.6g, display %d' % (info['value'], info['display'])
+    if info['index'] is not None:
+        text = '(%d, %d, %d) = ' % tuple(info['index']) + text
+        text += '\n(%.2f, %.2f, %.2f) mm' % tuple(info['position'])
+    hoverLabel.setText(text)
+        
 def slicescrollbarChange(viewer, textbox, value, transparency, saturation):
     
     viewer.setSlice(value)
-    colormap([viewer], transparency, saturation)
     textbox.setText(str(value))    
         
 def slicetextEditChange(viewer, scrollbar, value, transparency, saturation):
@@ -174,8 +221,7 @@ def slicetextEditChange(viewer, scrollbar, value, transparency, saturation):
         value = viewer.getSliceMax()
         
     viewer.setSlice(int(value))
-    colormap([viewer], transparency, saturation)
-    slicescrollbar.setValue(int(value))   
+    scrollbar.setValue(int(value))   
     
 def wlscrollchange(viewerList, value,winlevelText,transparency, saturation):
     wlValue = float(value)
@@ -298,18 +344,18 @@ def vertTextChange():
     verTextbox.setText(str(value))
     verscrollbar.setValue(int(value))  
     
-def colormap(viewerList, transparency, saturation):
-    
+def colormapTable(transparency, saturation):
+    """ Color table of the transparency/saturation colormap for the 8 bit display values.
+    Display values strictly inside the transparency range are colored, fully inside the
+    saturation range and ramping from grey outside it.
+    """
     satLow, satHigh = saturation.value()
-    tranLow, tranHigh = saturation.value()
+    tranLow, tranHigh = transparency.value()
      
     cmapRGB = np.array([245,66,66]) #A pretty nearly red color
      
-    #Calculate number of points in the colormap
     if(tranLow > tranHigh):
         tranHigh = tranLow
-         
-    cmapPoints = int(tranHigh) - int(tranLow)
      
     #Calculate the number of points in the low ramp
     loRampPts = satLow-tranLow
@@ -317,66 +363,38 @@ def colormap(viewerList, transparency, saturation):
     #Calculate the number of points in the high ramp
     hiRampPts = tranHigh-satHigh
  
-    #Build the colormap
-    cmapArray = np.zeros((cmapPoints,3))
-    for cmapIdx in range(cmapPoints):
-        #Compute the gray scale value to which this point corresponds
-        gsValue = cmapIdx+tranLow
+    #Start from grey, only the gray scale values in the range to switch get the colormap
+    gsValue = np.arange(256, dtype=float)
+    table = np.stack([gsValue,gsValue,gsValue],axis=1)
+    inRange = (gsValue>tranLow)&(gsValue<tranHigh)
          
-        #Easy part first--if saturated, put the pure color in
-        if ((gsValue>satLow)and(gsValue<satHigh)):
-            cmapArray[cmapIdx,:] = cmapRGB
+    #Easy part first--if saturated, put the pure color in
+    sat = inRange&(gsValue>satLow)&(gsValue<satHigh)
+    table[sat] = cmapRGB
              
-        #Lower ramp up to saturation
-        elif (gsValue <= satLow):
-            #Cmpute transparency
-            thisAlpha = np.float(cmapIdx) / np.float(loRampPts+0.0001)
-            #Compute weights of gray versus color
-            tmpGS = (1-thisAlpha)*gsValue
-            tmpRGB = (thisAlpha)*cmapRGB
-            #Make the colormap to be the weighted average 
-            #(division by 1 implicit)
-            for idx in range(3):
-                cmapArray[cmapIdx,idx] = int(tmpGS)+tmpRGB[idx]
+    #Lower ramp up to saturation, weighted average of gray versus color
+    low = inRange&(gsValue<=satLow)
+    thisAlpha = (gsValue[low]-tranLow) / float(loRampPts+0.0001)
+    table[low] = np.floor((1-thisAlpha)*gsValue[low])[:,None] + thisAlpha[:,None]*cmapRGB
  
-        #Upper ramp from saturation
-        elif (gsValue >= satHigh):
-            #Compute inverse transparency
-            thisAlpha = np.float(gsValue-satHigh) / hiRampPts
-            #Compute weights of gray versus color
-            tmpGS = (thisAlpha)*gsValue
-            tmpRGB = (1-thisAlpha)*cmapRGB
-            #Make the colormap to be the weighted average 
-            #(division by 1 implicit)
-            for idx in range(3):
-                cmapArray[cmapIdx,idx] = int(tmpGS)+tmpRGB[idx]
-                     
-                     
-        #Go through the image, when the gray scale is in the range to switch, 
-        # insert the colormap
+    #Upper ramp from saturation, with inverse transparency
+    high = inRange&(gsValue>=satHigh)&~low
+    thisAlpha = (gsValue[high]-satHigh) / float(max(hiRampPts,1))
+    table[high] = np.floor(thisAlpha*gsValue[high])[:,None] + (1-thisAlpha)[:,None]*cmapRGB
+    
+    return viewerCore.rgbTable(table)
+    
+def colormap(viewerList, transparency, saturation):
+    #Only the 256 entry color table of each viewer changes, the slices are not redrawn
+    table = colormapTable(transparency, saturation)
+    for viewer in viewerList:
+        viewer.setColorTable(table)
+        
         
+def setPreview(viewerList, value):
+    #Decimated renders while a window scrollbar is dragged, full resolution once released
     for viewer in viewerList:
-        thisImg = viewer.getSliceImageData()
-        imgInt = (thisImg/np.max(thisImg)*255).astype(np.int)
-         
-        imgRGB_Mapped = np.stack([imgInt,imgInt,imgInt],axis=2)
-         
-        for row in range(imgRGB_Mapped.shape[0]):
-            for col in range(imgRGB_Mapped.shape[1]):
-                thisValue = imgRGB_Mapped[row,col,0]
-                if ((thisValue>tranLow)and(thisValue<tranHigh)):
-                    cmapIdx = np.int(thisValue-tranLow)
-                    imgRGB_Mapped[row,col,::] = cmapArray[cmapIdx,::]
-                     
-    
-        im = Image.fromarray((imgRGB_Mapped * 255).astype(np.uint8))
-        data = im.tobytes("raw","RGB")
-        qim = QImage(data, im.size[0], im.size[1], QImage.Format_RGB888)
-        rotate = QTransform()
-        rotate.rotate(270)
-        qimg = qim.transformed(rotate)
-        pix = QPixmap.fromImage(qimg)
-        viewer.setImage(pix)  
+        viewer.setPreview(value)
         
         
 def colormapIncrement(viewerList, transparency, saturation, increment, location, slider):
@@ -408,80 +426,7 @@ def colormapIncrement(viewerList, transparency, saturation, increment, location,
             pass
     
     
-    cmapRGB = np.array([245,66,66]) #A pretty nearly red color
-     
-    #Calculate number of points in the colormap
-    if(tranLow > tranHigh):
-        tranHigh = tranLow
-         
-    cmapPoints = int(tranHigh) - int(tranLow)
-     
-    #Calculate the number of points in the low ramp
-    loRampPts = satLow-tranLow
-     
-    #Calculate the number of points in the high ramp
-    hiRampPts = tranHigh-satHigh
- 
-    #Build the colormap
-    cmapArray = np.zeros((cmapPoints,3))
-    for cmapIdx in range(cmapPoints):
-        #Compute the gray scale value to which this point corresponds
-        gsValue = cmapIdx+tranLow
-         
-        #Easy part first--if saturated, put the pure color in
-        if ((gsValue>satLow)and(gsValue<satHigh)):
-            cmapArray[cmapIdx,:] = cmapRGB
-             
-        #Lower ramp up to saturation
-        elif (gsValue <= satLow):
-            #Cmpute transparency
-            thisAlpha = np.float(cmapIdx) / np.float(loRampPts+0.0001)
-            #Compute weights of gray versus color
-            tmpGS = (1-thisAlpha)*gsValue
-            tmpRGB = (thisAlpha)*cmapRGB
-            #Make the colormap to be the weighted average 
-            #(division by 1 implicit)
-            for idx in range(3):
-                cmapArray[cmapIdx,idx] = int(tmpGS)+tmpRGB[idx]
- 
-        #Upper ramp from saturation
-        elif (gsValue >= satHigh):
-            #Compute inverse transparency
-            thisAlpha = np.float(gsValue-satHigh) / hiRampPts
-            #Compute weights of gray versus color
-            tmpGS = (thisAlpha)*gsValue
-            tmpRGB = (1-thisAlpha)*cmapRGB
-            #Make the colormap to be the weighted average 
-            #(division by 1 implicit)
-            for idx in range(3):
-                cmapArray[cmapIdx,idx] = int(tmpGS)+tmpRGB[idx]
-                     
-                     
-        #Go through the image, when the gray scale is in the range to switch, 
-        # insert the colormap
-        
-    for viewer in viewerList:
-        thisImg = viewer.getSliceImageData()
-        imgInt = (thisImg/np.max(thisImg)*255).astype(np.int)
-         
-        imgRGB_Mapped = np.stack([imgInt,imgInt,imgInt],axis=2)
-         
-        for row in range(imgRGB_Mapped.shape[0]):
-            for col in range(imgRGB_Mapped.shape[1]):
-                thisValue = imgRGB_Mapped[row,col,0]
-                if ((thisValue>satLow)and(thisValue<satHigh)):
-                    cmapIdx = np.int(thisValue-satLow)
-                    imgRGB_Mapped[row,col,::] = cmapArray[cmapIdx,::]
-                     
-    
-        im = Image.fromarray((imgRGB_Mapped * 255).astype(np.uint8))
-        data = im.tobytes("raw","RGB")
-        qim = QImage(data, im.size[0], im.size[1], QImage.Format_RGB888)
-        rotate = QTransform()
-        rotate.rotate(270)
-        qimg = qim.transformed(rotate)
-        pix = QPixmap.fromImage(qimg)
-        viewer.setImage(pix)       
+    colormap(viewerList, transparency, saturation)
         
 def saveData(wl, ww, transparency, saturation):
     f = open('currentState.txt', 'w')
@@ -562,6 +507,10 @@ def main(leftFile):
     crosshairsBox1 = QCheckBox()
     crosshairsBox1.setText('Enable Crosshairs')
     crosshairsBox1.setCheckState(0)
+    linkBox = QCheckBox()
+    linkBox.setText('Link Views')
+    linkBox.setCheckState(0)
+    hoverLabel = QLabel()
     
     # -----------------------------------------------
     saveBtn = QPushButton()
@@ -788,6 +737,9 @@ def main(leftFile):
     
     winlevelScrollbar.valueChanged.connect(lambda: wlscrollchange(viewerList, winlevelScrollbar.value(),winlevelText,transparency, saturation))
     winwidthScrollbar.valueChanged.connect(lambda: wwscrollchange(viewerList, winwidthScrollbar.value(),winwidthText,transparency, saturation))
+    for scrollbar in (winlevelScrollbar, winwidthScrollbar):
+        scrollbar.sliderPressed.connect(lambda: setPreview(viewerList, True))
+        scrollbar.sliderReleased.connect(lambda: setPreview(viewerList, False))
     
     winlevelText.returnPressed.connect(lambda: wltextchange(viewerList, winlevelText.text(),winlevelText,transparency, saturation))
     winwidthText.returnPressed.connect(lambda: wwtextchange(viewerList, winwidthText.text(),winwidthText,transparency, saturation))
@@ -803,6 +755,14 @@ def main(leftFile):
     
     crosshairsBox1.toggled.connect(enableCrosshair)
     
+    scrollbarList = [slicescrollbar1, slicescrollbar2, slicescrollbar3]
+    linkBox.toggled.connect(lambda: linkViews(viewerList, scrollbarList, [ortlist1, ortlist2, ortlist3], linkBox))
+    for viewer, scrollbar in zip(viewerList, scrollbarList):
+        viewer.leftMouseButtonPressed.connect(lambda x, y, viewer=viewer: linkedClick(viewer, x, y, viewerList, scrollbarList, linkBox))
+        scrollbar.valueChanged.connect(lambda value, viewer=viewer: linkedSlice(viewer, value, viewerList, linkBox))
+        viewer.hoverChanged.connect(lambda info: hoverChanged(info, hoverLabel))
+        viewer.setHoverReadout(True)
+    
     
     horscrollbar.valueChanged.connect(horizScrollChange)
     horTextbox.returnPressed.connect(horizTextChange) 
@@ -914,6 +874,8 @@ def main(leftFile):
     vlayout.addWidget(transGroupBox)
     vlayout.addSpacing(10)
     vlayout.addWidget(crosshairsBox1)  
+    vlayout.addWidget(linkBox)
+    vlayout.addWidget(hoverLabel)
     vlayout.addSpacing(10)      
     vlayout.addLayout(layoutbtm)
     vlayout.addStretch(1)
@@ -10,8 +10,6 @@ import sys
 import argparse
 
 import numpy as np
-import nibabel as nib
-import SimpleITK as sitk
 import CompareSetup
 import PyQt5
 
@@ -102,6 +100,7 @@ def btn1Click():
       
     
     openFileText1.setText(fileName)
+    refreshComparison()
     
     
 def btn2Click():          
@@ -158,7 +157,10 @@ def btn2Click():
     verscrollbar.setValue(viewer2.getVertVal())
     verscrollbar.setPageStep(1)
     
+    viewer1.setCompareMode(viewer1.getCompareMode(), viewer2.getImageData())
+    
     openFileText2.setText(fileName)
+    refreshComparison()
     
     
     
@@ -223,6 +225,7 @@ def slicescrollbarChange(value):
     
     viewer1.setSlice(value)
     viewer2.setSlice(value)
+    viewer1.setMetricsSlice(value)
     slicesTextbox.setText(str(value))     
         
 def slicetextEditChange():
@@ -320,6 +323,7 @@ def ortChange(value):
     
     viewer1.setSliceOrientation(value+1)
     viewer2.setSliceOrientation(value+1)
+    refreshComparison()
     
     if (viewer1._pixmapHandle is not None): 
         slicescrollbar.setMaximum(viewer1.getSliceMax())
@@ -408,6 +412,39 @@ def vertTextChange():
     verscrollbar.setValue(int(value))  
 
 
+def compareModeChange(value):
+    global viewer1
+    global viewer2
+    
+    viewer1.setCompareMode(CompareSetup.COMPARE_MODES[value], viewer2.getImageData())
+    
+def compareSlicesClick():
+    global viewer1
+    global viewer2
+    
+    viewer1.startComparison(viewer2.getImageData())
+    
+def refreshComparison():
+    global viewer1
+    global viewer2
+    
+    # the curves follow the loaded volumes and the slice orientation while they are shown
+    if viewer1.isComparisonShown():
+        viewer1.startComparison(viewer2.getImageData())
+    
+def sliceSelected(value):
+    global slicescrollbar
+    
+    slicescrollbar.setValue(value)
+    
+def blendAlphaChange(value):
+    global viewer1
+    global blendAlphaText
+    
+    viewer1.setBlendAlpha(value/100.0)
+    blendAlphaText.setText(str(value/100.0))
+
+
 #------------------------------------------------------------
 # Main
 #------------------------------------------------------------
@@ -433,6 +470,7 @@ def main(leftFile, rightFile):
     global slicesTextbox
     global verTextbox
     global horTextbox
+    global blendAlphaText
     global window
 
 
@@ -590,6 +628,28 @@ def main(leftFile, rightFile):
     ortlist.addItem('Dim 1 vs Dim 3')
     ortlist.addItem('Dim 2 vs Dim 3')
     
+    # -----------------------------------------------
+    # comparison render mode, drawn in the left viewer
+    comparelist = QComboBox()
+    for mode in CompareSetup.COMPARE_MODES:
+        comparelist.addItem(mode)
+        
+    blendAlphaLabel = QLabel()
+    blendAlphaLabel.setText('Blend Alpha')
+    blendAlphaText = QLineEdit()
+    blendAlphaText.setFixedSize(50, 20)
+    blendAlphaText.setText('0.5')
+    blendAlphaScrollbar = QScrollBar()
+    blendAlphaScrollbar.setOrientation(1)
+    blendAlphaScrollbar.setMinimum(0)
+    blendAlphaScrollbar.setMaximum(100)
+    blendAlphaScrollbar.setPageStep(1)
+    blendAlphaScrollbar.setValue(50)
+    
+    compareSlicesBtn = QPushButton()
+    compareSlicesBtn.setText('Compare Slices')
+    compareSlicesBtn.setToolTip('Plot per-slice RMSE, MAE, correlation and SSIM, click a curve to go to its slice')
+    
     # -----------------------------------------------
     openFileBtn1.clicked.connect(btn1Click)
     openFileBtn2.clicked.connect(btn2Click)
@@ -601,6 +661,10 @@ def main(leftFile, rightFile):
     winwidthText.returnPressed.connect(wwtextchange)  
     ortlist.currentIndexChanged.connect(ortChange)
     crosshairsBox1.toggled.connect(enableCrosshair)
+    comparelist.currentIndexChanged.connect(compareModeChange)
+    blendAlphaScrollbar.valueChanged.connect(blendAlphaChange)
+    compareSlicesBtn.clicked.connect(compareSlicesClick)
+    viewer1.sliceSelected.connect(sliceSelected)
     
     
     horscrollbar.valueChanged.connect(horizScrollChange)
@@ -642,6 +706,16 @@ def main(leftFile, rightFile):
     layouts.addWidget(slicescrollbar)
     sliceGroupBox.setLayout(layouts)
     
+    compareGroupBox = QGroupBox("Compare")
+    layoutc = QGridLayout()
+    layoutc.setColumnStretch(1, 4)
+    layoutc.addWidget(comparelist, 0, 0, 1, 3)
+    layoutc.addWidget(blendAlphaLabel, 1, 0)
+    layoutc.addWidget(blendAlphaScrollbar, 1, 1)
+    layoutc.addWidget(blendAlphaText, 1, 2)
+    layoutc.addWidget(compareSlicesBtn, 2, 0, 1, 3)
+    compareGroupBox.setLayout(layoutc)
+    
     vlayout.addLayout(layoutop) 
     vlayout.addSpacing(20)
     vlayout.addWidget(displayGroupBox)
@@ -650,6 +724,8 @@ def main(leftFile, rightFile):
     vlayout.addSpacing(10)
     vlayout.addWidget(ortlist)
     vlayout.addSpacing(10)
+    vlayout.addWidget(compareGroupBox)
+    vlayout.addSpacing(10)
     vlayout.addWidget(crosshairsBox1)        
     vlayout.addStretch(1)
     vlayout.addSpacing(20)
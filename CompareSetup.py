@@ -7,215 +7,135 @@ QtImageViewer.py: PyQt image viewer widget for a QPixmap in a QGraphicsView scen
 import os.path
 import os
 import sys
-import ViewImage
 
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import nibabel as nib
-import SimpleITK as sitk
+import volumeCache
+import compareMetrics
+import viewerCore
 import PyQt5
 
-from PyQt5.QtCore import Qt, QRectF, pyqtSignal, QT_VERSION_STR, QLineF, QRegExp
+from PyQt5.QtCore import Qt, QRectF, pyqtSignal, QT_VERSION_STR, QLineF, QRegExp, QTimer
 from PyQt5.QtGui import QImage, QPixmap, QPainterPath, QPainter, QPen, QColor, QIntValidator, QTransform, QBrush
 from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QFileDialog, QGroupBox,\
                             QHBoxLayout, QVBoxLayout, QGridLayout, QWidget, QLineEdit,QPushButton,\
                             QGraphicsLineItem, QScrollBar, QCheckBox, QComboBox, QAbstractItemView, QLabel
 from PyQt5.QtWidgets import QApplication
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
-from matplotlib.figure import Figure
+
+# SimpleITK, dicomLoader and matplotlib are imported where they are first used,
+# keeping them out of the viewer startup.
 
 __author__ = ""
 __version__ = ""
 
+# Comparison render modes, in the order they are offered by CompareImages.
+COMPARE_MODES = ['Side by Side', 'Difference', 'Absolute Difference', 'Checkerboard',
+                 'Alpha Blend', 'Red/Green Fusion']
 
-class CrosshairWindow(FigureCanvasQTAgg):
+# Titles of the per-slice comparison curves and how often the popup shows new results.
+METRIC_TITLES = {'rmse': 'RMSE', 'mae': 'MAE', 'correlation': 'Correlation', 'ssim': 'SSIM'}
+METRICS_INTERVAL_MS = 200
 
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        self.fig = Figure(figsize=(width, height), dpi=dpi)
-        self.axes1 = self.fig.add_subplot(211)
-        self.axes1.set_title("Vertical Profile")
-        self.axes2 = self.fig.add_subplot(212)
-        self.axes2.set_title("Horizontal Profile")
-        self.fig.subplots_adjust(hspace=0.8)
-        super(CrosshairWindow, self).__init__(self.fig)
-        
-class ThruPlaneWindow(FigureCanvasQTAgg):
 
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        self.fig2 = Figure(figsize=(width, height), dpi=dpi)
-        self.plt1 = self.fig2.add_subplot(321)
-        self.plt2 = self.fig2.add_subplot(322)
-        
-        self.plt1_2 = self.fig2.add_subplot(323)
-        self.plt2_2 = self.fig2.add_subplot(324)
-        
-        self.plt3 = self.fig2.add_subplot(313)
-        
-        self.fig2.subplots_adjust(hspace=0.8, wspace=0.5)
-            
+_popupWindows = {}
 
-        super(ThruPlaneWindow, self).__init__(self.fig2)
 
+def popupWindows():
+    """ Returns the CrosshairWindow, ThruPlaneWindow and MetricsWindow canvas classes.
+    They are built the first time a popup is opened, so matplotlib is only imported then.
+    """
+    if not _popupWindows:
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+        from matplotlib.figure import Figure
 
+        class CrosshairWindow(FigureCanvasQTAgg):
 
-class QtImageViewer(QGraphicsView):
-    """ PyQt image viewer widget for a QPixmap in a QGraphicsView scene with mouse zooming and panning.
+            def __init__(self, parent=None, width=5, height=4, dpi=100):
+                self.fig = Figure(figsize=(width, height), dpi=dpi)
+                self.axes1 = self.fig.add_subplot(211)
+                self.axes1.set_title("Vertical Profile")
+                self.axes2 = self.fig.add_subplot(212)
+                self.axes2.set_title("Horizontal Profile")
+                self.fig.subplots_adjust(hspace=0.8)
+                super(CrosshairWindow, self).__init__(self.fig)
 
-    Displays a QImage or QPixmap (QImage is internally converted to a QPixmap).
-    To display any other image format, you must first convert it to a QImage or QPixmap.
+        class ThruPlaneWindow(FigureCanvasQTAgg):
 
-    Some useful image format conversion utilities:
-        qimage2ndarray: NumPy ndarray <==> QImage    (https://github.com/hmeine/qimage2ndarray)
-        ImageQt: PIL Image <==> QImage  (https://github.com/python-pillow/Pillow/blob/master/PIL/ImageQt.py)
+            def __init__(self, parent=None, width=5, height=4, dpi=100):
+                self.fig2 = Figure(figsize=(width, height), dpi=dpi)
+                self.plt1 = self.fig2.add_subplot(321)
+                self.plt2 = self.fig2.add_subplot(322)
 
-    Mouse interaction:
-        Left mouse button drag: Pan image.
-        Right mouse button drag: Zoom box.
-        Right mouse button doubleclick: Zoom to show entire image.
-    """
+                self.plt1_2 = self.fig2.add_subplot(323)
+                self.plt2_2 = self.fig2.add_subplot(324)
 
-    # Mouse button signals emit image scene (x, y) coordinates.
-    # !!! For image (row, column) matrix indexing, row = y and column = x.
-    leftMouseButtonPressed = pyqtSignal(float, float)
-    rightMouseButtonPressed = pyqtSignal(float, float)
-    leftMouseButtonReleased = pyqtSignal(float, float)
-    rightMouseButtonReleased = pyqtSignal(float, float)
-    leftMouseButtonDoubleClicked = pyqtSignal(float, float)
-    rightMouseButtonDoubleClicked = pyqtSignal(float, float)
-    
-    def __init__(self):
-        QGraphicsView.__init__(self)
+                self.plt3 = self.fig2.add_subplot(313)
 
-        # Image is displayed as a QPixmap in a QGraphicsScene attached to this QGraphicsView.
-        self.scene = QGraphicsScene()
-        self.setScene(self.scene)
-        
-        
-#         scene = QGraphicsScene()
-#         view = QGraphicsView(scene)
-#         view.show()
-        
-        
-        #set the focus to this viewer
-        self.setFocusPolicy(Qt.StrongFocus)
+                self.fig2.subplots_adjust(hspace=0.8, wspace=0.5)
 
-        # Store a local handle to the scene's current image pixmap.
-        self._pixmapHandle = None
 
-        # Image aspect ratio mode.
-        # !!! ONLY applies to full image. Aspect ratio is always ignored when zooming.
-        #   Qt.IgnoreAspectRatio: Scale image to fit viewport.
-        #   Qt.KeepAspectRatio: Scale image to fit inside viewport, preserving aspect ratio.
-        #   Qt.KeepAspectRatioByExpanding: Scale image to fill the viewport, preserving aspect ratio.
-        self.aspectRatioMode = Qt.KeepAspectRatio
+                super(ThruPlaneWindow, self).__init__(self.fig2)
 
-        # Scroll bar behaviour.
-        #   Qt.ScrollBarAlwaysOff: Never shows a scroll bar.
-        #   Qt.ScrollBarAlwaysOn: Always shows a scroll bar.
-        #   Qt.ScrollBarAsNeeded: Shows a scroll bar only when zoomed.
-        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
 
-        # Stack of QRectF zoom boxes in scene coordinates.
-        self.zoomStack = []
-        
-        # -------------------
-        self.__fileName = None
-        self.__imageData = None
-        self.__pixeldims = None
-        self.__pixelspacing = None
-        self.__imgorientation = 1
-        self.__curSlice = 0
-        
-        # -------------------
-        self.__crossshow = False
-        self.__lineX = QLineF()
-        self.__lineY = QLineF() 
-        
-        # -------------------
-        self.__crosshair = 0
-        self.__thruPlane = 0
-        self.__vert = 0
-        self.__horiz = 0
-        self.__flipX = False
-        self.__flipY = False
-        self.__rotateAngle = 270
-        
-        # -------------------
-        self.__winlevel = 0
-        self.__winwidth = 256
+        class MetricsWindow(FigureCanvasQTAgg):
 
-        # Flags for enabling/disabling mouse interaction.
-        self.canZoom = True
-        self.canPan = True
+            def __init__(self, parent=None, width=6, height=7, dpi=100):
+                self.fig = Figure(figsize=(width, height), dpi=dpi)
+                self.axes = []
+                for i, name in enumerate(compareMetrics.METRICS):
+                    sharex = self.axes[0] if self.axes else None
+                    self.axes.append(self.fig.add_subplot(len(compareMetrics.METRICS), 1, i+1, sharex=sharex))
+                self.fig.subplots_adjust(hspace=0.8)
+                super(MetricsWindow, self).__init__(self.fig)
 
-    def hasImage(self):
-        """ Returns whether or not the scene contains an image pixmap.
-        """
-        return self._pixmapHandle is not None
+        _popupWindows['CrosshairWindow'] = CrosshairWindow
+        _popupWindows['ThruPlaneWindow'] = ThruPlaneWindow
+        _popupWindows['MetricsWindow'] = MetricsWindow
+    return _popupWindows['CrosshairWindow'], _popupWindows['ThruPlaneWindow'], _popupWindows['MetricsWindow']
 
-    def clearImage(self):
-        """ Removes the current image pixmap from the scene if it exists.
-        """
-        if self.hasImage():
-            self.scene.removeItem(self._pixmapHandle)
-            self._pixmapHandle = None
 
-    def pixmap(self):
-        """ Returns the scene's current image pixmap as a QPixmap, or else None if no image exists.
-        :rtype: QPixmap | None
-        """
-        if self.hasImage():
-            return self._pixmapHandle.pixmap()
-        return None
+class QtImageViewer(viewerCore.ViewerCore):
+    """ Image viewer that shows a volume against a second volume of the same shape,
+    see COMPARE_MODES. See viewerCore.ViewerCore for the shared viewer.
+    """
 
-    def image(self):
-        """ Returns the scene's current image pixmap as a QImage, or else None if no image exists.
-        :rtype: QImage | None
-        """
-        if self.hasImage():
-            return self._pixmapHandle.pixmap().toImage()
-        return None
-
-    def setImage(self, image):
-        """ Set the scene's current image pixmap to the input QImage or QPixmap.
-        Raises a RuntimeError if the input image has type other than QImage or QPixmap.
-        :type image: QImage | QPixmap
-        """
-        if type(image) is QPixmap:
-            pixmap = image
-        elif type(image) is QImage:
-            pixmap = QPixmap.fromImage(image)
-        else:
-            raise RuntimeError("ImageViewer.setImage: Argument must be a QImage or QPixmap.")
-        
-        if self.hasImage():
-            self._pixmapHandle.setPixmap(pixmap)
-        else:
-            self._pixmapHandle = self.scene.addPixmap(pixmap)
-            
-        self.setSceneRect(QRectF(pixmap.rect()))  # Set scene size to image size.
-#         self.setSliceOrientation(self.__imgorientation)
-        self.updateViewer()
+    # Emitted with the slice picked on the comparison curves.
+    sliceSelected = pyqtSignal(int)
+    
+    def __init__(self):
+        viewerCore.ViewerCore.__init__(self)
         
+        # -------------------
+        self.__compareData = None
+        self.__compareMode = COMPARE_MODES[0]
+        self.__blendAlpha = 0.5
+        self.__checkerSize = 32
+        self.__checkerMask = None
         
+        # -------------------
+        self.__comparison = None
+        self.__metricsWindow = None
+        self.__metricsLines = []
+        self.__metricsTimer = QTimer(self)
+        self.__metricsTimer.setInterval(METRICS_INTERVAL_MS)
+        self.__metricsTimer.timeout.connect(self.updateMetricsPopup)
+
     def buildCrosshairPopup(self, data):
+        CrosshairWindow, ThruPlaneWindow, MetricsWindow = popupWindows()
         self.ch = CrosshairWindow(self, width=5, height=4, dpi=100)
 
-        if self.__imgorientation == 1:
-            horizArr = self.__imageData[:,0,self.getCurSlice()]
-            vertArr = self.__imageData[0,:,self.getCurSlice()]
+        if self._imgorientation == 1:
+            horizArr = self._imageData[:,0,self.getCurSlice()]
+            vertArr = self._imageData[0,:,self.getCurSlice()]
             horizArr2 = data[:,0,self.getCurSlice()]
             vertArr2 = data[0,:,self.getCurSlice()]
-        elif self.__imgorientation == 2:   
-            horizArr = self.__imageData[:,self.getCurSlice(),0]
-            vertArr = self.__imageData[0,self.getCurSlice(),:]
+        elif self._imgorientation == 2:   
+            horizArr = self._imageData[:,self.getCurSlice(),0]
+            vertArr = self._imageData[0,self.getCurSlice(),:]
             horizArr2 = data[:,self.getCurSlice(),0]
             vertArr2 = data[0,self.getCurSlice(),:]
-        elif self.__imgorientation == 3:
-            horizArr = self.__imageData[self.getCurSlice(),:,0]
-            vertArr = self.__imageData[self.getCurSlice(),0,:]
+        elif self._imgorientation == 3:
+            horizArr = self._imageData[self.getCurSlice(),:,0]
+            vertArr = self._imageData[self.getCurSlice(),0,:]
             horizArr2 = data[self.getCurSlice(),:,0]
             vertArr2 = data[self.getCurSlice(),0,:]
         else:
@@ -236,29 +156,10 @@ class QtImageViewer(QGraphicsView):
         
         
             
-    def clearCrosshairPopup(self):
-        self.ch.close()
-        self.__crosshair = 0
-        self.scene.removeItem(self.HLine)
-        self.scene.removeItem(self.VLine)
-        self.setHorizVal(0)
-        self.setVertVal(0)
-        if(self.__thruPlane == 2):
-            self.__thruPlane = 0
-            self.tp.close()
-            
-    def clearCrosshairs(self):
-        self.scene.removeItem(self.HLine)
-        self.scene.removeItem(self.VLine)
-        self.setHorizVal(0)
-        self.setVertVal(0)
-        if(self.__thruPlane == 2):
-            self.__thruPlane = 0
-        
     def setCrosshair(self, value, data):
         
-        if self.__imageData is not None:
-            self.__crosshair = value
+        if self._imageData is not None:
+            self._crosshair = value
             if(value == 2):
                 self.buildCrosshairPopup(data)
             else:
@@ -268,28 +169,29 @@ class QtImageViewer(QGraphicsView):
         
             
     def buildThruPlanePopup(self, data):
+        CrosshairWindow, ThruPlaneWindow, MetricsWindow = popupWindows()
         self.tp = ThruPlaneWindow(self, width=5, height=4, dpi=100)
 
-        if self.__imgorientation == 1:
-            data1 = np.rot90(self.__imageData[:,self.getHorizVal(),:])
-            data2 = np.rot90(self.__imageData[self.getVertVal(),:,:]) 
+        if self._imgorientation == 1:
+            data1 = np.rot90(self._imageData[:,self.getHorizVal(),:])
+            data2 = np.rot90(self._imageData[self.getVertVal(),:,:]) 
             data1_2 = np.rot90(data[:,self.getHorizVal(),:])
             data2_2 = np.rot90(data[self.getVertVal(),:,:]) 
-            data3 = self.__imageData[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
+            data3 = self._imageData[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
             data3_2 = data[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
-        elif self.__imgorientation == 2:
-            data1 = np.rot90(self.__imageData[:,:,self.getHorizVal()])
-            data2 = np.rot90(self.__imageData[self.getVertVal(),:,:])
+        elif self._imgorientation == 2:
+            data1 = np.rot90(self._imageData[:,:,self.getHorizVal()])
+            data2 = np.rot90(self._imageData[self.getVertVal(),:,:])
             data1_2 = np.rot90(data[:,:,self.getHorizVal()])
             data2_2 = np.rot90(data[self.getVertVal(),:,:])
-            data3 = self.__imageData[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
+            data3 = self._imageData[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
             data3_2 = data[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
-        elif self.__imgorientation == 3:
-            data1 = np.rot90(self.__imageData[:,:,self.getHorizVal()])
-            data2 = np.rot90(self.__imageData[:,self.getVertVal(),:])
+        elif self._imgorientation == 3:
+            data1 = np.rot90(self._imageData[:,:,self.getHorizVal()])
+            data2 = np.rot90(self._imageData[:,self.getVertVal(),:])
             data1_2 = np.rot90(data[:,:,self.getHorizVal()])
             data2_2 = np.rot90(data[:,self.getVertVal(),:])
-            data3 = self.__imageData[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
+            data3 = self._imageData[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
             data3_2 = data[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
 
 
@@ -312,26 +214,26 @@ class QtImageViewer(QGraphicsView):
         
         
     def updateThroughPlane(self, data):
-        if self.__imgorientation == 1:
-            data1 = np.rot90(self.__imageData[:,self.getHorizVal(),:])
-            data2 = np.rot90(self.__imageData[self.getVertVal(),:,:]) 
+        if self._imgorientation == 1:
+            data1 = np.rot90(self._imageData[:,self.getHorizVal(),:])
+            data2 = np.rot90(self._imageData[self.getVertVal(),:,:]) 
             data1_2 = np.rot90(data[:,self.getHorizVal(),:])
             data2_2 = np.rot90(data[self.getVertVal(),:,:]) 
-            data3 = self.__imageData[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
+            data3 = self._imageData[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
             data3_2 = data[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
-        elif self.__imgorientation == 2:
-            data1 = np.rot90(self.__imageData[:,:,self.getHorizVal()])
-            data2 = np.rot90(self.__imageData[self.getVertVal(),:,:])
+        elif self._imgorientation == 2:
+            data1 = np.rot90(self._imageData[:,:,self.getHorizVal()])
+            data2 = np.rot90(self._imageData[self.getVertVal(),:,:])
             data1_2 = np.rot90(data[:,:,self.getHorizVal()])
             data2_2 = np.rot90(data[self.getVertVal(),:,:])
-            data3 = self.__imageData[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
+            data3 = self._imageData[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
             data3_2 = data[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
-        elif self.__imgorientation == 3:
-            data1 = np.rot90(self.__imageData[:,:,self.getHorizVal()])
-            data2 = np.rot90(self.__imageData[:,self.getVertVal(),:])
+        elif self._imgorientation == 3:
+            data1 = np.rot90(self._imageData[:,:,self.getHorizVal()])
+            data2 = np.rot90(self._imageData[:,self.getVertVal(),:])
             data1_2 = np.rot90(data[:,:,self.getHorizVal()])
             data2_2 = np.rot90(data[:,self.getVertVal(),:])
-            data3 = self.__imageData[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
+            data3 = self._imageData[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
             data3_2 = data[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
 
         
@@ -357,12 +259,8 @@ class QtImageViewer(QGraphicsView):
         self.tp.draw()
         
     
-    def clearThruPlanePopup(self):
-        self.tp.close()
-            
-            
     def setThruPlane(self, value, data):
-        self.__thruPlane = value
+        self._thruPlane = value
         if(value == 2):
             self.buildThruPlanePopup(data)
         else:
@@ -371,14 +269,14 @@ class QtImageViewer(QGraphicsView):
     def updateVerticalProfile(self, value, data):
         self.setVertVal(value)
         
-        if self.__imgorientation == 1:
-            vertArr = self.__imageData[value,:,self.getCurSlice()]
+        if self._imgorientation == 1:
+            vertArr = self._imageData[value,:,self.getCurSlice()]
             vertArr2 = data[value,:,self.getCurSlice()]
-        elif self.__imgorientation == 2:   
-            vertArr = self.__imageData[value,self.getCurSlice(),:]
+        elif self._imgorientation == 2:   
+            vertArr = self._imageData[value,self.getCurSlice(),:]
             vertArr2 = data[value,self.getCurSlice(),:]
-        elif self.__imgorientation == 3:
-            vertArr = self.__imageData[self.getCurSlice(),value,:]
+        elif self._imgorientation == 3:
+            vertArr = self._imageData[self.getCurSlice(),value,:]
             vertArr2 = data[self.getCurSlice(),value,:]
         else:
             print("ERROR: Invlaid plane")
@@ -391,7 +289,7 @@ class QtImageViewer(QGraphicsView):
         self.ch.axes1.legend(loc='upper right')
         self.ch.draw()
         
-        if(self.__thruPlane == 2):
+        if(self._thruPlane == 2):
             self.updateThroughPlane(data)
         
         self.display_VertLine(value)
@@ -399,14 +297,14 @@ class QtImageViewer(QGraphicsView):
     def updateHorizontalProfile(self, value, data):
         self.setHorizVal(value)
         
-        if self.__imgorientation == 1:
-            horizArr = self.__imageData[:,self.getImgHeight()-1-value,self.getCurSlice()]
+        if self._imgorientation == 1:
+            horizArr = self._imageData[:,self.getImgHeight()-1-value,self.getCurSlice()]
             horizArr2 = data[:,self.getImgHeight()-1-value,self.getCurSlice()]
-        elif self.__imgorientation == 2:   
-            horizArr = self.__imageData[:,self.getCurSlice(),self.getImgHeight()-1-value]
+        elif self._imgorientation == 2:   
+            horizArr = self._imageData[:,self.getCurSlice(),self.getImgHeight()-1-value]
             horizArr2 = data[:,self.getCurSlice(),self.getImgHeight()-1-value]
-        elif self.__imgorientation == 3:
-            horizArr = self.__imageData[self.getCurSlice(),:,self.getImgHeight()-1-value]
+        elif self._imgorientation == 3:
+            horizArr = self._imageData[self.getCurSlice(),:,self.getImgHeight()-1-value]
             horizArr2 = data[self.getCurSlice(),:,self.getImgHeight()-1-value]
         else:
             print("ERROR: Invlaid plane")
@@ -418,88 +316,170 @@ class QtImageViewer(QGraphicsView):
         self.ch.axes2.legend(loc='upper right')
         self.ch.draw()
         
-        if(self.__thruPlane == 2):
+        if(self._thruPlane == 2):
             self.updateThroughPlane(data)
         self.display_HorizLine(value)
         
          
-    def display_VertLine(self, value):
-        try:
-            self.scene.removeItem(self.VLine)
-        except:
-            pass
-        self.VLine = self.scene.addLine(value, 0, value, self.getImgHeight(), QPen(Qt.red))
-    
-         
-    def display_HorizLine(self, value):
-        try:
-            self.scene.removeItem(self.HLine)
-        except:
-            pass
-        self.HLine = self.scene.addLine(0, value, self.getImgWidth(), value, QPen(Qt.green))
-
-        
-    def getHorizVal(self):
-        return self.__horiz
-    
-    def getVertVal(self):
-        return self.__vert
-        
-    def setHorizVal(self, value):
-        self.__horiz = value
+    def compareProcessing(self, left, right, checker=None):
+        """ Combine two slices of the same shape into one display image for the current compare mode.
+        Returns an 8-bit grey image, or an RGB image (height x width x 3) for the fusion mode.
+        checker is the checkerboard mask to use instead of one starting at the first pixel.
+        """
+        mode = self.__compareMode
+        if mode == 'Difference':
+            # signed difference is windowed about zero with the current window width
+            diff = np.subtract(left, right, dtype=np.float32)
+            return self.imgProcessing(diff, -self._winwidth/2)
+        elif mode == 'Absolute Difference':
+            diff = np.abs(np.subtract(left, right, dtype=np.float32))
+            return self.imgProcessing(diff, 0)
+        
+        left8 = self.imgProcessing(left)
+        right8 = self.imgProcessing(right)
+        if mode == 'Checkerboard':
+            if checker is None:
+                checker = self.getCheckerMask(left8.shape)
+            return np.where(checker, left8, right8)
+        elif mode == 'Alpha Blend':
+            weight = int(round(self.__blendAlpha*256))
+            blend = (left8.astype(np.uint16)*weight + right8.astype(np.uint16)*(256-weight)) >> 8
+            return blend.astype(np.uint8)
+        elif mode == 'Red/Green Fusion':
+            return np.dstack([left8, right8, np.zeros_like(left8)])
+        else:
+            return left8
+        
+    def getCheckerMask(self, shape):
+        if self.__checkerMask is None or self.__checkerMask.shape != shape:
+            rows = np.arange(shape[0])[:,None] // self.__checkerSize
+            cols = np.arange(shape[1])[None,:] // self.__checkerSize
+            self.__checkerMask = (rows + cols) % 2 == 0
+        return self.__checkerMask
     
-    def setVertVal(self, value):
-        self.__vert = value
-
+    def setCompareMode(self, mode, data=None):
+        """ Render the current volume against data (the same shape) using one of COMPARE_MODES.
+        """
+        if mode not in COMPARE_MODES:
+            raise RuntimeError("QtImageViewer.setCompareMode: unknown compare mode %s." % mode)
+        self.__compareMode = mode
+        if data is not None:
+            self.__compareData = data
+        if (mode != COMPARE_MODES[0]) and (self._imageData is not None) and (self.__compareData is not None) \
+                and (self.__compareData.shape != self._imageData.shape):
+            print("WARNING: compare volumes differ in shape, showing side by side")
+        self.setSlice(self._curSlice)
+        
+    def getCompareMode(self):
+        return self.__compareMode
     
-    def setWindowLevel(self, value):
-        self.__winlevel = value
-        self.imgWindowChange(self.__winlevel, self.__winwidth)
-        
-    def setWindowWidth(self, value):
-        self.__winwidth = value
-        self.imgWindowChange(self.__winlevel, self.__winwidth)
+    def setBlendAlpha(self, value):
+        self.__blendAlpha = min(max(float(value), 0.0), 1.0)
+        self.setSlice(self._curSlice)
+        
+    def setCheckerSize(self, value):
+        self.__checkerSize = max(int(value), 1)
+        self.__checkerMask = None
+        self.setSlice(self._curSlice)
     
-    def getWindowLevel(self):
-        return self.__winlevel
-        
-    def getWindowWidth(self):
-        return self.__winwidth        
-        
-    def imgWindowChange(self, winowlevel, windowwidth):
-        self.__winlevel = winowlevel
-        self.__winwidth = windowwidth
-        
-        self.setSlice(self.__curSlice)            
+    def startComparison(self, data):
+        """ Compute the per-slice metrics of the current volume against data (the same shape)
+        along the current slice axis in the background and plot them in a popup as they come.
+        """
+        self.stopComparison()
+        if (self._imageData is None) or (data is None):
+            return
+        if data.shape != self._imageData.shape:
+            print("ERROR: compare volumes differ in shape, cannot compute slice metrics")
+            return
+        self.__comparison = compareMetrics.VolumeComparison(self._imageData, data, self.sliceAxis(self._imgorientation))
+        self.__comparison.start()
+        if self.__metricsWindow is None:
+            CrosshairWindow, ThruPlaneWindow, MetricsWindow = popupWindows()
+            self.__metricsWindow = MetricsWindow(self, width=6, height=7, dpi=100)
+            self.__metricsWindow.mpl_connect('button_press_event', self.metricsClick)
+        self.__metricsWindow.show()
+        self.updateMetricsPopup()
+        self.__metricsTimer.start()
+        
+    def stopComparison(self):
+        self.__metricsTimer.stop()
+        if self.__comparison is not None:
+            self.__comparison.cancel()
+            self.__comparison = None
+            
+    def isComparisonShown(self):
+        return (self.__metricsWindow is not None) and self.__metricsWindow.isVisible()
     
-    def imgProcessing(self, data):
-        # display levels
-        nlevels = 256    #int8
-        bpp = 8
-        
-        y_min = 0
-        y_max = nlevels -1 
+    def getComparison(self):
+        return self.__comparison
         
-        dout = ((data - (self.__winwidth/2+self.__winlevel - 0.5))/(self.__winwidth - 1) + 0.5) * (y_max-y_min) + y_min
-        
-        dout[dout<y_min] = y_min
-        dout[dout>y_max] = y_max
+    def updateMetricsPopup(self):
+        """ Redraw the curves with the slices computed so far, the worst slice of each
+        metric is marked and the current slice is the vertical line.
+        """
+        comparison = self.__comparison
+        if comparison is None:
+            return
+        complete = comparison.isComplete()
+        metrics = comparison.getMetrics()
+        self.__metricsLines = []
+        for name, axes in zip(compareMetrics.METRICS, self.__metricsWindow.axes):
+            axes.clear()
+            axes.plot(metrics[name])
+            worst = comparison.worstSlice(name)
+            title = METRIC_TITLES[name]
+            if worst is not None:
+                axes.plot([worst], [metrics[name][worst]], 'rx')
+                title += " (worst slice %d)" % worst
+            axes.set_title(title, fontsize=9)
+            axes.set_xlim(0, max(comparison.getSliceCount()-1, 1))
+            self.__metricsLines.append(axes.axvline(self._curSlice, color='0.6', linewidth=1))
+        self.__metricsWindow.axes[-1].set_xlabel("Slice (click: go to slice, right click: go to worst slice)")
+        if not complete:
+            self.__metricsWindow.fig.suptitle("%d of %d slices" % (comparison.getDoneCount(), comparison.getSliceCount()))
+        elif comparison.getFailedCount():
+            self.__metricsWindow.fig.suptitle("%d of %d slices failed" % (comparison.getFailedCount(), comparison.getSliceCount()))
+            self.__metricsTimer.stop()
+        else:
+            self.__metricsWindow.fig.suptitle("")
+            self.__metricsTimer.stop()
+        self.__metricsWindow.draw_idle()
         
-        return dout.astype(np.uint8) 
+    def setMetricsSlice(self, value):
+        """ Move the current slice line of the comparison curves.
+        """
+        if self.isComparisonShown() and self.__metricsLines:
+            for line in self.__metricsLines:
+                line.set_xdata([value, value])
+            self.__metricsWindow.draw_idle()
+            
+    def metricsClick(self, event):
+        if (self.__comparison is None) or (event.inaxes is None) or (event.xdata is None):
+            return
+        if event.button == 3:
+            name = compareMetrics.METRICS[self.__metricsWindow.axes.index(event.inaxes)]
+            value = self.__comparison.worstSlice(name)
+            if value is None:
+                return
+        else:
+            value = int(round(event.xdata))
+        self.sliceSelected.emit(min(max(value, 0), self.__comparison.getSliceCount()-1))
     
     def resampleImage(self, spacing=None,fill_value=0):
-        
-        sitk_image = sitk.GetImageFromArray(self.__imageData)
-        sitk_image.SetSpacing([float(self.__pixelspacing[2]), \
-                               float(self.__pixelspacing[1]), \
-                               float(self.__pixelspacing[0])])
+        import SimpleITK as sitk
+
+        sitk_image = sitk.GetImageFromArray(self._imageData)
+        sitk_image.SetSpacing([float(self._pixelspacing[2]), \
+                               float(self._pixelspacing[1]), \
+                               float(self._pixelspacing[0])])
         
         num_dim = sitk_image.GetDimension()
         orig_pixelid = sitk_image.GetPixelIDValue()
         orig_origin = sitk_image.GetOrigin()
         orig_direction = sitk_image.GetDirection()
         orig_spacing = sitk_image.GetSpacing()
-        orig_size = np.array(sitk_image.GetSize(), dtype=np.int)
+        orig_size = np.array(sitk_image.GetSize(), dtype=int)
     
         if spacing is None:
             min_spacing = min(orig_spacing)
@@ -510,7 +490,7 @@ class QtImageViewer(QGraphicsView):
         sitk_interpolator = sitk.sitkLinear
     
         new_size = orig_size*(np.array(orig_spacing)/np.array(new_spacing))
-        new_size = np.ceil(new_size).astype(np.int) #  Image dimensions are in integers
+        new_size = np.ceil(new_size).astype(int) #  Image dimensions are in integers
         new_size = [int(s) for s in new_size] #  SimpleITK expects lists, not ndarrays
     
         resample_filter = sitk.ResampleImageFilter()
@@ -525,210 +505,30 @@ class QtImageViewer(QGraphicsView):
                                                        fill_value,
                                                        orig_pixelid)
     
-        self.__imageData = np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0])
-        self.__pixeldims = self.__imageData.shape
-        self.__pixelspacing = [new_spacing,new_spacing,new_spacing]
-        self.__winlevel = self.__imageData.min()
-        self.__winwidth = self.__imageData.max()-self.__imageData.min()         
-        self.__imgorientation = 1 # x-y
-        self.__curSlice = self.__pixeldims[2]//2
-        self.setSlice(self.__curSlice) 
-        
-    def setCrossShow(self, value):
-        if value == 0:
-            self.__crossshow = False
-        else:
-            self.__crossshow = True
-    
-    def getImageMaximum(self):
-        if self.__imageData is not None:
-            return self.__imageData.max()
-        else:
-            return 0
-        
-    def getImageMinimum(self):
-        if self.__imageData is not None:
-            return self.__imageData.min()
-        else:
-            return 0  
-        
-    def getWinLevelRange(self):
-        if self.__imageData is None:
-            return [0,1]
-        else:
-            return [self.__imageData.min(), self.__imageData.max()]  
-    
-    def getWinWidthRange(self):
-        if self.__imageData is None:
-            return [0,1]
-        else:
-            return [0, self.__imageData.max()-self.__imageData.min()]  
-            
-    def setSliceOrientation(self, orientation):
-        if orientation == 1:
-            self.__imgorientation = 1
-            self.setSliceOrientationToXY()
-        elif orientation == 2:   
-            self.__imgorientation = 2
-            self.setSliceOrientationToXZ()
-        else:
-            self.__imgorientation = 3
-            self.setSliceOrientationToYZ()
-    
-    def setSliceOrientationToXY(self):
-        self.__imgorientation = 1
-        if (self.__imageData is not None):
-            self.__curSlice = self.__pixeldims[2]//2
-            self.setSlice(self.__curSlice) 
-    
-    def setSliceOrientationToXZ(self):
-        self.__imgorientation = 2
-        if (self.__imageData is not None):
-            self.__curSlice = self.__pixeldims[1]//2
-            self.setSlice(self.__curSlice) 
-    
-    def setSliceOrientationToYZ(self):
-        self.__imgorientation = 3
-        if (self.__imageData is not None):
-            self.__curSlice = self.__pixeldims[0]//2 
-            self.setSlice(self.__curSlice) 
-        
-    def setFlipX(self, value):
-        self.__flipX = value
-        self.setSlice(self.__curSlice) 
-    
-    def setFlipY(self, value):
-        self.__flipY = value
-        self.setSlice(self.__curSlice)   
-    
-    def setRotateAngle(self, value):
-        self.__rotateAngle = value
-        self.setSlice(self.__curSlice)  
-        
-    def getRotateAngle(self):
-        return self.__rotateAngle
-    
-    def getCurSlice(self):
-        return self.__curSlice
-    
-    def getImgOrientation(self):
-        return self.__imgorientation
-    
-    def getCrosshair(self):
-        return self.__crosshair
-       
-    def get_qimage(self,image:np.ndarray):
-#         assert (np.max(image) <= 256)
-        image8 = image.astype(np.uint8, order='C', casting='unsafe')
-        height, width = image8.shape
-        bytesPerLine = width
-        image = QImage(image8.data, width, height, bytesPerLine, QImage.Format_Indexed8)
-        return image
- 
-    def setSlice(self, slice):
-        if (self.__imageData is not None) and (slice>=self.getSliceMin() and slice<=self.getSliceMax()):
-            self.__curSlice = slice
-            if self.__imgorientation == 1:   #x-y
-#                 localData = self.__imageData[:,:,slice]
-                data = self.imgProcessing(self.__imageData[:,:,slice])  
-                qimage = self.get_qimage(data)
-#                 qimage = qimage.mirrored(self.__flipX, self.__flipY)
-                rotate = QTransform()
-                rotate.rotate(self.__rotateAngle)
-                qimg = qimage.transformed(rotate)
-                self.setImage(qimg)                
-            elif self.__imgorientation == 2:  #x-z
-                data = self.imgProcessing(self.__imageData[:,slice,:])              
-                qimage = self.get_qimage(data)
-#                 qimage = qimage.mirrored(self.__flipX, self.__flipY)   
-                rotate = QTransform()
-                rotate.rotate(self.__rotateAngle)
-                qimg = qimage.transformed(rotate)                
-                self.setImage(qimg) 
-            else:                          #y-z
-                data = self.imgProcessing(self.__imageData[slice,:,:])              
-                qimage = self.get_qimage(data)
-#                 qimage = qimage.mirrored(self.__flipX, self.__flipY)   
-                rotate = QTransform()
-                rotate.rotate(self.__rotateAngle)
-                qimg = qimage.transformed(rotate)                
-                self.setImage(qimg)   
-    
-    def getImgWidth(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]
-            else:
-                return 0            
-        
-    def getImgHeight(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]
-            else:
-                return 0  
-        
-    def getSliceMin(self):
-        return 0
-    
-    def getSliceMax(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]-1
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]-1
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]-1
-            else:
-                return 0
-    
-    def getSliceRange(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]
-            else:
-                return 0
-            
-    def getImageData(self):
-        return self.__imageData
+        self._imageData = np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0])
+        self._pixeldims = self._imageData.shape
+        self.rescaleAffine(orig_spacing[::-1], new_spacing[::-1])
+        self._pixelspacing = [new_spacing,new_spacing,new_spacing]
+        self._winlevel = self._imageData.min()
+        self._winwidth = self._imageData.max().item()-self._imageData.min().item()         
+        self._imgorientation = 1 # x-y
+        self._curSlice = self._pixeldims[2]//2
+        self.setSlice(self._curSlice) 
+        
+    def windowPlane(self, plane):
+        """ Windows the plane, combined with the same plane of the compare volume
+        in the compare modes other than side by side.
+        """
+        if (self.__compareMode != COMPARE_MODES[0]) and (self.__compareData is not None) \
+                and (self.__compareData.shape == self._imageData.shape):
+            # plane can be the rendered part of the slice only, see renderRegion
+            checker = None
+            if self.__compareMode == 'Checkerboard':
+                checker = self.cropPlane(self.getCheckerMask(self._planeShape))
+            return self.compareProcessing(plane, self.cropPlane(self.getSliceData(self.__compareData, self._curSlice)), checker)
+        return self.imgProcessing(plane)
     
-    def loadDicomSeries(self, folderName=""):  
+    def loadDicomSeries(self, folderName="", seriesID=None):  
         '''
         lstFilesDCM = []
             
@@ -740,147 +540,37 @@ class QtImageViewer(QGraphicsView):
         # Get ref file
         RefDs = dicom.read_file(lstFilesDCM[0])
         
-        self.__pixeldims = [int(RefDs.Rows), int(RefDs.Columns), len(lstFilesDCM)]
-        self.__pixelspacing = [(float)(RefDs.PixelSpacing[0]), (float)(RefDs.PixelSpacing[1]), (float)(RefDs.SliceThickness)]
+        self._pixeldims = [int(RefDs.Rows), int(RefDs.Columns), len(lstFilesDCM)]
+        self._pixelspacing = [(float)(RefDs.PixelSpacing[0]), (float)(RefDs.PixelSpacing[1]), (float)(RefDs.SliceThickness)]
         
-        self.__imageData = np.zeros(self.__pixeldims, dtype=float)
-        self.__fileName = folderName
+        self._imageData = np.zeros(self._pixeldims, dtype=float)
+        self._fileName = folderName
     
         # It cannot read compressed dicom data
         for filenameDCM in lstFilesDCM:
             # read the file
             ds = dicom.read_file(filenameDCM)
             # store the raw image data
-            self.__imageData[:, :, lstFilesDCM.index(filenameDCM)] = ds.pixel_array    
+            self._imageData[:, :, lstFilesDCM.index(filenameDCM)] = ds.pixel_array    
         '''
-        reader = sitk.ImageSeriesReader()
-        series_ids = reader.GetGDCMSeriesIDs(str(folderName))        
-        assert len(series_ids) == 1, 'Assuming only one series per folder.'
-        filenames = reader.GetGDCMSeriesFileNames(str(folderName), series_ids[0])
-        reader.SetFileNames(filenames)        
-        image = reader.Execute()
-        
-        self.__pixeldims = image.GetSize()
-        self.__pixelspacing = image.GetSpacing()
-        self.__imageData = sitk.GetArrayFromImage(image) #np.transpose(sitk.GetArrayFromImage(image), axes=[2,1,0])
-        self.__winlevel = self.__imageData.min()
-        self.__winwidth = self.__imageData.max()-self.__imageData.min()         
-        self.__imgorientation = 1 # x-y
-        self.__curSlice = self.__pixeldims[2]//2
-        self.setSlice(self.__curSlice) 
+        import dicomLoader
+
+        selected = dicomLoader.chooseSeries(folderName, seriesID, self)
+        if selected is None:
+            return
         
-        #self.resampleImage() works, but it takes time to get isotropic image
+        self._imageData, info = dicomLoader.readSeries(*selected)
+        self._imageData = volumeCache.applyDtypePolicy(self._imageData, self._dtypePolicy)
+        self._pixeldims = list(self._imageData.shape)
+        self._pixelspacing = info['spacing']
+        self._affine = viewerCore.volumeAffine(info)
+        self._winlevel = info['stats']['min']
+        self._winwidth = info['stats']['max']-info['stats']['min']         
+        self._imgorientation = 1 # x-y
+        self._curSlice = self._pixeldims[2]//2
+        self.setSlice(self._curSlice) 
         
-        self.__fileName = str(folderName)        
+        #self.resampleImage() works, but it takes time to get isotropic image
         
-    def loadNIFTI(self, fileName=""):
-        if len(fileName) and os.path.isfile(fileName):
-            img = nib.load(fileName)
+        self._fileName = str(folderName)        
         
-            self.__pixeldims = list(img.shape)
-            self.__pixelspacing = list(img.header.get_zooms())
-            self.__imageData = img.get_data()
-            self.__winlevel = self.__imageData.min()
-            self.__winwidth = self.__imageData.max()-self.__imageData.min()  
-            self.__imgorientation = 1 # x-y   
-            self.__curSlice = self.__pixeldims[2]//2
-            self.setSlice(self.__curSlice)
-            
-            self.__fileName = fileName
-
-    def loadImageFromFile(self, fileName=""):
-        """ Load an image from file.
-        Without any arguments, loadImageFromFile() will popup a file dialog to choose the image file.
-        With a __fileName argument, loadImageFromFile(__fileName) will attempt to load the specified image file directly.
-        """
-        fileName, dummy = QFileDialog.getOpenFileName(self, "Open image file.")
-        if len(fileName) and os.path.isfile(fileName):
-            image = QImage(fileName)
-            self.setImage(image)
-
-    def updateViewer(self):
-        """ Show current zoom (if showing entire image, apply current aspect ratio mode).
-        """
-        if not self.hasImage():
-            return
-        if len(self.zoomStack) and self.sceneRect().contains(self.zoomStack[-1]):
-            self.fitInView(self.zoomStack[-1], Qt.IgnoreAspectRatio)  # Show zoomed rect (ignore aspect ratio).
-        else:
-            self.zoomStack = []  # Clear the zoom stack (in case we got here because of an invalid zoom).
-            self.fitInView(self.sceneRect(), self.aspectRatioMode)  # Show entire image (use current aspect ratio mode).
-
-    def resizeEvent(self, event):
-        """ Maintain current zoom on resize.
-        """
-        self.updateViewer()
-
-    def mousePressEvent(self, event):
-        """ Start mouse pan or zoom mode.
-        """
-        scenePos = self.mapToScene(event.pos())
-        if event.button() == Qt.LeftButton:
-            if self.canPan:
-                self.setDragMode(QGraphicsView.ScrollHandDrag)
-            self.leftMouseButtonPressed.emit(scenePos.x(), scenePos.y())
-        elif event.button() == Qt.RightButton:
-            if self.canZoom:
-                self.setDragMode(QGraphicsView.RubberBandDrag)
-            self.rightMouseButtonPressed.emit(scenePos.x(), scenePos.y())
-        QGraphicsView.mousePressEvent(self, event)
-
-    def mouseReleaseEvent(self, event):
-        """ Stop mouse pan or zoom mode (apply zoom if valid).
-        """
-        QGraphicsView.mouseReleaseEvent(self, event)
-        scenePos = self.mapToScene(event.pos())
-        if event.button() == Qt.LeftButton:
-            self.setDragMode(QGraphicsView.NoDrag)
-            self.leftMouseButtonReleased.emit(scenePos.x(), scenePos.y())
-        elif event.button() == Qt.RightButton:
-            if self.canZoom:
-                viewBBox = self.zoomStack[-1] if len(self.zoomStack) else self.sceneRect()
-                selectionBBox = self.scene.selectionArea().boundingRect().intersected(viewBBox)
-                self.scene.setSelectionArea(QPainterPath())  # Clear current selection area.
-                if selectionBBox.isValid() and (selectionBBox != viewBBox):
-                    self.zoomStack.append(selectionBBox)
-                    self.updateViewer()
-            self.setDragMode(QGraphicsView.NoDrag)
-            self.rightMouseButtonReleased.emit(scenePos.x(), scenePos.y())
-
-    def mouseDoubleClickEvent(self, event):
-        """ Show entire image.
-        """
-        scenePos = self.mapToScene(event.pos())
-        if event.button() == Qt.LeftButton:
-            self.leftMouseButtonDoubleClicked.emit(scenePos.x(), scenePos.y())
-        elif event.button() == Qt.RightButton:
-            if self.canZoom:
-                self.zoomStack = []  # Clear zoom stack.
-                self.updateViewer()
-            self.rightMouseButtonDoubleClicked.emit(scenePos.x(), scenePos.y())
-        QGraphicsView.mouseDoubleClickEvent(self, event)
-        
-    def mouseMoveEvent(self, event):
-        scenePos = self.mapToScene(event.pos())
-        
-        # record the position for cross drawing
-        self.__lineX.setLine(scenePos.x(),self.sceneRect().y(),scenePos.x(), self.sceneRect().y()+ self.sceneRect().height())      
-        self.__lineY.setLine(self.sceneRect().x(),scenePos.y(),self.sceneRect().x()+ self.sceneRect().width(),scenePos.y())  
-        
-        self.scene.invalidate(self.scene.sceneRect())
-        QGraphicsView.mouseMoveEvent(self, event)  # in PyQt5, update() doesn't trigger drawForeground()
-        
-    def drawForeground(self, painter, rect):
-        if self.__crossshow == True:
-            painter.save()
-            pen = QPen()
-            pen.setWidth(2)
-            pen.setColor(QColor(255,0,0))
-            painter.setPen(pen)
-            painter.drawLine(self.__lineX)
-            pen.setColor(QColor(0,255,0))
-            painter.setPen(pen)        
-            painter.drawLine(self.__lineY)
-            painter.restore()
-        QGraphicsView.drawForeground(self, painter, rect)          
-
@@ -1,6 +1,131 @@
+import io
+import threading
+from collections import OrderedDict
+
 import ipywidgets as ipyw
+import matplotlib
+import matplotlib.patches
 import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.figure import Figure
+from IPython.display import display
+from PIL import Image
+
+
+def isWidgetBackend():
+    backend = matplotlib.get_backend().lower()
+    return 'ipympl' in backend or 'widget' in backend
+
+
+def makeFigure(figsize, nrows=1, ncols=1, mosaic=None, **kwargs):
+    """ Build a figure that the viewers keep and update instead of making a new one per slider event.
+    With the ipympl backend (%matplotlib widget) its canvas is a widget redrawn in place,
+    otherwise it is a plain Figure outside of pyplot, so it is never collected by plt.show.
+    Returns the figure and a 2D array of axes, or a dict of axes by name for a mosaic layout.
+    """
+    if isWidgetBackend():
+        with plt.ioff():
+            fig = plt.figure(figsize=figsize)
+    else:
+        fig = Figure(figsize=figsize)
+    if mosaic is not None:
+        axes = fig.subplot_mosaic(mosaic, **kwargs)
+    else:
+        axes = fig.subplots(nrows, ncols, squeeze=False, **kwargs)
+    return fig, axes
+
+
+def showFigure(fig):
+    """ Show fig in the current interact output after its artists were updated.
+    """
+    if isinstance(fig.canvas, ipyw.DOMWidget):
+        fig.canvas.draw_idle()
+        display(fig.canvas)
+    else:
+        display(fig)
+
+
+def updateProfile(line, data):
+    line.set_data(np.arange(len(data)), data)
+    line.axes.relim()
+    line.axes.autoscale_view()
+
+
+def windowSlice(data, mini, maxi):
+    """ Map data linearly from [mini, maxi] to 0..255 as uint8, clipping outside the window.
+    """
+    scale = 255.0 / max(maxi - mini, 1e-12)
+    out = np.subtract(data, mini, dtype=np.float32)
+    out *= scale
+    np.clip(out, 0, 255, out=out)
+    return out.astype(np.uint8)
+
+
+def summedAreaTable(plane):
+    """ Returns the summed-area table of plane over its first two axes, padded with a leading
+    row and column of zeros so any rectangle sum is four lookups (see roiSum).
+    Trailing axes, e.g. energy bins, are summed independently.
+    """
+    sat = np.zeros((plane.shape[0]+1, plane.shape[1]+1) + plane.shape[2:], dtype=np.float64)
+    np.cumsum(plane, axis=0, dtype=np.float64, out=sat[1:,1:])
+    np.cumsum(sat[1:,1:], axis=1, out=sat[1:,1:])
+    return sat
+
+
+def roiSum(sat, x0, x1, y0, y1):
+    """ Sum of plane[x0:x1, y0:y1] from its summed-area table.
+    """
+    return sat[x1,y1] - sat[x0,y1] - sat[x1,y0] + sat[x0,y0]
+
+
+class OrientedVolume:
+    """
+    OrientedVolume indexes a volume in the axis order of a slice plane selection
+    without transposing it: vol[:,:,z] reads the original array along the chosen
+    axis directly. Axes after the third (timepoints, bins) keep their place.
+
+    With contiguous=True a copy with the slice axis first is built on the first
+    slice read, so every slice after that is one contiguous block of memory.
+
+    """
+
+    ORIENT = {"y-z":[1,2,0], "z-x":[2,0,1], "x-y": [0,1,2]}
+
+    def __init__(self, volume, view, contiguous=False):
+        self.volume = volume
+        self.axes = self.ORIENT[view] + list(range(3, volume.ndim))
+        self.shape = tuple(volume.shape[a] for a in self.axes)
+        self.contiguous = contiguous
+        self.sliceFirst = None
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),)*(len(self.shape)-len(key))
+
+        if self.contiguous and isinstance(key[2], (int, np.integer)):
+            if self.sliceFirst is None:
+                self.sliceFirst = np.ascontiguousarray(np.moveaxis(np.transpose(self.volume, self.axes), 2, 0))
+            return self.sliceFirst[(key[2],) + key[:2] + key[3:]]
+
+        index = [slice(None)]*len(self.shape)
+        for axis, k in zip(self.axes, key):
+            index[axis] = k
+        data = self.volume[tuple(index)]
+
+        # data keeps the remaining axes in the original order, put them in the plane order
+        kept = [axis for axis, k in zip(self.axes, key) if not isinstance(k, (int, np.integer))]
+        order = sorted(kept)
+        return np.transpose(data, [order.index(axis) for axis in kept])
+
+
+def orientedVolume(views, volume, view, contiguous=False):
+    """ Returns the OrientedVolume of volume for view, kept in the dict views so switching
+    back to a plane reuses it (and its contiguous copy).
+    """
+    if view not in views:
+        views[view] = OrientedVolume(volume, view, contiguous)
+    return views[view]
 
 class ImageSliceCompare3D:
     """ 
@@ -16,15 +141,21 @@ class ImageSliceCompare3D:
     cmap = default('plasma'), string for the matplotlib colormap. You can find 
     more matplotlib colormaps on the following link:
     https://matplotlib.org/users/colormaps.html
+    contiguous = default(False), keep a contiguous copy per slice plane for faster
+    slice reads, at the cost of one extra volume in memory per plane viewed
     
     """
     
-    def __init__(self, volume,volume2,mini,maxi,figsize=(10,6), cmap='gray',):
+    def __init__(self, volume,volume2,mini,maxi,figsize=(10,6), cmap='gray',contiguous=False):
         self.volume = volume
         self.volume2 = volume2  
+        self.contiguous = contiguous
+        self.views = {}
+        self.views2 = {}
         self.figsize = figsize
         self.cmap = cmap
         self.v = [mini, maxi]
+        self.fig, self.ax = makeFigure(self.figsize, 1, 2)
         
         # Call to select slice plane
         ipyw.interact(self.view_selection, view=ipyw.RadioButtons(
@@ -33,12 +164,18 @@ class ImageSliceCompare3D:
             style={'description_width': 'initial'}))
     
     def view_selection(self, view):
-        # Transpose the volume to orient according to the slice plane selection
-        orient = {"y-z":[1,2,0], "z-x":[2,0,1], "x-y": [0,1,2]}
-        self.vol = np.transpose(self.volume, orient[view])
-        self.vol2 = np.transpose(self.volume2, orient[view])
+        # Index the volumes in the slice plane selection, no transpose
+        self.vol = orientedVolume(self.views, self.volume, view, self.contiguous)
+        self.vol2 = orientedVolume(self.views2, self.volume2, view, self.contiguous)
         maxZ = self.vol.shape[2] - 1
         
+        # Build the images once per plane, the slider only swaps their data
+        self.images = []
+        for ax, vol in zip(self.ax[0], [self.vol, self.vol2]):
+            ax.clear()
+            self.images.append(ax.imshow(vol[:,:,0], cmap=plt.get_cmap(self.cmap), 
+                vmin=self.v[0], vmax=self.v[1]))
+        
         # Call to view a slice within the selected slice plane
         ipyw.interact(self.plot_slice, 
             z=ipyw.IntSlider(min=0, max=maxZ, step=1, continuous_update=True, 
@@ -46,15 +183,9 @@ class ImageSliceCompare3D:
         
     def plot_slice(self, z):
         # Plot slice for the given plane and slice
-        self.fig = plt.figure(figsize=self.figsize)
-        self.fig.add_subplot(1,2,1)
-        plt.imshow(self.vol[:,:,z], cmap=plt.get_cmap(self.cmap), 
-            vmin=self.v[0], vmax=self.v[1])
-        
-        #self.fig2 = plt.figure(figsize=self.figsize)
-        self.fig.add_subplot(1,2,2)
-        plt.imshow(self.vol2[:,:,z], cmap=plt.get_cmap(self.cmap), 
-            vmin=self.v[0], vmax=self.v[1])
+        self.images[0].set_data(self.vol[:,:,z])
+        self.images[1].set_data(self.vol2[:,:,z])
+        showFigure(self.fig)
         
         
 class ImageSliceViewer3D:
@@ -71,17 +202,22 @@ class ImageSliceViewer3D:
     cmap = default('plasma'), string for the matplotlib colormap. You can find 
     more matplotlib colormaps on the following link:
     https://matplotlib.org/users/colormaps.html
+    contiguous = default(False), keep a contiguous copy per slice plane for faster
+    slice reads, at the cost of one extra volume in memory per plane viewed
     
     """
     
-    def __init__(self, volume,mini,maxi,figsize=(8,8), cmap='gray',step_size=1.0):
+    def __init__(self, volume,mini,maxi,figsize=(8,8), cmap='gray',step_size=1.0,contiguous=False):
         self.volume = volume
+        self.contiguous = contiguous
+        self.views = {}
         self.figsize = figsize
         self.cmap = cmap
         self.v = [mini, maxi]
         #guarantee minimum number of steps
         tst=(maxi-mini)/20
         self.step_size=np.min([step_size,tst])
+        self.fig, self.ax = makeFigure(self.figsize)
         
         # Call to select slice plane
         ipyw.interact(self.view_selection, view=ipyw.RadioButtons(
@@ -90,11 +226,14 @@ class ImageSliceViewer3D:
             style={'description_width': 'initial'}))
     
     def view_selection(self, view):
-        # Transpose the volume to orient according to the slice plane selection
-        orient = {"y-z":[1,2,0], "z-x":[2,0,1], "x-y": [0,1,2]}
-        self.vol = np.transpose(self.volume, orient[view])
+        # Index the volume in the slice plane selection, no transpose
+        self.vol = orientedVolume(self.views, self.volume, view, self.contiguous)
         maxZ = self.vol.shape[2] - 1
         
+        self.ax[0,0].clear()
+        self.image = self.ax[0,0].imshow(self.vol[:,:,0], cmap=plt.get_cmap(self.cmap), 
+            vmin=self.v[0], vmax=self.v[1])
+        
         # Call to view a slice within the selected slice plane
         ipyw.interact(self.plot_slice, 
             z=ipyw.IntSlider(min=0, max=maxZ, step=1, continuous_update=True, 
@@ -106,9 +245,9 @@ class ImageSliceViewer3D:
         
     def plot_slice(self, z, m):
         # Plot slice for the given plane and slice
-        self.fig = plt.figure(figsize=self.figsize)
-        plt.imshow(self.vol[:,:,z], cmap=plt.get_cmap(self.cmap), 
-            vmin=m[0], vmax=m[1])
+        self.image.set_data(self.vol[:,:,z])
+        self.image.set_clim(m[0], m[1])
+        showFigure(self.fig)
             
             
 class ImageSliceViewer4D:
@@ -125,14 +264,19 @@ class ImageSliceViewer4D:
     cmap = default('plasma'), string for the matplotlib colormap. You can find
     more matplotlib colormaps on the following link:
     https://matplotlib.org/users/colormaps.html
+    contiguous = default(False), keep a contiguous copy per slice plane for faster
+    slice reads, at the cost of one extra volume in memory per plane viewed
     
     """
     
-    def __init__(self, volume,mini,maxi,figsize=(8,8), cmap='gray',):
+    def __init__(self, volume,mini,maxi,figsize=(8,8), cmap='gray',contiguous=False):
         self.volume = volume
+        self.contiguous = contiguous
+        self.views = {}
         self.figsize = figsize
         self.cmap = cmap
         self.v = [mini, maxi]
+        self.fig, self.ax = makeFigure(self.figsize)
         # Call to select slice plane
         ipyw.interact(self.view_selection, view=ipyw.RadioButtons(
             options=['x-y','y-z', 'z-x'], value='x-y',
@@ -140,12 +284,15 @@ class ImageSliceViewer4D:
             style={'description_width': 'initial'}))
     
     def view_selection(self, view):
-        # Transpose the volume to orient according to the slice plane selection
-        orient = {"y-z":[1,2,0,3], "z-x":[2,0,1,3], "x-y": [0,1,2,3]}
-        self.vol = np.transpose(self.volume, orient[view])
+        # Index the volume in the slice plane selection, no transpose
+        self.vol = orientedVolume(self.views, self.volume, view, self.contiguous)
         maxZ = self.vol.shape[2] - 1
         maxT = self.vol.shape[3] - 1
         
+        self.ax[0,0].clear()
+        self.image = self.ax[0,0].imshow(self.vol[:,:,0,0], cmap=plt.get_cmap(self.cmap),
+            vmin=self.v[0], vmax=self.v[1])
+        
         # Call to view a slice within the selected slice plane
         ipyw.interact(self.plot_slice,
             z=ipyw.IntSlider(min=0, max=maxZ, step=1, continuous_update=True,
@@ -155,18 +302,21 @@ class ImageSliceViewer4D:
         
     def plot_slice(self, z, t):
         # Plot slice for the given plane and slice
-        self.fig = plt.figure(figsize=self.figsize)
-        plt.imshow(self.vol[:,:,z,t], cmap=plt.get_cmap(self.cmap),
-            vmin=self.v[0], vmax=self.v[1]) #self.v[1])
+        self.image.set_data(self.vol[:,:,z,t])
+        showFigure(self.fig)
             
             
 class ImageTraceViewerSingle:
     
-    def __init__(self, volume,mini,maxi,figsize=(8,8), cmap='gray',):
+    def __init__(self, volume,mini,maxi,figsize=(8,8), cmap='gray',contiguous=False):
         self.volume = volume
+        self.contiguous = contiguous
+        self.views = {}
         self.figsize = figsize
         self.cmap = cmap
         self.v = [mini, maxi]
+        self.fig, self.ax = makeFigure(self.figsize, mosaic=[['image','image'],['xprof','yprof']],
+                                       height_ratios=[2,1])
      
     
         # Call to select slice plane
@@ -177,13 +327,25 @@ class ImageTraceViewerSingle:
         
 
     def view_selection(self, view):
-        # Transpose the volume to orient according to the slice plane selection
-        orient = {"y-z":[1,2,0], "z-x":[2,0,1], "x-y": [0,1,2]}
-        self.vol = np.transpose(self.volume, orient[view])
+        # Index the volume in the slice plane selection, no transpose
+        self.vol = orientedVolume(self.views, self.volume, view, self.contiguous)
         maxX = self.vol.shape[0] - 1
         maxY = self.vol.shape[1] - 1
         maxZ = self.vol.shape[2] - 1
         
+        # Build the image, crosshair lines and profiles once per plane
+        for ax in self.ax.values():
+            ax.clear()
+        self.image = self.ax['image'].imshow(self.vol[:,:,0], cmap=plt.get_cmap(self.cmap), 
+            vmin=self.v[0], vmax=self.v[1])
+        self.xLine = self.ax['image'].axhline(0, color='b')
+        self.yLine = self.ax['image'].axvline(0, color='r')
+        
+        self.xProfile, = self.ax['xprof'].plot([], [], 'b')
+        self.ax['xprof'].set_title("X Profile")
+        
+        self.yProfile, = self.ax['yprof'].plot([], [], 'r')
+        self.ax['yprof'].set_title("Y Profile")
         
         ipyw.interact(self.plot_slice, 
             y=ipyw.IntSlider(value=0,min=0, max=maxY, step=1, continuous_update=True, 
@@ -196,40 +358,28 @@ class ImageTraceViewerSingle:
         
     def plot_slice(self,x,y,z):
         # Plot slice for the given plane and slice
-        self.fig = plt.figure(figsize=self.figsize)
-        plt.imshow(self.vol[:,:,z], cmap=plt.get_cmap(self.cmap), 
-            vmin=self.v[0], vmax=self.v[1])
-        
-        maxX = self.vol.shape[0] - 1
-        maxY = self.vol.shape[1] - 1
-        maxZ = self.vol.shape[2] - 1
-
-        yvec = np.arange(0,maxY)
-        xvec = np.ones(yvec.shape)*x
-        plt.plot(yvec,xvec,'bo')
-
-        xvec = np.arange(0,maxX)
-        yvec = np.ones(xvec.shape)*y
-        plt.plot(yvec,xvec,'ro')
-
-        self.fig2 = plt.figure(figsize=self.figsize)
-        plt.plot(self.vol[x,:,z],'b')
-        plt.title("X Profile")
+        self.image.set_data(self.vol[:,:,z])
+        self.xLine.set_ydata([x, x])
+        self.yLine.set_xdata([y, y])
 
+        updateProfile(self.xProfile, self.vol[x,:,z])
+        updateProfile(self.yProfile, self.vol[:,y,z])
         
-        self.fig3 = plt.figure(figsize=self.figsize)
-        plt.plot(self.vol[:,y,z],'r')
-        plt.title("Y Profile")
+        showFigure(self.fig)
 
         
 class ImageTraceViewerDouble:
     
-    def __init__(self, volume,volume2,mini,maxi,figsize=(10,10), cmap='gray',):
+    def __init__(self, volume,volume2,mini,maxi,figsize=(10,10), cmap='gray',contiguous=False):
         self.volume = volume
         self.volume2 = volume2  
+        self.contiguous = contiguous
+        self.views = {}
+        self.views2 = {}
         self.figsize = figsize
         self.cmap = cmap
         self.v = [mini, maxi]
+        self.fig, self.ax = makeFigure((self.figsize[1], self.figsize[0]), 2, 2)
         
         # Call to select slice plane
         ipyw.interact(self.view_selection, view=ipyw.RadioButtons(
@@ -238,16 +388,35 @@ class ImageTraceViewerDouble:
             style={'description_width': 'initial'}))
     
     def view_selection(self, view):
-        # Transpose the volume to orient according to the slice plane selection
-        orient = {"y-z":[1,2,0], "z-x":[2,0,1], "x-y": [0,1,2]}
-        self.vol = np.transpose(self.volume, orient[view])
-        self.vol2 = np.transpose(self.volume2, orient[view])
+        # Index the volumes in the slice plane selection, no transpose
+        self.vol = orientedVolume(self.views, self.volume, view, self.contiguous)
+        self.vol2 = orientedVolume(self.views2, self.volume2, view, self.contiguous)
         
         
         maxX = self.vol.shape[0] - 1
         maxY = self.vol.shape[1] - 1
         maxZ = self.vol.shape[2] - 1
         
+        # Build the images, crosshair lines and profiles once per plane
+        for ax in self.ax.flat:
+            ax.clear()
+        self.image1 = self.ax[0,0].imshow(self.vol[:,:,0], cmap=plt.get_cmap(self.cmap), 
+            vmin=self.v[0], vmax=self.v[1])
+        self.xLine1 = self.ax[0,0].axhline(0, color='b')
+        self.yLine1 = self.ax[0,0].axvline(0, color='r')
+        
+        self.image2 = self.ax[0,1].imshow(self.vol2[:,:,0], cmap=plt.get_cmap(self.cmap), 
+            vmin=self.v[0], vmax=self.v[1])
+        self.xLine2 = self.ax[0,1].axhline(0, color='g')
+        self.yLine2 = self.ax[0,1].axvline(0, color='y')
+        
+        self.xProfile1, = self.ax[1,0].plot([], [], 'b')
+        self.xProfile2, = self.ax[1,0].plot([], [], 'g')
+        self.ax[1,0].set(title="X Profile")
+        
+        self.yProfile1, = self.ax[1,1].plot([], [], 'r')
+        self.yProfile2, = self.ax[1,1].plot([], [], 'y')
+        self.ax[1,1].set(title="Y Profile")
         
         ipyw.interact(self.plot_slice, 
             y=ipyw.IntSlider(value=0,min=0, max=maxY, step=1, continuous_update=True, 
@@ -259,50 +428,68 @@ class ImageTraceViewerDouble:
             
     def plot_slice(self, x,y,z):
         # Plot slice for the given plane and slice
-        self.fig, self.ax = plt.subplots(2,2)          
-        self.fig.set_figheight(self.figsize[0])
-        self.fig.set_figwidth(self.figsize[1])
-        
-        #self.fig = plt.figure(figsize=self.figsize)
+        self.image1.set_data(self.vol[:,:,z])
+        self.xLine1.set_ydata([x, x])
+        self.yLine1.set_xdata([y, y])
 
-        maxX = self.vol.shape[0] - 1
-        maxY = self.vol.shape[1] - 1
-        maxZ = self.vol.shape[2] - 1
+        self.image2.set_data(self.vol2[:,:,z])
+        self.xLine2.set_ydata([x, x])
+        self.yLine2.set_xdata([y, y])
         
-        
-        yvec1 = np.arange(0,maxY)
-        xvec1 = np.ones(yvec1.shape)*x
+        updateProfile(self.xProfile1, self.vol[x,:,z])
+        updateProfile(self.xProfile2, self.vol2[x,:,z])
 
-        xvec2 = np.arange(0,maxX)
-        yvec2 = np.ones(xvec2.shape)*y
+        updateProfile(self.yProfile1, self.vol[:,y,z])
+        updateProfile(self.yProfile2, self.vol2[:,y,z])
         
-        self.ax[0,0].imshow(self.vol[:,:,z], cmap=plt.get_cmap(self.cmap), 
-            vmin=self.v[0], vmax=self.v[1])
-
-        self.ax[0,0].plot(yvec1,xvec1,'bo')
-        self.ax[0,0].plot(yvec2,xvec2,'ro')
+        showFigure(self.fig)
+        
+class SpectralBinViewer:
+    """
+    SpectralBinViewer is for exploring the energy bins of 4D (x, y, z, bin)
+    spectral / photon-counting CT volumes in jupyter notebooks.
 
-        self.ax[0,1].imshow(self.vol2[:,:,z], cmap=plt.get_cmap(self.cmap), 
-            vmin=self.v[0], vmax=self.v[1])
+    The bin statistics (min, max, mean) and the energy-weighted image are computed
+    once per volume. The spectrum shown is the mean over a square ROI around the
+    crosshair, read from a summed-area table of the slice that is built once per
+    slice and kept for the last sat_cache slices.
 
-        self.ax[0,1].plot(yvec1,xvec1,'go')
-        self.ax[0,1].plot(yvec2,xvec2,'yo')
-        
-        self.ax[1,0].plot(self.vol[x,:,z],'b')
-        self.ax[1,0].plot(self.vol2[x,:,z],'g')
-        self.ax[1,0].set(title="X Profile")
+    Argumentss:
+    Volume = 4D input image
+    energies = default(None), bin energies used to weight the bins, 1..nBins if None
+    sat_cache = default(16), number of slice summed-area tables kept
+    contiguous = default(False), keep a contiguous copy per slice plane
 
-        self.ax[1,1].plot(self.vol[:,y,z],'r')
-        self.ax[1,1].plot(self.vol2[:,y,z],'y')
-        self.ax[1,1].set(title="Y Profile")
-        
-class SpectralBinViewer:
+    """
     
-    def __init__(self, volume,mini,maxi,figsize=(8,8), cmap='gray',):
+    def __init__(self, volume,mini,maxi,figsize=(12,6), cmap='gray',contiguous=False,energies=None,sat_cache=16):
         self.volume = volume
+        self.contiguous = contiguous
+        self.views = {}
+        self.weightedViews = {}
         self.figsize = figsize
         self.cmap = cmap
         self.v = [mini, maxi]
+        self.satCacheSize = sat_cache
+        self.sats = OrderedDict()
+        self.weighted = None
+        
+        nBins = volume.shape[3]
+        self.energies = np.arange(1, nBins+1, dtype=float) if energies is None else np.asarray(energies, dtype=float)
+        self.binStats = self.get_bin_stats()
+        
+        self.fig, self.ax = makeFigure(self.figsize, mosaic=[['image','spectrum']])
+        
+        # The volume statistics do not change with the plane, draw them once
+        bins = np.arange(nBins)
+        self.ax['spectrum'].fill_between(bins, self.binStats['min'], self.binStats['max'],
+            color='0.85', label='Volume min/max')
+        self.ax['spectrum'].plot(bins, self.binStats['mean'], '--', color='0.4', label='Volume mean')
+        self.spectrum, = self.ax['spectrum'].plot([], [], 'bo-', label='ROI mean')
+        self.binLine = self.ax['spectrum'].axvline(0, color='r')
+        self.ax['spectrum'].set_title("Bin Profile")
+        self.ax['spectrum'].set_xlabel("Bin")
+        self.ax['spectrum'].legend(loc='best')
      
     
         # Call to select slice plane
@@ -311,17 +498,52 @@ class SpectralBinViewer:
             description='Slice plane selection:', disabled=False,
             style={'description_width': 'initial'}))
         
+    def get_bin_stats(self):
+        # One pass over each bin
+        stats = {'min': [], 'max': [], 'mean': []}
+        for b in range(self.volume.shape[3]):
+            data = np.asarray(self.volume[:,:,:,b])
+            stats['min'].append(data.min())
+            stats['max'].append(data.max())
+            stats['mean'].append(data.mean(dtype=np.float64))
+        return {k: np.array(v, dtype=float) for k, v in stats.items()}
+    
+    def get_weighted(self):
+        # Energy-weighted mean over the bins, built the first time it is shown
+        if self.weighted is None:
+            weights = self.energies / self.energies.sum()
+            self.weighted = np.zeros(self.volume.shape[:3], dtype=np.float32)
+            for b, w in enumerate(weights):
+                self.weighted += self.volume[:,:,:,b]*np.float32(w)
+        return self.weighted
+    
+    def get_sat(self, z):
+        key = (self.view, z)
+        if key in self.sats:
+            self.sats.move_to_end(key)
+        else:
+            self.sats[key] = summedAreaTable(self.vol[:,:,z,:])
+            if len(self.sats) > self.satCacheSize:
+                self.sats.popitem(last=False)
+        return self.sats[key]
 
     def view_selection(self, view):
-        # Transpose the volume to orient according to the slice plane selection
-        orient = {"y-z":[1,2,0,3], "z-x":[2,0,1,3], "x-y": [0,1,2,3]}
-        self.vol = np.transpose(self.volume, orient[view])
+        # Index the volume in the slice plane selection, no transpose
+        self.view = view
+        self.vol = orientedVolume(self.views, self.volume, view, self.contiguous)
         maxX = self.vol.shape[0] - 1
         maxY = self.vol.shape[1] - 1
         maxZ = self.vol.shape[2] - 1
         maxB = self.vol.shape[3] - 1
       
-        
+        # Build the image, crosshair lines and ROI box once per plane
+        self.ax['image'].clear()
+        self.image = self.ax['image'].imshow(self.vol[:,:,0,0], cmap=plt.get_cmap(self.cmap), 
+            vmin=self.v[0], vmax=self.v[1])
+        self.xLine = self.ax['image'].axhline(0, color='b')
+        self.yLine = self.ax['image'].axvline(0, color='r')
+        self.roiBox = matplotlib.patches.Rectangle((0, 0), 0, 0, fill=False, edgecolor='y')
+        self.ax['image'].add_patch(self.roiBox)
         
         ipyw.interact(self.plot_slice, 
             y=ipyw.IntSlider(value=0,min=0, max=maxY, step=1, continuous_update=True, 
@@ -331,26 +553,130 @@ class SpectralBinViewer:
             z=ipyw.IntSlider(value=0,min=0, max=maxZ, step=1, continuous_update=True, 
             description='View Slice:'),
             b=ipyw.IntSlider(value=0,min=0, max=maxB, step=1, continuous_update=True, 
-            description='View Bin:'))
+            description='View Bin:'),
+            r=ipyw.IntSlider(value=0,min=0, max=max(maxX, maxY)//2, step=1, continuous_update=True, 
+            description='ROI Radius:'),
+            mode=ipyw.Dropdown(options=['Bin', 'Energy Weighted'], value='Bin',
+            description='Image:'))
         
         
-    def plot_slice(self,x,y,z,b):
+    def plot_slice(self,x,y,z,b,r,mode):
         # Plot slice for the given plane and slice
-        self.fig = plt.figure(figsize=self.figsize)
-        plt.imshow(self.vol[:,:,z,b], cmap=plt.get_cmap(self.cmap), 
-            vmin=self.v[0], vmax=self.v[1])
+        if mode == 'Bin':
+            self.image.set_data(self.vol[:,:,z,b])
+        else:
+            weighted = orientedVolume(self.weightedViews, self.get_weighted(), self.view, self.contiguous)
+            self.image.set_data(weighted[:,:,z])
+        
+        self.xLine.set_ydata([x, x])
+        self.yLine.set_xdata([y, y])
+
+        # ROI rows x0..x1-1 and columns y0..y1-1 around the crosshair
+        x0, x1 = max(x-r, 0), min(x+r+1, self.vol.shape[0])
+        y0, y1 = max(y-r, 0), min(y+r+1, self.vol.shape[1])
+        self.roiBox.set_bounds(y0-0.5, x0-0.5, y1-y0, x1-x0)
         
-        maxX = self.vol.shape[0] - 1
-        maxY = self.vol.shape[1] - 1
+        spectrum = roiSum(self.get_sat(z), x0, x1, y0, y1) / ((x1-x0)*(y1-y0))
+        updateProfile(self.spectrum, spectrum)
+        self.binLine.set_xdata([b, b])
+        
+        showFigure(self.fig)
+
+
+class ImageStreamViewer3D:
+    """
+    ImageStreamViewer3D is for viewing large volumetric image slices in jupyter
+    notebooks over a remote kernel.
+
+    Each slice is windowed with NumPy and sent as a compressed PNG or JPEG to an
+    ipywidgets.Image instead of being drawn by matplotlib. Recently encoded slices
+    are kept, and while a slider is moving a slice is only encoded once the slider
+    rests for debounce seconds.
+
+    Argumentss:
+    Volume = 3D input image
+    mini, maxi = initial display range
+    fmt = default('png'), 'png' (lossless) or 'jpeg' (smaller)
+    quality = default(85), JPEG quality
+    cacheSize = default(64), number of encoded slices kept
+    debounce = default(0.05), seconds without slider movement before encoding a new slice
+    width = default(512), display width in pixels
+    contiguous = default(False), keep a contiguous copy per slice plane
+
+    """
+
+    def __init__(self, volume, mini, maxi, fmt='png', quality=85, cacheSize=64, debounce=0.05, width=512, contiguous=False):
+        self.volume = volume
+        self.contiguous = contiguous
+        self.views = {}
+        self.v = [mini, maxi]
+        self.fmt = fmt.lower()
+        self.quality = quality
+        self.cacheSize = cacheSize
+        self.debounce = debounce
+        self.cache = OrderedDict()
+        self.timer = None
+        self.lock = threading.Lock()
+
+        self.viewButtons = ipyw.RadioButtons(
+            options=['x-y','y-z', 'z-x'], value='x-y',
+            description='Slice plane selection:', disabled=False,
+            style={'description_width': 'initial'})
+        self.sliceSlider = ipyw.IntSlider(min=0, max=0, step=1, continuous_update=True,
+            description='Image Slice:')
+        self.rangeSlider = ipyw.FloatRangeSlider(min=mini, max=maxi,
+            readout_format='1.3f', value=[mini, maxi], step=(maxi-mini)/100 or 1,
+            continuous_update=True, description='Disp Rng:', layout={'width':'350px'})
+        self.image = ipyw.Image(format=self.fmt, layout={'width':'%dpx' % width})
+
+        self.view_selection({'new': self.viewButtons.value})
+        self.viewButtons.observe(self.view_selection, names='value')
+        self.sliceSlider.observe(self.slider_change, names='value')
+        self.rangeSlider.observe(self.slider_change, names='value')
+
+        display(ipyw.VBox([self.viewButtons, self.sliceSlider, self.rangeSlider, self.image]))
+
+    def view_selection(self, change):
+        # Index the volume in the slice plane selection, no transpose
+        self.view = change['new']
+        self.vol = orientedVolume(self.views, self.volume, self.view, self.contiguous)
+        maxZ = self.vol.shape[2] - 1
+        if self.sliceSlider.value > maxZ:
+            self.sliceSlider.value = maxZ
+        self.sliceSlider.max = maxZ
+        self.show_slice()
+
+    def slider_change(self, change):
+        # Cached slices are shown right away, new ones wait until the slider rests
+        if self.get_key() in self.cache:
+            self.show_slice()
+            return
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = threading.Timer(self.debounce, self.show_slice)
+        self.timer.start()
 
-        yvec = np.arange(0,maxY)
-        xvec = np.ones(yvec.shape)*x
-        plt.plot(yvec,xvec,'bo')
+    def get_key(self):
+        lo, hi = self.rangeSlider.value
+        return (self.view, self.sliceSlider.value, lo, hi)
 
-        xvec = np.arange(0,maxX)
-        yvec = np.ones(xvec.shape)*y
-        plt.plot(yvec,xvec,'ro')
+    def encode_slice(self, key):
+        view, z, lo, hi = key
+        data = windowSlice(self.vol[:,:,z], lo, hi)
+        buf = io.BytesIO()
+        if self.fmt == 'png':
+            Image.fromarray(data).save(buf, format='png', compress_level=1)
+        else:
+            Image.fromarray(data).save(buf, format='jpeg', quality=self.quality)
+        return buf.getvalue()
 
-        self.fig2 = plt.figure(figsize=self.figsize)
-        plt.plot(self.vol[x,y,z,:],'bo')
-        plt.title("Bin Profile")
+    def show_slice(self):
+        with self.lock:
+            key = self.get_key()
+            if key in self.cache:
+                self.cache.move_to_end(key)
+            else:
+                self.cache[key] = self.encode_slice(key)
+                if len(self.cache) > self.cacheSize:
+                    self.cache.popitem(last=False)
+            self.image.value = self.cache[key]
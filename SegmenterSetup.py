@@ -15,6 +15,9 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import nibabel as nib
 import SimpleITK as sitk
+import dicomLoader
+import volumeCache
+import viewerCore
 import PyQt5
 
 import scipy.ndimage
@@ -43,191 +46,34 @@ __author__ = ""
 __version__ = ""
 
 
-class QtImageViewer(QGraphicsView):
-    """ PyQt image viewer widget for a QPixmap in a QGraphicsView scene with mouse zooming and panning.
-
-    Displays a QImage or QPixmap (QImage is internally converted to a QPixmap).
-    To display any other image format, you must first convert it to a QImage or QPixmap.
-
-    Some useful image format conversion utilities:
-        qimage2ndarray: NumPy ndarray <==> QImage    (https://github.com/hmeine/qimage2ndarray)
-        ImageQt: PIL Image <==> QImage  (https://github.com/python-pillow/Pillow/blob/master/PIL/ImageQt.py)
-
-    Mouse interaction:
-        Left mouse button drag: Pan image.
-        Right mouse button drag: Zoom box.
-        Right mouse button doubleclick: Zoom to show entire image.
+class QtImageViewer(viewerCore.ViewerCore):
+    """ Image viewer for the seed segmentation of Segmenter. Orientation 1 steps through
+    y, orientation 2 through z. See viewerCore.ViewerCore for the shared viewer.
     """
-
-    # Mouse button signals emit image scene (x, y) coordinates.
-    # !!! For image (row, column) matrix indexing, row = y and column = x.
-    leftMouseButtonPressed = pyqtSignal(float, float)
-    rightMouseButtonPressed = pyqtSignal(float, float)
-    leftMouseButtonReleased = pyqtSignal(float, float)
-    rightMouseButtonReleased = pyqtSignal(float, float)
-    leftMouseButtonDoubleClicked = pyqtSignal(float, float)
-    rightMouseButtonDoubleClicked = pyqtSignal(float, float)
+    
+    ORIENTATION_AXES = {1: 1,    #x-z
+                        2: 2,    #x-y
+                        3: 0}    #y-z
     
     def __init__(self):
-        QGraphicsView.__init__(self)
-
-        # Image is displayed as a QPixmap in a QGraphicsScene attached to this QGraphicsView.
-        self.scene = QGraphicsScene()
-        self.setScene(self.scene)
-        
-        #set the focus to this viewer
-        self.setFocusPolicy(Qt.StrongFocus)
-
-        # Store a local handle to the scene's current image pixmap.
-        self._pixmapHandle = None
-
-        # Image aspect ratio mode.
-        # !!! ONLY applies to full image. Aspect ratio is always ignored when zooming.
-        #   Qt.IgnoreAspectRatio: Scale image to fit viewport.
-        #   Qt.KeepAspectRatio: Scale image to fit inside viewport, preserving aspect ratio.
-        #   Qt.KeepAspectRatioByExpanding: Scale image to fill the viewport, preserving aspect ratio.
-        self.aspectRatioMode = Qt.KeepAspectRatio
-
-        # Scroll bar behaviour.
-        #   Qt.ScrollBarAlwaysOff: Never shows a scroll bar.
-        #   Qt.ScrollBarAlwaysOn: Always shows a scroll bar.
-        #   Qt.ScrollBarAsNeeded: Shows a scroll bar only when zoomed.
-        #self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        #self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-
-        # Stack of QRectF zoom boxes in scene coordinates.
-        self.zoomStack = []
+        viewerCore.ViewerCore.__init__(self)
         
         # -------------------
-        self.__fileName = None
-        self.__imageData = None
         self.__segData = None
         self.__segBox = None
         self.__segInfo = None
-        self.__pixeldims = None
-        self.__pixelspacing = None
-        self.__imgorientation = 1
-        self.__curSlice = 0
         self.__bboxIP = 0.2
         self.__bboxSL = 0.95
         
-#        # -------------------
-#        self.__crossshow = False
-#        self.__lineX = QLineF()
-#        self.__lineY = QLineF()
-        
-#        # -------------------
-#        self.__crosshair = 0
-#        self.__thruPlane = 0
-#        self.__vert = 0
-#        self.__horiz = 0
-        self.__flipX = False
-        self.__flipY = False
-        self.__rotateAngle = 270
-        
-        # -------------------
-        self.__winlevel = 0
-        self.__winwidth = 256
-        
         self.__ROITemplate = None
 
-        # Flags for enabling/disabling mouse interaction.
-        self.canZoom = True
-        self.canPan = True
-
-    def hasImage(self):
-        """ Returns whether or not the scene contains an image pixmap.
-        """
-        return self._pixmapHandle is not None
-
-    def clearImage(self):
-        """ Removes the current image pixmap from the scene if it exists.
-        """
-        if self.hasImage():
-            self.scene.removeItem(self._pixmapHandle)
-            self._pixmapHandle = None
-
-    def pixmap(self):
-        """ Returns the scene's current image pixmap as a QPixmap, or else None if no image exists.
-        :rtype: QPixmap | None
-        """
-        if self.hasImage():
-            return self._pixmapHandle.pixmap()
-        return None
-
-    def image(self):
-        """ Returns the scene's current image pixmap as a QImage, or else None if no image exists.
-        :rtype: QImage | None
-        """
-        if self.hasImage():
-            return self._pixmapHandle.pixmap().toImage()
-        return None
-
-    def setImage(self, image):
-        """ Set the scene's current image pixmap to the input QImage or QPixmap.
-        Raises a RuntimeError if the input image has type other than QImage or QPixmap.
-        :type image: QImage | QPixmap
-        """
-        if type(image) is QPixmap:
-            pixmap = image
-        elif type(image) is QImage:
-            pixmap = QPixmap.fromImage(image)
-        else:
-            raise RuntimeError("ImageViewer.setImage: Argument must be a QImage or QPixmap.")
-        
-        if self.hasImage():
-            self._pixmapHandle.setPixmap(pixmap)
-        else:
-            self._pixmapHandle = self.scene.addPixmap(pixmap)
-            
-        self.setSceneRect(QRectF(pixmap.rect()))  # Set scene size to image size.
-        #self.setSliceOrientation(self.__imgorientation)
-        self.updateViewer()
-        
-
     def setOrientation(self,orient):
         
-        self.__imgorientation = orient
+        self._imgorientation = orient
         
 #removed lots of never used code. See CompareSetup if you think you need something that is gone.
 
     
-    def setWindowLevel(self, value):
-        self.__winlevel = value
-        self.imgWindowChange(self.__winlevel, self.__winwidth)
-        
-    def setWindowWidth(self, value):
-        self.__winwidth = value
-        self.imgWindowChange(self.__winlevel, self.__winwidth)
-    
-    def getWindowLevel(self):
-        return self.__winlevel
-        
-    def getWindowWidth(self):
-        return self.__winwidth        
-        
-    def imgWindowChange(self, winowlevel, windowwidth):
-        self.__winlevel = winowlevel
-        self.__winwidth = windowwidth
-        
-        self.setSlice(self.__curSlice)            
-    
-    def imgProcessing(self, data):
-        # display levels
-        nlevels = 256    #int8
-        bpp = 8
-        
-        y_min = 0
-        y_max = nlevels -1 
-        
-        dout = ((data - (self.__winwidth/2+self.__winlevel - 0.5))/(self.__winwidth - 1) + 0.5) * (y_max-y_min) + y_min
-        
-        dout[dout<y_min] = y_min
-        dout[dout>y_max] = y_max
-        
-        return dout.astype(np.uint8)
-        
-    
     def segmentImageCallback(self,row,column,thSet,procThree, procAdd):
         
     
@@ -236,11 +82,11 @@ class QtImageViewer(QGraphicsView):
             print('ThreeD Segmentation')
         
             #BS needs to be recalculated based on orientation
-            if(self.__imgorientation == 1):
+            if(self._imgorientation == 1):
                 seedx = self.getImgHeight()-1-row
                 seedy = self.getCurSlice()
                 seedz = column
-            elif(self.__imgorientation == 2):
+            elif(self._imgorientation == 2):
                 print("Segmentation for this orientation has not been tested!")
                 seedx = self.getCurSlice()
                 seedz = column 
@@ -253,7 +99,7 @@ class QtImageViewer(QGraphicsView):
                 seedz = self.getCurSlice()
             
             print('Shape and Seeds')
-            print('   {}'.format(self.__imageData.shape))
+            print('   {}'.format(self._imageData.shape))
             print('   {},{},{}'.format(seedx,seedy,seedz))
             
             #sitk.WriteImage(sitk.GetImageFromArray(thisSlicePlane),'origImg.nii')
@@ -294,7 +140,7 @@ class QtImageViewer(QGraphicsView):
             
             #thisSlicePlane = 0
             
-            #self.__imageData[:,:,self.getCurSlice()] = thisSlicePlane
+            #self._imageData[:,:,self.getCurSlice()] = thisSlicePlane
 
             self.__segInfo = self.__segInfo*0.0
             self.__segInfo[0,self.getCurSlice()] = seedx
@@ -303,7 +149,7 @@ class QtImageViewer(QGraphicsView):
             self.__segInfo[3,self.getCurSlice()] = self.__bboxSL
             self.__segInfo[4,self.getCurSlice()] = thSet
 
-            self.__imageData = volVis2
+            self._imageData = volVis2
             self.__segData = segVolOut
             self.__segBox = segBox
 
@@ -317,9 +163,9 @@ class QtImageViewer(QGraphicsView):
             seedy = self.getImgHeight()-1-row
             seedx = column
             
-            if(self.__imgorientation == 1):
+            if(self._imgorientation == 1):
                 thisSlicePlane = self.__imageDataOrig[:,self.getCurSlice(),:]
-            elif(self.__imgorientation == 2):
+            elif(self._imgorientation == 2):
                 thisSlicePlane = self.__imageDataOrig[:,:,self.getCurSlice()]
             else:
                 thisSlicePlane = self.__imageDataOrig[self.getCurSlice(),:,:]
@@ -340,9 +186,9 @@ class QtImageViewer(QGraphicsView):
             
             segBox = self.drawSegBox2D(thisSlicePlane,seedx,seedy)
             oldSegSliceOut = []
-            if(self.__imgorientation == 1):
+            if(self._imgorientation == 1):
                 oldSegSliceOut = self.__segData[:,self.getCurSlice(),:] 
-            elif(self.__imgorientation == 2):
+            elif(self._imgorientation == 2):
                 oldSegSliceOut = self.__segData[:,:,self.getCurSlice()] 
             else:
                 oldSegSliceOut = self.__segData[self.getCurSlice(),:,:] 
@@ -367,7 +213,7 @@ class QtImageViewer(QGraphicsView):
             #thisSlicePlane = 0
             
            
-            #self.__imageData[:,:,self.getCurSlice()] = thisSlicePlane
+            #self._imageData[:,:,self.getCurSlice()] = thisSlicePlane
            
             self.__segInfo[0,self.getCurSlice()] = seedx
             self.__segInfo[1,self.getCurSlice()] = seedy
@@ -375,28 +221,28 @@ class QtImageViewer(QGraphicsView):
             self.__segInfo[2,self.getCurSlice()] = self.__bboxIP
             self.__segInfo[3,self.getCurSlice()] = self.__bboxSL
             self.__segInfo[4,self.getCurSlice()] = thSet
-            if(self.__imgorientation == 1):
-                self.__imageData[:,self.getCurSlice(),:] = sliceVis2
+            if(self._imgorientation == 1):
+                self._imageData[:,self.getCurSlice(),:] = sliceVis2
                 self.__segData[:,self.getCurSlice(),:] = segSliceOut
                 self.__segBox[:,self.getCurSlice(),:] = segBox
-            elif(self.__imgorientation == 2):
-                self.__imageData[:,:,self.getCurSlice()] = sliceVis2
+            elif(self._imgorientation == 2):
+                self._imageData[:,:,self.getCurSlice()] = sliceVis2
                 self.__segData[:,:,self.getCurSlice()] = segSliceOut
                 self.__segBox[:,:,self.getCurSlice()] = segBox
             else:
     
-                self.__imageData[self.getCurSlice(),:,:] = sliceVis2
+                self._imageData[self.getCurSlice(),:,:] = sliceVis2
                 self.__segData[self.getCurSlice(),:,:] = segSliceOut
                 self.__segBox[self.getCurSlice(),:,:] = segBox
 
            
             print('Data saved')
            
-            #sitk.WriteImage(sitk.GetImageFromArray(np.transpose(self.__imageData, axes=[2,1,0])),'fullSegVis3D.nii')
+            #sitk.WriteImage(sitk.GetImageFromArray(np.transpose(self._imageData, axes=[2,1,0])),'fullSegVis3D.nii')
            
-            #self.__imageData[:,:,self.getCurSlice] = np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[1,0])
+            #self._imageData[:,:,self.getCurSlice] = np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[1,0])
         
-        self.setSlice(self.__curSlice)
+        self.setSlice(self._curSlice)
     
     
     def drawSegBox2D(self,sliceIn,seedx,seedy):
@@ -445,11 +291,11 @@ class QtImageViewer(QGraphicsView):
 
         volShape = volIn.shape
         
-        if(self.__imgorientation == 1):
+        if(self._imgorientation == 1):
             cSizeX = np.round(self.__bboxIP*volShape[0])
             cSizeY = np.round(self.__bboxSL*volShape[1])
             cSizeZ = np.round(self.__bboxIP*volShape[2])
-        elif(self.__imgorientation == 2):
+        elif(self._imgorientation == 2):
             cSizeX = np.round(self.__bboxIP*volShape[2])
             cSizeY = np.round(self.__bboxIP*volShape[0])
             cSizeZ = np.round(self.__bboxSL*volShape[1])
@@ -507,10 +353,10 @@ class QtImageViewer(QGraphicsView):
         #edgebox = sitk.GetArrayFromImage(edge)
         #boxSeg[z0-1,:,:] = edgebox
         #nevermind, there's a way easier way
-        if(self.__imgorientation == 1):
+        if(self._imgorientation == 1):
             boxSeg[:,y0,:] = boxSeg[:,y0+1,:]
             boxSeg[:,y1,:] = boxSeg[:,y1-1,:]
-        elif(self.__imgorientation == 2):
+        elif(self._imgorientation == 2):
             #like everywhere else, orientation 2 still needs to be straightened out
             boxSeg[:,:,x0] = boxSeg[:,:,x0+1]
             boxSeg[:,:,x1]=boxSeg[:,:,x1-1]
@@ -528,14 +374,14 @@ class QtImageViewer(QGraphicsView):
         volShape = volIn.shape
         
         print("{}: volShape:  {}".format(inspect.stack()[0][3],volShape))
-        print("{}: imgorient: {}".format(inspect.stack()[0][3],self.__imgorientation))
+        print("{}: imgorient: {}".format(inspect.stack()[0][3],self._imgorientation))
         print("{}: seeds:     {},{},{}".format(inspect.stack()[0][3],seedx,seedy,seedz))
         
-        if(self.__imgorientation == 1):
+        if(self._imgorientation == 1):
             cSizeX = np.round(self.__bboxIP*volShape[0])
             cSizeY = np.round(self.__bboxSL*volShape[1])
             cSizeZ = np.round(self.__bboxIP*volShape[2])
-        elif(self.__imgorientation == 2):
+        elif(self._imgorientation == 2):
             cSizeX = np.round(self.__bboxIP*volShape[1])
             cSizeY = np.round(self.__bboxSL*volShape[2])
             cSizeZ = np.round(self.__bboxIP*volShape[0])
@@ -822,10 +668,10 @@ class QtImageViewer(QGraphicsView):
         #orientation - there is a still a bug here somewhere
         #seems to vary depending on the input file orientation
         #I think this is now all handled correctly in the load.
-        print("Orientation {}".format(self.__imgorientation))
-        if(self.__imgorientation == 1):
+        print("Orientation {}".format(self._imgorientation))
+        if(self._imgorientation == 1):
             sitk_image = sitk.GetImageFromArray(np.transpose(self.__segData, axes=[0,1,2]))
-        elif(self.__imgorientation == 2):
+        elif(self._imgorientation == 2):
             #print("Orientation 2: This one is wrong, needs to be fixed if you're using it.")
             sitk_image = sitk.GetImageFromArray(np.transpose(self.__segData, axes=[0,1,2]))
         else:
@@ -834,7 +680,7 @@ class QtImageViewer(QGraphicsView):
         #use th template if possible
         if(self.__ROITemplate != None):
             print("Copying header.")
-            sitk_image.CopyInformation(self.__ROITemplate)
+            sitk_image.CopyInformation(sitk.ReadImage(self.__ROITemplate))
         else:
             print("Did not copy header.")
         sitk.WriteImage(sitk_image,niiFile)
@@ -854,21 +700,21 @@ class QtImageViewer(QGraphicsView):
             pStr ='Resampling image volume to higher resolution by factors %f and %f ' % (ipFact,slFact)
             print(pStr)
         
-            print("{}: input last slice sum:  {}".format(inspect.stack()[0][3],np.sum(self.__imageData[:,:,-1])))
-            print("{}: input 2last slice sum:  {}".format(inspect.stack()[0][3],np.sum(self.__imageData[:,:,-2])))
-            print("{}: input 3last slice sum:  {}".format(inspect.stack()[0][3],np.sum(self.__imageData[:,:,-3])))
+            print("{}: input last slice sum:  {}".format(inspect.stack()[0][3],np.sum(self._imageData[:,:,-1])))
+            print("{}: input 2last slice sum:  {}".format(inspect.stack()[0][3],np.sum(self._imageData[:,:,-2])))
+            print("{}: input 3last slice sum:  {}".format(inspect.stack()[0][3],np.sum(self._imageData[:,:,-3])))
             
-            sitk_image = sitk.GetImageFromArray(self.__imageData)
-            sitk_image.SetSpacing([float(self.__pixelspacing[2]), \
-                                    float(self.__pixelspacing[1]), \
-                                    float(self.__pixelspacing[0])])
+            sitk_image = sitk.GetImageFromArray(self._imageData)
+            sitk_image.SetSpacing([float(self._pixelspacing[2]), \
+                                    float(self._pixelspacing[1]), \
+                                    float(self._pixelspacing[0])])
             print("{}: spacing:  {}".format(inspect.stack()[0][3],sitk_image.GetSpacing()))
             num_dim = sitk_image.GetDimension()
             orig_pixelid = sitk_image.GetPixelIDValue()
             orig_origin = sitk_image.GetOrigin()
             orig_direction = sitk_image.GetDirection()
             orig_spacing = sitk_image.GetSpacing()
-            orig_size = np.array(sitk_image.GetSize(), dtype=np.int)
+            orig_size = np.array(sitk_image.GetSize(), dtype=int)
         
             print(orig_spacing)
             if(ipFact == 1.0 and slFact == 1.0):
@@ -879,10 +725,11 @@ class QtImageViewer(QGraphicsView):
                 new_size = orig_size*(np.array(orig_spacing)/np.array(new_spacing))
             sitk_interpolator = sitk.sitkLinear
         
-            new_size = np.ceil(new_size).astype(np.int) #  Image dimensions are in integers
+            new_size = np.ceil(new_size).astype(int) #  Image dimensions are in integers
             new_size = [int(s) for s in new_size] #  SimpleITK expects lists, not ndarrays
         
             resample_filter = sitk.ResampleImageFilter()
+            resample_filter.SetNumberOfThreads(os.cpu_count())
         
             #update for sitk 2.0.2 - not yet tested
             resample_filter.SetSize(new_size)
@@ -890,15 +737,10 @@ class QtImageViewer(QGraphicsView):
             resample_filter.SetInterpolator(sitk_interpolator)
             resample_filter.SetOutputOrigin(orig_origin)
             resample_filter.SetOutputSpacing(new_spacing)
-            resample_filter.SetOutputOrigin(orig_direction)
+            resample_filter.SetOutputDirection(orig_direction)
             resample_filter.SetOutputPixelType(orig_pixelid)
             resampled_sitk_image = resample_filter.Execute(sitk_image)
             
-            
-            tmp=np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0])
-            print("{}: lstSlice:  {}".format(inspect.stack()[0][3],np.sum(tmp[-1,:,:])))
-            print("{}: 2lstSlice:  {}".format(inspect.stack()[0][3],np.sum(tmp[-2,:,:])))
-            print("{}: 3lstSlice:  {}".format(inspect.stack()[0][3],np.sum(tmp[-3,:,:])))
         
     #         resampled_sitk_image = resample_filter.Execute(sitk_image,
     #                                                        new_size,
@@ -910,46 +752,35 @@ class QtImageViewer(QGraphicsView):
     #                                                        0,
     #                                                        orig_pixelid)
                                                         
-            self.__imageData = np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0])
-            self.__pixeldims = self.__imageData.shape
-            self.__pixelspacing = new_spacing
-            self.__winlevel = self.__imageData.min()
-            self.__winwidth = self.__imageData.max()-self.__imageData.min()
+            # transpose is only a view of the resampled array, no copy
+            self._imageData = np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0])
+            print("{}: lstSlice:  {}".format(inspect.stack()[0][3],np.sum(self._imageData[-1,:,:])))
+            print("{}: 2lstSlice:  {}".format(inspect.stack()[0][3],np.sum(self._imageData[-2,:,:])))
+            print("{}: 3lstSlice:  {}".format(inspect.stack()[0][3],np.sum(self._imageData[-3,:,:])))
+            self._pixeldims = self._imageData.shape
+            self._pixelspacing = new_spacing
+            self._winlevel = self._imageData.min()
+            self._winwidth = self._imageData.max().item()-self._imageData.min().item()
 
         else:
             pStr ='No resampling, factors are %f and %f ' % (ipFact,slFact)
             print(pStr)
 
-            sitk_image = sitk.GetImageFromArray(self.__imageData)
-            sitk_image.SetSpacing([float(self.__pixelspacing[2]), \
-                                    float(self.__pixelspacing[1]), \
-                                    float(self.__pixelspacing[0])])
-            #print("{}: spacing:  {}".format(inspect.stack()[0][3],sitk_image.GetSpacing()))
-            num_dim = sitk_image.GetDimension()
-            orig_pixelid = sitk_image.GetPixelIDValue()
-            orig_origin = sitk_image.GetOrigin()
-            orig_direction = sitk_image.GetDirection()
-            orig_spacing = sitk_image.GetSpacing()
-            orig_size = np.array(sitk_image.GetSize(), dtype=np.int)
-            new_spacing = orig_spacing
-            new_size = orig_size
-            new_size = [int(s) for s in new_size] #  SimpleITK expects lists, not ndarrays
-        
-            resample_filter = sitk.ResampleImageFilter()
-                                                        
-            self.__imageData = np.transpose(sitk.GetArrayFromImage(sitk_image), axes=[2,1,0])
-            self.__pixeldims = self.__imageData.shape
-            self.__pixelspacing = new_spacing
-            self.__winlevel = self.__imageData.min()
-            self.__winwidth = self.__imageData.max()-self.__imageData.min()
+            # same (z,y,x) layout as the resampled volume, as a view instead of two sitk copies
+            self._imageData = np.transpose(self._imageData, axes=[2,1,0])
+            new_spacing = tuple(float(z) for z in self._pixelspacing[2::-1])
+            self._pixeldims = self._imageData.shape
+            self._pixelspacing = new_spacing
+            self._winlevel = self._imageData.min()
+            self._winwidth = self._imageData.max().item()-self._imageData.min().item()
 
 
 
 
 
-#        self.__imgorientation = 1 # x-y
-#        self.__curSlice = self.__pixeldims[2]//2
-#        self.setSlice(self.__curSlice)
+#        self._imgorientation = 1 # x-y
+#        self._curSlice = self._pixeldims[2]//2
+#        self.setSlice(self._curSlice)
                                                        
        
     
@@ -957,17 +788,17 @@ class QtImageViewer(QGraphicsView):
         
 #    def resampleImage(self, spacing=None,fill_value=0):
 #
-#        sitk_image = sitk.GetImageFromArray(self.__imageData)
-#        sitk_image.SetSpacing([float(self.__pixelspacing[2]), \
-#                               float(self.__pixelspacing[1]), \
-#                               float(self.__pixelspacing[0])])
+#        sitk_image = sitk.GetImageFromArray(self._imageData)
+#        sitk_image.SetSpacing([float(self._pixelspacing[2]), \
+#                               float(self._pixelspacing[1]), \
+#                               float(self._pixelspacing[0])])
 #
 #        num_dim = sitk_image.GetDimension()
 #        orig_pixelid = sitk_image.GetPixelIDValue()
 #        orig_origin = sitk_image.GetOrigin()
 #        orig_direction = sitk_image.GetDirection()
 #        orig_spacing = sitk_image.GetSpacing()
-#        orig_size = np.array(sitk_image.GetSize(), dtype=np.int)
+#        orig_size = np.array(sitk_image.GetSize(), dtype=int)
 #
 #        if spacing is None:
 #            min_spacing = min(orig_spacing)
@@ -978,7 +809,7 @@ class QtImageViewer(QGraphicsView):
 #        sitk_interpolator = sitk.sitkLinear
 #
 #        new_size = orig_size*(np.array(orig_spacing)/np.array(new_spacing))
-#        new_size = np.ceil(new_size).astype(np.int) #  Image dimensions are in integers
+#        new_size = np.ceil(new_size).astype(int) #  Image dimensions are in integers
 #        new_size = [int(s) for s in new_size] #  SimpleITK expects lists, not ndarrays
 #
 #        resample_filter = sitk.ResampleImageFilter()
@@ -993,14 +824,14 @@ class QtImageViewer(QGraphicsView):
 #                                                       fill_value,
 #                                                       orig_pixelid)
 #
-#        self.__imageData = np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0])
-#        self.__pixeldims = self.__imageData.shape
-#        self.__pixelspacing = [new_spacing,new_spacing,new_spacing]
-#        self.__winlevel = self.__imageData.min()
-#        self.__winwidth = self.__imageData.max()-self.__imageData.min()
-#        self.__imgorientation = 1 # x-y
-#        self.__curSlice = self.__pixeldims[2]//2
-#        self.setSlice(self.__curSlice)
+#        self._imageData = np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0])
+#        self._pixeldims = self._imageData.shape
+#        self._pixelspacing = [new_spacing,new_spacing,new_spacing]
+#        self._winlevel = self._imageData.min()
+#        self._winwidth = self._imageData.max().item()-self._imageData.min().item()
+#        self._imgorientation = 1 # x-y
+#        self._curSlice = self._pixeldims[2]//2
+#        self.setSlice(self._curSlice)
 
 
 
@@ -1014,9 +845,9 @@ class QtImageViewer(QGraphicsView):
             print("{}: input 3last slice sum:  {}".format(inspect.stack()[0][3],np.sum(myImg[:,:,-3])))
             sitk_image = sitk.GetImageFromArray(myImg)
             #should be corrected when loading the initial nifti
-            sitk_image.SetSpacing([float(self.__pixelspacing[0]), \
-                                    float(self.__pixelspacing[1]), \
-                                    float(self.__pixelspacing[2])])
+            sitk_image.SetSpacing([float(self._pixelspacing[0]), \
+                                    float(self._pixelspacing[1]), \
+                                    float(self._pixelspacing[2])])
             
             print("{}: spacing:  {}".format(inspect.stack()[0][3],sitk_image.GetSpacing()))
             
@@ -1027,7 +858,7 @@ class QtImageViewer(QGraphicsView):
             orig_direction = sitk_image.GetDirection()
             orig_spacing = sitk_image.GetSpacing()
             print("{}: spacing:  {}".format(inspect.stack()[0][3],orig_spacing))
-            orig_size = np.array(sitk_image.GetSize(), dtype=np.int)
+            orig_size = np.array(sitk_image.GetSize(), dtype=int)
             print("{}: orig_size:  {}".format(inspect.stack()[0][3],orig_size))
             
             #print("{}: lstSlice:  {}".format(inspect.stack()[0][3],np.sum(myImg[-1,:,:])))
@@ -1038,11 +869,12 @@ class QtImageViewer(QGraphicsView):
             sitk_interpolator = sitk.sitkNearestNeighbor
         
             new_size = orig_size*(np.array(orig_spacing)/np.array(new_spacing))
-            new_size = np.ceil(new_size).astype(np.int) #  Image dimensions are in integers
+            new_size = np.ceil(new_size).astype(int) #  Image dimensions are in integers
             new_size = [int(s) for s in new_size] #  SimpleITK expects lists, not ndarrays
             print("{}: new_size:  {}".format(inspect.stack()[0][3],new_size))
         
             resample_filter = sitk.ResampleImageFilter()
+            resample_filter.SetNumberOfThreads(os.cpu_count())
         
             #update for sitk 2.0.2 - not yet tested
             resample_filter.SetSize(new_size)
@@ -1050,238 +882,50 @@ class QtImageViewer(QGraphicsView):
             resample_filter.SetInterpolator(sitk_interpolator)
             resample_filter.SetOutputOrigin(orig_origin)
             resample_filter.SetOutputSpacing(new_spacing)
-            resample_filter.SetOutputOrigin(orig_direction)
+            resample_filter.SetOutputDirection(orig_direction)
             resample_filter.SetOutputPixelType(orig_pixelid)
             resampled_sitk_image = resample_filter.Execute(sitk_image)
             
-            tmp=np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0])
-            print("{}: lstSlice:  {}".format(inspect.stack()[0][3],np.sum(tmp[-1,:,:])))
-            print("{}: 2lstSlice:  {}".format(inspect.stack()[0][3],np.sum(tmp[-2,:,:])))
-            print("{}: 3lstSlice:  {}".format(inspect.stack()[0][3],np.sum(tmp[-3,:,:])))
+            segData = np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0])
+            print("{}: lstSlice:  {}".format(inspect.stack()[0][3],np.sum(segData[-1,:,:])))
+            print("{}: 2lstSlice:  {}".format(inspect.stack()[0][3],np.sum(segData[-2,:,:])))
+            print("{}: 3lstSlice:  {}".format(inspect.stack()[0][3],np.sum(segData[-3,:,:])))
                                                        
-            return(np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0]))
+            return segData
         else:
             print("Segmentation is already at correct spacing")
             return np.transpose(myImg, axes=[2,1,0])
 #    def setCrossShow(self, value):
 #        if value == 0:
-#            self.__crossshow = False
+#            self._crossshow = False
 #        else:
-#            self.__crossshow = True
+#            self._crossshow = True
 #
-    def getImageMaximum(self):
-        if self.__imageData is not None:
-            return self.__imageData.max()
-        else:
-            return 0
-        
-    def getImageMinimum(self):
-        if self.__imageData is not None:
-            return self.__imageData.min()
-        else:
-            return 0  
-        
-    def getWinLevelRange(self):
-        if self.__imageData is None:
-            return [0,1]
-        else:
-            return [self.__imageData.min(), self.__imageData.max()]  
-    
-    def getWinWidthRange(self):
-        if self.__imageData is None:
-            return [0,1]
-        else:
-            return [0, self.__imageData.max()-self.__imageData.min()]  
-            
-    def setSliceOrientation(self, orientation=9999):
-        print("or:{}    curSli:{}    shape:{}    or:{}".format(orientation, self.__curSlice, self.__imageData.shape, self.__imgorientation))
-        if orientation == 9999:
-            orientation = self.__imgorientation
-        if orientation == 1:
-            self.__imgorientation = 1
-            #self.setSliceOrientationToXY()
-            self.setSliceOrientationToXZ()
-        elif orientation == 2:   
-            self.__imgorientation = 2
-            #self.setSliceOrientationToXZ()
-            self.setSliceOrientationToXY()
-        else:
-            self.__imgorientation = 3
-            self.setSliceOrientationToYZ()
-    
-    def setSliceOrientationToXY(self):
-        self.__imgorientation = 2
-        if (self.__imageData is not None):
-            self.__curSlice = int(np.round(self.__pixeldims[2]/2))
-            self.setSlice(self.__curSlice)
-            
-    
-    def setSliceOrientationToXZ(self):
-        self.__imgorientation = 1
-        if (self.__imageData is not None):
-            self.__curSlice = int(np.round(self.__pixeldims[1]/2))
-            #print('INTO XZ')
-            #print(self.__curSlice)
-            self.setSlice(self.__curSlice) 
-    
-    def setSliceOrientationToYZ(self):
-        self.__imgorientation = 3
-        if (self.__imageData is not None):
-            self.__curSlice = int(np.round(self.__pixeldims[0]//2))
-            self.setSlice(self.__curSlice) 
-        
-    def setFlipX(self, value):
-        self.__flipX = value
-        self.setSlice(self.__curSlice) 
-    
-    def setFlipY(self, value):
-        self.__flipY = value
-        self.setSlice(self.__curSlice)   
-    
-    def setRotateAngle(self, value):
-        self.__rotateAngle = value
-        self.setSlice(self.__curSlice)  
-        
-    def getRotateAngle(self):
-        return self.__rotateAngle
-    
-    def getCurSlice(self):
-        return self.__curSlice
-    
-    def getImgOrientation(self):
-        return self.__imgorientation
+    def setSliceOrientation(self, orientation=None):
+        """ Without an orientation the current one is shown again.
+        """
+        if orientation is None:
+            orientation = self._imgorientation
+        if orientation not in (1, 2):
+            orientation = 3
+        viewerCore.ViewerCore.setSliceOrientation(self, orientation)
     
 #    def getCrosshair(self):
-#        return self.__crosshair
+#        return self._crosshair
        
-    def get_qimage(self,image:np.ndarray):
-#         assert (np.max(image) <= 256)
-        image8 = image.astype(np.uint8, order='C', casting='unsafe')
-        height, width = image8.shape
-        bytesPerLine = width
-        image = QImage(image8.data, width, height, bytesPerLine, QImage.Format_Indexed8)
-        return image
- 
     def setbbox(self, ipValue,slValue):
         self.__bboxIP = ipValue
         self.__bboxSL = slValue
  
-    def setSlice(self, slice):
-        if (self.__imageData is not None) and (slice>=self.getSliceMin() and slice<=self.getSliceMax()):
-            self.__curSlice = slice
-            #print(self.__imgorientation)
-            #print(slice)
-            if self.__imgorientation == 1:   #x-y
-#                 localData = self.__imageData[:,:,slice]
-                #print("test: {}   {}".format(self.__imageData.shape, slice))
-                #data = self.imgProcessing(self.__imageData[:,:,slice])  
-                data = self.imgProcessing(self.__imageData[:,slice,:])  
-                qimage = self.get_qimage(data)
-#                 qimage = qimage.mirrored(self.__flipX, self.__flipY)
-                rotate = QTransform()
-                rotate.rotate(self.__rotateAngle)
-                qimg = qimage.transformed(rotate)
-                self.setImage(qimg)                
-            elif self.__imgorientation == 2:  #x-z
-                #data = self.imgProcessing(self.__imageData[:,slice,:]) 
-                data = self.imgProcessing(self.__imageData[:,:,slice])              
-                qimage = self.get_qimage(data)
-#                 qimage = qimage.mirrored(self.__flipX, self.__flipY)   
-                rotate = QTransform()
-                rotate.rotate(self.__rotateAngle)
-                qimg = qimage.transformed(rotate)                
-                self.setImage(qimg) 
-            else:                          #y-z
-                data = self.imgProcessing(self.__imageData[slice,:,:])              
-                qimage = self.get_qimage(data)
-#                 qimage = qimage.mirrored(self.__flipX, self.__flipY)   
-                rotate = QTransform()
-                rotate.rotate(self.__rotateAngle)
-                qimg = qimage.transformed(rotate)                
-                self.setImage(qimg)   
-    
     #NOTE: I'm fairly certain one of the x,y combos is flipped in these two functions
     #probably orientation 2 should be 1 and 0 instead of 0 and 1
-    def getImgWidth(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]
-            else:
-                return 0            
-        
-    def getImgHeight(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]
-            else:
-                return 0  
-        
-    def getSliceMin(self):
-        return 0
-    
-    def getSliceMax(self):
-        #print('into get slicemax')
-        #print(self.getCurSlice())
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]-1
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]-1
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]-1
-            else:
-                return 0
-    
-    def getSliceRange(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]
-            else:
-                return 0
-            
     def get_bboxIP(self):
         return self.__bboxIP
     
     def get_bboxSL(self):
         return self.__bboxSL
     
-    def loadDicomSeries(self, folderName=""):  
+    def loadDicomSeries(self, folderName="", seriesID=None):  
         '''
         lstFilesDCM = []
             
@@ -1293,85 +937,82 @@ class QtImageViewer(QGraphicsView):
         # Get ref file
         RefDs = dicom.read_file(lstFilesDCM[0])
         
-        self.__pixeldims = [int(RefDs.Rows), int(RefDs.Columns), len(lstFilesDCM)]
-        self.__pixelspacing = [(float)(RefDs.PixelSpacing[0]), (float)(RefDs.PixelSpacing[1]), (float)(RefDs.SliceThickness)]
+        self._pixeldims = [int(RefDs.Rows), int(RefDs.Columns), len(lstFilesDCM)]
+        self._pixelspacing = [(float)(RefDs.PixelSpacing[0]), (float)(RefDs.PixelSpacing[1]), (float)(RefDs.SliceThickness)]
         
-        self.__imageData = np.zeros(self.__pixeldims, dtype=float)
-        self.__fileName = folderName
+        self._imageData = np.zeros(self._pixeldims, dtype=float)
+        self._fileName = folderName
     
         # It cannot read compressed dicom data
         for filenameDCM in lstFilesDCM:
             # read the file
             ds = dicom.read_file(filenameDCM)
             # store the raw image data
-            self.__imageData[:, :, lstFilesDCM.index(filenameDCM)] = ds.pixel_array    
+            self._imageData[:, :, lstFilesDCM.index(filenameDCM)] = ds.pixel_array    
         '''
-        reader = sitk.ImageSeriesReader()
-        series_ids = reader.GetGDCMSeriesIDs(str(folderName))        
-        assert len(series_ids) == 1, 'Assuming only one series per folder.'
-        filenames = reader.GetGDCMSeriesFileNames(str(folderName), series_ids[0])
-        reader.SetFileNames(filenames)        
-        image = reader.Execute()
-        
-        self.__pixeldims = image.GetSize()
-        self.__pixelspacing = image.GetSpacing()
-        self.__imageData = sitk.GetArrayFromImage(image) #np.transpose(sitk.GetArrayFromImage(image), axes=[2,1,0])
-        self.__segData = np.zeros(self.__imageData.shape)
-        self.__segBox = np.zeros(self.__imageData.shape)
-        inShape = self.__imageData.shape
+        selected = dicomLoader.chooseSeries(folderName, seriesID, self)
+        if selected is None:
+            return
+        
+        self._imageData, info = dicomLoader.readSeries(*selected)
+        self._imageData = volumeCache.applyDtypePolicy(self._imageData, self._dtypePolicy)
+        self._pixeldims = list(self._imageData.shape)
+        self._pixelspacing = info['spacing']
+        self.__segData = np.zeros(self._imageData.shape)
+        self.__segBox = np.zeros(self._imageData.shape)
+        inShape = self._imageData.shape
         self.__segInfo = np.zeros((5,inShape[2]))
         
-        self.__winlevel = self.__imageData.min()
-        self.__winwidth = self.__imageData.max()-self.__imageData.min()         
-        self.__imgorientation = 1 # x-y
-        self.__curSlice = self.__pixeldims[2]//2
-        self.setSlice(self.__curSlice) 
+        self._winlevel = info['stats']['min']
+        self._winwidth = info['stats']['max']-info['stats']['min']         
+        self._imgorientation = 1 # x-y
+        self._curSlice = self._pixeldims[2]//2
+        self.setSlice(self._curSlice) 
         
         #self.resampleImage() works, but it takes time to get isotropic image
         
-        self.__fileName = str(folderName)        
+        self._fileName = str(folderName)        
         
     def loadNIFTI(self, fileName="",ipFact=1.0,slFact=1.0):
         if len(fileName) and os.path.isfile(fileName):
-            img = nib.load(fileName)
+            self._imageData, info = volumeCache.loadNIFTI(fileName, self._dtypePolicy)
         
 
-            self.__pixeldims = list(img.shape)
-            self.__pixelspacing = list(img.header.get_zooms())
-            self.__imageData = img.get_data()
+            self._pixeldims = list(self._imageData.shape)
+            self._pixelspacing = info['spacing']
 
-            #if currently none, use this as the ROI template
+            #if currently none, use this as the ROI template, it is only read when writing the ROI
             if(self.__ROITemplate == None):
-                self.__ROITemplate = sitk.ReadImage(fileName)
+                self.__ROITemplate = fileName
             
-            print("input size: {}".format(self.__imageData.shape))
+            print("input size: {}".format(self._imageData.shape))
             self.resampleImage(ipFact,slFact)
-            print("resam size: {}".format(self.__imageData.shape))
+            print("resam size: {}".format(self._imageData.shape))
 
-            self.__imageDataOrig = self.__imageData.copy()
+            self.__imageDataOrig = self._imageData.copy()
 
-            self.__segData = np.zeros(self.__imageData.shape)
-            self.__segBox = np.zeros(self.__imageData.shape)
-            inShape = self.__imageData.shape
+            self.__segData = np.zeros(self._imageData.shape)
+            self.__segBox = np.zeros(self._imageData.shape)
+            inShape = self._imageData.shape
             self.__segInfo = np.zeros((5,inShape[2]))
             
-            self.__winlevel = self.__imageData.min()
-            self.__winwidth = self.__imageData.max()-self.__imageData.min()  
-            #print("{}      {}".format(self.__imageData.shape, np.argmin(self.__imageData.shape)))
-            self.__imgorientation = np.argmin(self.__imageData.shape) # x-y
+            self._winlevel = self._imageData.min()
+            self._winwidth = self._imageData.max().item()-self._imageData.min().item()  
+            #print("{}      {}".format(self._imageData.shape, np.argmin(self._imageData.shape)))
+            self._imgorientation = np.argmin(self._imageData.shape) # x-y
             
                
-            self.__curSlice = int(self.__pixeldims[self.__imgorientation]//2)
-            self.setSlice(self.__curSlice)
+            self._curSlice = int(self._pixeldims[self._imgorientation]//2)
+            self.setSlice(self._curSlice)
             
-            self.__fileName = fileName
+            self._fileName = fileName
             
     def loadNIFTIseg(self, fileName="",ipFact=1.0,slFact=1.0):
         if len(fileName) and os.path.isfile(fileName) and self.hasImage():
-            img = nib.load(fileName)
+            segData, info = volumeCache.loadNIFTI(fileName)
             #force overwrite the template, we'll save with the same file parameters
-            self.__ROITemplate = sitk.ReadImage(fileName)
-            self.__segData = self.resampleImageSpec(img.get_data(),ipFact,slFact)
+            self.__ROITemplate = fileName
+            self.__segData = self.resampleImageSpec(segData,ipFact,slFact)
             
             thisVol = self.__imageDataOrig
             segVolOut = self.__segData
@@ -1379,105 +1020,9 @@ class QtImageViewer(QGraphicsView):
             print("{}: segShape:  {}".format(inspect.stack()[0][3],segVolOut.shape))
             
             volVis = np.where(segVolOut > 0,32766,thisVol)
-            self.__imageData = volVis
+            self._imageData = volVis
             #self.__segData = segVolOut <-- this does nothing
             
-            self.setSlice(self.__curSlice)
+            self.setSlice(self._curSlice)
             
 
-    def loadImageFromFile(self, fileName=""):
-        """ Load an image from file.
-        Without any arguments, loadImageFromFile() will popup a file dialog to choose the image file.
-        With a __fileName argument, loadImageFromFile(__fileName) will attempt to load the specified image file directly.
-        """
-        fileName, dummy = QFileDialog.getOpenFileName(self, "Open image file.")
-        if len(fileName) and os.path.isfile(fileName):
-            image = QImage(fileName)
-            self.setImage(image)
-
-    def updateViewer(self):
-        """ Show current zoom (if showing entire image, apply current aspect ratio mode).
-        """
-        if not self.hasImage():
-            return
-        if len(self.zoomStack) and self.sceneRect().contains(self.zoomStack[-1]):
-            self.fitInView(self.zoomStack[-1], Qt.IgnoreAspectRatio)  # Show zoomed rect (ignore aspect ratio).
-        else:
-            self.zoomStack = []  # Clear the zoom stack (in case we got here because of an invalid zoom).
-            self.fitInView(self.sceneRect(), self.aspectRatioMode)  # Show entire image (use current aspect ratio mode).
-
-    def resizeEvent(self, event):
-        """ Maintain current zoom on resize.
-        """
-        self.updateViewer()
-
-    def mousePressEvent(self, event):
-        """ Start mouse pan or zoom mode.
-        """
-        scenePos = self.mapToScene(event.pos())
-        if event.button() == Qt.LeftButton:
-            if self.canPan:
-                self.setDragMode(QGraphicsView.ScrollHandDrag)
-            self.leftMouseButtonPressed.emit(scenePos.x(), scenePos.y())
-        elif event.button() == Qt.RightButton:
-            if self.canZoom:
-                self.setDragMode(QGraphicsView.RubberBandDrag)
-            self.rightMouseButtonPressed.emit(scenePos.x(), scenePos.y())
-        QGraphicsView.mousePressEvent(self, event)
-
-    def mouseReleaseEvent(self, event):
-        """ Stop mouse pan or zoom mode (apply zoom if valid).
-        """
-        QGraphicsView.mouseReleaseEvent(self, event)
-        scenePos = self.mapToScene(event.pos())
-        if event.button() == Qt.LeftButton:
-            self.setDragMode(QGraphicsView.NoDrag)
-            self.leftMouseButtonReleased.emit(scenePos.x(), scenePos.y())
-        elif event.button() == Qt.RightButton:
-            if self.canZoom:
-                viewBBox = self.zoomStack[-1] if len(self.zoomStack) else self.sceneRect()
-                selectionBBox = self.scene.selectionArea().boundingRect().intersected(viewBBox)
-                self.scene.setSelectionArea(QPainterPath())  # Clear current selection area.
-                if selectionBBox.isValid() and (selectionBBox != viewBBox):
-                    self.zoomStack.append(selectionBBox)
-                    self.updateViewer()
-            self.setDragMode(QGraphicsView.NoDrag)
-            self.rightMouseButtonReleased.emit(scenePos.x(), scenePos.y())
-
-    def mouseDoubleClickEvent(self, event):
-        """ Show entire image.
-        """
-        scenePos = self.mapToScene(event.pos())
-        if event.button() == Qt.LeftButton:
-            self.leftMouseButtonDoubleClicked.emit(scenePos.x(), scenePos.y())
-        elif event.button() == Qt.RightButton:
-            if self.canZoom:
-                self.zoomStack = []  # Clear zoom stack.
-                self.updateViewer()
-            self.rightMouseButtonDoubleClicked.emit(scenePos.x(), scenePos.y())
-        QGraphicsView.mouseDoubleClickEvent(self, event)
-        
-    def mouseMoveEvent(self, event):
-        scenePos = self.mapToScene(event.pos())
-        
-        # record the position for cross drawing
-#        self.__lineX.setLine(scenePos.x(),self.sceneRect().y(),scenePos.x(), self.sceneRect().y()+ self.sceneRect().height())
-#        self.__lineY.setLine(self.sceneRect().x(),scenePos.y(),self.sceneRect().x()+ self.sceneRect().width(),scenePos.y())
-#
-        self.scene.invalidate(self.scene.sceneRect())
-        QGraphicsView.mouseMoveEvent(self, event)  # in PyQt5, update() doesn't trigger drawForeground()
-        
-    def drawForeground(self, painter, rect):
-#        if self.__crossshow == True:
-#            painter.save()
-#            pen = QPen()
-#            pen.setWidth(2)
-#            pen.setColor(QColor(255,0,0))
-#            painter.setPen(pen)
-#            painter.drawLine(self.__lineX)
-#            pen.setColor(QColor(0,255,0))
-#            painter.setPen(pen)
-#            painter.drawLine(self.__lineY)
-#            painter.restore()
-        QGraphicsView.drawForeground(self, painter, rect)          
-
@@ -4,24 +4,37 @@ QtImageViewer.py: PyQt image viewer widget for a QPixmap in a QGraphicsView scen
 
 """
 
+import time
+STARTUP_T0 = time.perf_counter()
+
 import os.path
 import os
 import sys 
 import argparse
 
 import numpy as np
-import nibabel as nib
-import SimpleITK as sitk
 import ViewerSetup
+import viewerCore
 import PyQt5
 
-from PyQt5.QtCore import Qt, QRectF, pyqtSignal, QT_VERSION_STR, QLineF, QRegExp, QObject, pyqtSignal
-from PyQt5.QtGui import QImage, QPixmap, QPainterPath, QPainter, QPen, QColor, QIntValidator, QTransform
+from PyQt5.QtCore import Qt, QRectF, pyqtSignal, QT_VERSION_STR, QLineF, QRegExp, QObject, pyqtSignal, QTimer
+from PyQt5.QtGui import QImage, QPixmap, QPainterPath, QPainter, QPen, QColor, QIntValidator, QDoubleValidator, QTransform
 from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QFileDialog, QGroupBox,\
                             QHBoxLayout, QVBoxLayout, QGridLayout, QWidget, QLineEdit,QPushButton,\
                             QGraphicsLineItem, QScrollBar, QCheckBox, QComboBox, QAbstractItemView, QLabel
 from PyQt5.QtWidgets import QApplication
 
+# Seconds from launch until the window is shown, checked with --timing.
+STARTUP_BUDGET = 1.5
+
+startupTimes = []
+
+# Slab list entries: label and slabProjection mode, the first shows single slices.
+SLAB_ITEMS = [('Slice', 'max'), ('MIP', 'max'), ('MinIP', 'min'), ('Mean', 'mean')]
+
+# Combobox items and roiStats.ROI_SHAPES of the ROI tool, None pans with the left button.
+ROI_ITEMS = [('No ROI', None), ('Rectangle', 'rect'), ('Ellipse', 'ellipse')]
+
 
 #------------------------------------------------------------
 # Event handling
@@ -35,7 +48,10 @@ def parseArgs():
     #parse all of the passed in arguments
     global args
     parser = argparse.ArgumentParser(description='Input parameters for where to copy database records.')
-    parser.add_argument('-n', '--niiFile', help='Path to nifti file', default='') 
+    parser.add_argument('-n', '--niiFile', help='Path to nifti file or DICOM folder', default='') 
+    parser.add_argument('-t', '--timing', help='Print the startup times', action='store_true')
+    parser.add_argument('-p', '--hud', help='Show the render stage timings over the image', action='store_true')
+    parser.add_argument('-y', '--pyramid', help='Draw overviews and fast scrolling from a multi-resolution pyramid', action='store_true')
     
     args = parser.parse_args()
     
@@ -60,18 +76,25 @@ def btn1Click():
     global wlMax
     global wwValue 
     global wlValue 
+    global playBtn
     
     fileName, dummy = QFileDialog.getOpenFileName(window, "Open image file.")
     if len(fileName) and os.path.isfile(fileName): 
-        viewer1.loadNIFTI(fileName)
+        if fileName.lower().endswith('.dcm'):
+            # a DICOM file opens the series in its folder
+            viewer1.loadDicomSeries(os.path.dirname(fileName))
+        else:
+            viewer1.loadNIFTI(fileName)
     else:
         return
+    playBtn.setText('Play')
                 
     slicescrollbar.setMinimum(viewer1.getSliceMin())
     slicescrollbar.setMaximum(viewer1.getSliceMax())
     slicescrollbar.setValue(viewer1.getCurSlice())
     slicesTextbox.setText(str(viewer1.getCurSlice()))  
     
+    updateFrameRange()
        
     
     wwMin = viewer1.getWinWidthRange()[0]
@@ -172,6 +195,54 @@ def slicetextEditChange():
     viewer1.setSlice(int(value))
     slicescrollbar.setValue(int(value))   
     
+def slabChange():
+    global viewer1
+    global slablist
+    global slabTextbox
+    
+    try:
+        width = int(slabTextbox.text())
+    except:
+        width = 1
+    if slablist.currentIndex() == 0:
+        width = 1
+    viewer1.setSlab(width, SLAB_ITEMS[slablist.currentIndex()][1])
+    
+def obliqueChange():
+    global viewer1
+    global tiltWscrollbar
+    global tiltHscrollbar
+    global tiltLabel
+    
+    tiltLabel.setText('%d, %d' % (tiltWscrollbar.value(), tiltHscrollbar.value()))
+    viewer1.setObliqueTilts(tiltWscrollbar.value(), tiltHscrollbar.value())
+    
+def roiChange(value):
+    global viewer1
+    
+    viewer1.setROIShape(ROI_ITEMS[value][1])
+    
+def roiChanged(stats):
+    global roiStatsLabel
+    
+    if stats is None:
+        roiStatsLabel.setText('')
+    else:
+        roiStatsLabel.setText('mean %.4g  std %.4g\nmin %.4g  max %.4g\n%d px, %.4g mm^2' %
+                              (stats['mean'], stats['std'], stats['min'], stats['max'], stats['pixels'], stats['area']))
+    
+def hoverChanged(info):
+    global hoverLabel
+    
+    if info is None:
+        hoverLabel.setText('')
+        return
+    text = 'value %.6g, display %d' % (info['value'], info['display'])
+    if info['index'] is not None:
+        text = '(%d, %d, %d) = ' % tuple(info['index']) + text
+        text += '\n(%.2f, %.2f, %.2f) mm' % tuple(info['position'])
+    hoverLabel.setText(text)
+    
 def wlscrollchange(value):
     global wlMin
     global wlMax
@@ -231,6 +302,11 @@ def wwtextchange():
     viewer1.setWindowWidth(wwValue)
     winwidthText.setText(str(round(wwValue,4)))
     
+def cmapChange(value):
+    global viewer1
+    
+    viewer1.setColormap(viewerCore.COLORMAPS[value])
+    
 def ortChange(value):
     global viewer1
     global slicescrollbar
@@ -315,12 +391,90 @@ def vertTextChange():
     verscrollbar.setValue(int(value))  
 
 
+def updateFrameRange():
+    global viewer1
+    global framescrollbar
+    global framesTextbox
+    global frameGroupBox
+    
+    framescrollbar.blockSignals(True)
+    framescrollbar.setMaximum(viewer1.getFrameCount()-1)
+    framescrollbar.setValue(viewer1.getCurFrame())
+    framescrollbar.blockSignals(False)
+    framesTextbox.setText(str(viewer1.getCurFrame()))
+    frameGroupBox.setEnabled(viewer1.getFrameCount() > 1)
+    
+def framescrollbarChange(value):
+    global viewer1
+    
+    viewer1.setFrame(value)
+    
+def frametextEditChange():
+    global viewer1
+    global framesTextbox
+    
+    try:
+        value = int(framesTextbox.text())
+    except ValueError:
+        value = viewer1.getCurFrame()
+    value = min(max(value, 0), viewer1.getFrameCount()-1)
+    viewer1.setFrame(value)
+    
+def frameChanged(frame):
+    global viewer1
+    global framescrollbar
+    global framesTextbox
+    global cineStatsLabel
+    
+    # follow the viewer, also during cine playback, without setting the frame again
+    framescrollbar.blockSignals(True)
+    framescrollbar.setValue(frame)
+    framescrollbar.blockSignals(False)
+    framesTextbox.setText(str(frame))
+    if viewer1.isCinePlaying():
+        stats = viewer1.getCineStats()
+        cineStatsLabel.setText('%.1f fps, %d dropped' % (stats['achievedFps'], stats['dropped']))
+    
+def playClick():
+    global viewer1
+    global playBtn
+    global fpsTextbox
+    global cineStatsLabel
+    
+    if viewer1.isCinePlaying():
+        viewer1.stopCine()
+        playBtn.setText('Play')
+        stats = viewer1.getCineStats()
+        cineStatsLabel.setText('%.1f of %.1f fps, %d shown, %d dropped' % 
+                               (stats['achievedFps'], stats['fps'], stats['shown'], stats['dropped']))
+    else:
+        try:
+            fps = float(fpsTextbox.text())
+        except ValueError:
+            fps = 10.0
+        viewer1.startCine(fps)
+        if viewer1.isCinePlaying():
+            playBtn.setText('Stop')
+
+
 #------------------------------------------------------------
 # Main
 #------------------------------------------------------------
         
 
-def main(thisFile):
+def markStartup(stage):
+    startupTimes.append((stage, time.perf_counter() - STARTUP_T0))
+
+
+def reportStartup():
+    markStartup('window shown')
+    for stage, seconds in startupTimes:
+        print("%-14s %6.3f s" % (stage, seconds))
+    if startupTimes[-1][1] > STARTUP_BUDGET:
+        print("ERROR: startup took %.3f s, over the %.1f s budget" % (startupTimes[-1][1], STARTUP_BUDGET))
+
+
+def main(thisFile, timing=False, hud=False, pyramid=False):
     global viewer1
     global winwidthScrollbar
     global winlevelScrollbar
@@ -339,8 +493,22 @@ def main(thisFile):
     global verTextbox
     global horTextbox
     global window
+    global framescrollbar
+    global framesTextbox
+    global frameGroupBox
+    global playBtn
+    global fpsTextbox
+    global cineStatsLabel
+    global slablist
+    global slabTextbox
+    global tiltWscrollbar
+    global tiltHscrollbar
+    global tiltLabel
+    global roiStatsLabel
+    global hoverLabel
     
  
+    markStartup('imports')
     # Create the application.
     app = QApplication(sys.argv)
      
@@ -353,9 +521,15 @@ def main(thisFile):
     viewer1 = ViewerSetup.QtImageViewer()
     viewer1.setSceneRect(QRectF(0,0,800,800))
     viewer1.setFocus()
+    viewer1.setShowHUD(hud)
+    viewer1.setPyramidEnabled(pyramid)
      
     if(thisFile != ''):
-        viewer1.loadNIFTI(thisFile)
+        if os.path.isdir(thisFile):
+            viewer1.loadDicomSeries(thisFile)
+        else:
+            viewer1.loadNIFTI(thisFile)
+        markStartup('image loaded')
  
     # Handle left mouse clicks with custom slot.
     viewer1.leftMouseButtonPressed.connect(handleLeftClick)
@@ -426,6 +600,53 @@ def main(thisFile):
     slicescrollbar.setValue(viewer1.getCurSlice())
     slicescrollbar.setPageStep(1)
     slicesTextbox.setText(str(viewer1.getCurSlice()))
+    
+    # thick slab projection of the slices around the current one
+    slablist = QComboBox()
+    slablist.addItems([item[0] for item in SLAB_ITEMS])
+    slabLabel = QLabel()
+    slabLabel.setText('Slab')
+    slabTextbox = QLineEdit()
+    slabTextbox.setFixedSize(50, 20)
+    slabTextbox.setValidator(QIntValidator(1, 999))
+    slabTextbox.setText('10')
+    
+    # tilts (degrees) of an oblique cutting plane
+    tiltWscrollbar = QScrollBar()
+    tiltWscrollbar.setOrientation(1)
+    tiltWscrollbar.setRange(-90, 90)
+    tiltHscrollbar = QScrollBar()
+    tiltHscrollbar.setOrientation(1)
+    tiltHscrollbar.setRange(-90, 90)
+    tiltLabel = QLabel()
+    tiltLabel.setText('0, 0')
+     
+    # region of interest statistics
+    roilist = QComboBox()
+    roilist.addItems([item[0] for item in ROI_ITEMS])
+    roiStatsLabel = QLabel()
+     
+    # -----------------------------------------------
+    # frames (time points or bins) of 4D volumes
+    framesTextbox = QLineEdit()
+    framesTextbox.setFixedSize(50, 20)
+    framescrollbar = QScrollBar()
+    framescrollbar.setOrientation(1)
+    framescrollbar.setMinimum(0)
+    framescrollbar.setPageStep(1)
+    playBtn = QPushButton()
+    playBtn.setFixedWidth(60)
+    playBtn.setText('Play')
+    fpsLabel = QLabel()
+    fpsLabel.setText('FPS')
+    fpsTextbox = QLineEdit()
+    fpsTextbox.setFixedSize(50, 20)
+    fpsTextbox.setText('10')
+    fpsTextbox.setValidator(QDoubleValidator(0.1, 1000.0, 2))
+    cineStatsLabel = QLabel()
+     
+    # voxel under the mouse
+    hoverLabel = QLabel()
      
     # -----------------------------------------------
     # window level, window width adjust
@@ -474,6 +695,10 @@ def main(thisFile):
      
      
      
+    cmapLabel = QLabel('Colormap')
+    cmaplist = QComboBox()
+    cmaplist.addItems(viewerCore.COLORMAPS)
+     
     ortlist = QComboBox()
     ortlist.addItem('Dim 1 vs Dim 2')
     ortlist.addItem('Dim 1 vs Dim 3')
@@ -483,11 +708,23 @@ def main(thisFile):
     openFileBtn1.clicked.connect(btn1Click)
     slicescrollbar.valueChanged.connect(slicescrollbarChange)
     slicesTextbox.returnPressed.connect(slicetextEditChange)   
+    slablist.currentIndexChanged.connect(slabChange)
+    slabTextbox.returnPressed.connect(slabChange)
+    tiltWscrollbar.valueChanged.connect(obliqueChange)
+    tiltHscrollbar.valueChanged.connect(obliqueChange)
     winlevelScrollbar.valueChanged.connect(wlscrollchange)
     winwidthScrollbar.valueChanged.connect(wwscrollchange)
+    for scrollbar in (winlevelScrollbar, winwidthScrollbar):
+        scrollbar.sliderPressed.connect(lambda: viewer1.setPreview(True))
+        scrollbar.sliderReleased.connect(lambda: viewer1.setPreview(False))
     winlevelText.returnPressed.connect(wltextchange)
     winwidthText.returnPressed.connect(wwtextchange)  
     ortlist.currentIndexChanged.connect(ortChange)
+    cmaplist.currentIndexChanged.connect(cmapChange)
+    roilist.currentIndexChanged.connect(roiChange)
+    viewer1.roiChanged.connect(roiChanged)
+    viewer1.hoverChanged.connect(hoverChanged)
+    viewer1.setHoverReadout(True)
     crosshairsBox1.toggled.connect(enableCrosshair)
      
      
@@ -496,6 +733,10 @@ def main(thisFile):
     verscrollbar.valueChanged.connect(vertScrollChange)
     verTextbox.returnPressed.connect(vertTextChange)
     thruplaneBox.toggled.connect(enableThroughPlane)
+    framescrollbar.valueChanged.connect(framescrollbarChange)
+    framesTextbox.returnPressed.connect(frametextEditChange)
+    playBtn.clicked.connect(playClick)
+    viewer1.frameChanged.connect(frameChanged)
  
      
      
@@ -520,23 +761,63 @@ def main(thisFile):
     layout.addWidget(winlevelLabel, 1, 0)
     layout.addWidget(winlevelScrollbar, 1, 1)
     layout.addWidget(winlevelText, 1, 2)
+    layout.addWidget(cmapLabel, 2, 0)
+    layout.addWidget(cmaplist, 2, 1, 1, 2)
     displayGroupBox.setLayout(layout)
      
     sliceGroupBox = QGroupBox("Slices")
-    layouts = QVBoxLayout()
-    layouts.addWidget(slicesTextbox)
-    layouts.addWidget(slicescrollbar)
+    layouts = QGridLayout()
+    layouts.setColumnStretch(1, 4)
+    layouts.addWidget(slicesTextbox, 0, 0)
+    layouts.addWidget(slicescrollbar, 0, 1, 1, 3)
+    layouts.addWidget(slablist, 1, 0)
+    layouts.addWidget(slabLabel, 1, 2)
+    layouts.addWidget(slabTextbox, 1, 3)
     sliceGroupBox.setLayout(layouts)
      
+    obliqueGroupBox = QGroupBox("Oblique")
+    layouto = QGridLayout()
+    layouto.setColumnStretch(1, 4)
+    layouto.addWidget(tiltLabel, 0, 0)
+    layouto.addWidget(tiltWscrollbar, 0, 1)
+    layouto.addWidget(tiltHscrollbar, 1, 1)
+    obliqueGroupBox.setLayout(layouto)
+     
+    roiGroupBox = QGroupBox("ROI")
+    layoutr = QGridLayout()
+    layoutr.addWidget(roilist, 0, 0)
+    layoutr.addWidget(roiStatsLabel, 1, 0)
+    roiGroupBox.setLayout(layoutr)
+     
+    frameGroupBox = QGroupBox("Frames")
+    layoutf = QGridLayout()
+    layoutf.setColumnStretch(1, 4)
+    layoutf.addWidget(framesTextbox, 0, 0)
+    layoutf.addWidget(framescrollbar, 0, 1, 1, 3)
+    layoutf.addWidget(playBtn, 1, 0)
+    layoutf.addWidget(fpsLabel, 1, 2)
+    layoutf.addWidget(fpsTextbox, 1, 3)
+    layoutf.addWidget(cineStatsLabel, 2, 0, 1, 4)
+    frameGroupBox.setLayout(layoutf)
+    updateFrameRange()
+     
     vlayout.addLayout(layoutop) 
     vlayout.addSpacing(20)
     vlayout.addWidget(displayGroupBox)
     vlayout.addSpacing(10)
     vlayout.addWidget(sliceGroupBox)
     vlayout.addSpacing(10)
+    vlayout.addWidget(obliqueGroupBox)
+    vlayout.addSpacing(10)
+    vlayout.addWidget(roiGroupBox)
+    vlayout.addSpacing(10)
+    vlayout.addWidget(frameGroupBox)
+    vlayout.addSpacing(10)
     vlayout.addWidget(ortlist)
     vlayout.addSpacing(10)
     vlayout.addWidget(crosshairsBox1)        
+    vlayout.addSpacing(10)
+    vlayout.addWidget(hoverLabel)
     vlayout.addStretch(1)
     vlayout.addSpacing(20)
      
@@ -547,6 +828,9 @@ def main(thisFile):
     window.setLayout(hlayout)
      
     window.show()
+    if timing:
+        # runs once the first paint events have been handled
+        QTimer.singleShot(0, reportStartup)
      
     app.exec_()
     app.quit()
@@ -557,4 +841,4 @@ if __name__ == '__main__':
     global args
     parseArgs()
     
-    main(args.niiFile)
+    main(args.niiFile, args.timing, args.hud, args.pyramid)
@@ -7,207 +7,156 @@ QtImageViewer.py: PyQt image viewer widget for a QPixmap in a QGraphicsView scen
 import os.path
 import os
 import sys
-import ViewImage
+import time
+import math
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import nibabel as nib
-import SimpleITK as sitk
+import volumeCache
+import viewerCore
+import pyramid
+import roiStats
 import PyQt5
 
-from PyQt5.QtCore import Qt, QRectF, pyqtSignal, QT_VERSION_STR, QLineF, QRegExp
+from PyQt5.QtCore import Qt, QRectF, pyqtSignal, QT_VERSION_STR, QLineF, QRegExp, QTimer
 from PyQt5.QtGui import QImage, QPixmap, QPainterPath, QPainter, QPen, QColor, QIntValidator, QTransform, QBrush
 from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QFileDialog, QGroupBox,\
                             QHBoxLayout, QVBoxLayout, QGridLayout, QWidget, QLineEdit,QPushButton,\
                             QGraphicsLineItem, QScrollBar, QCheckBox, QComboBox, QAbstractItemView, QLabel
 from PyQt5.QtWidgets import QApplication
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
-from matplotlib.figure import Figure
 
-__author__ = ""
-__version__ = ""
+# SimpleITK, dicomLoader and matplotlib are imported where they are first used,
+# keeping them out of the viewer startup.
 
+# Number of resliced planes kept by on-demand resampling.
+RESLICE_CACHE_SIZE = 64
 
-class CrosshairWindow(FigureCanvasQTAgg):
+# Number of frames read ahead during cine playback of 4D volumes.
+CINE_PREFETCH = 8
 
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        self.fig = Figure(figsize=(width, height), dpi=dpi)
-        self.axes1 = self.fig.add_subplot(211)
-        self.axes1.set_title("Vertical Profile")
-        self.axes2 = self.fig.add_subplot(212)
-        self.axes2.set_title("Horizontal Profile")
-        self.fig.subplots_adjust(hspace=0.8)
-        super(CrosshairWindow, self).__init__(self.fig)
-        
-class ThruPlaneWindow(FigureCanvasQTAgg):
+# Slice changes less than this many seconds apart are fast scrolling, drawn one pyramid level coarser.
+PYRAMID_SCROLL_INTERVAL = 0.15
 
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        self.fig2 = Figure(figsize=(width, height), dpi=dpi)
-        self.plt1 = self.fig2.add_subplot(221)
-        self.plt2 = self.fig2.add_subplot(222)
-        self.plt3 = self.fig2.add_subplot(212)
-        
-        self.fig2.subplots_adjust(hspace=0.8, wspace=0.5)
-            
+# Milliseconds after the last fast slice change until the slice is drawn in full detail again.
+PYRAMID_IDLE_MS = 200
 
-        super(ThruPlaneWindow, self).__init__(self.fig2)
+# Number of planes whose ROI statistics tables are kept.
+ROI_CACHE_SIZE = 4
 
 
+def resliceAxis(data, axis, positions, fill_value=0):
+    """ Linear interpolation of data along axis at the (fractional) voxel positions.
+    Like sitk, positions within half a voxel of the edge take the edge value and
+    positions further out get fill_value.
+    """
+    n = data.shape[axis]
+    lower = np.clip(np.floor(positions).astype(int), 0, n-1)
+    upper = np.clip(lower+1, 0, n-1)
+    shape = [1]*data.ndim
+    shape[axis] = len(positions)
+    weight = (positions - lower).reshape(shape)
+    out = np.take(data, lower, axis=axis)*(1-weight) + np.take(data, upper, axis=axis)*weight
+    outside = (positions >= n-0.5).reshape(shape)
+    return np.where(outside, fill_value, out)
+
+__author__ = ""
+__version__ = ""
 
-class QtImageViewer(QGraphicsView):
-    """ PyQt image viewer widget for a QPixmap in a QGraphicsView scene with mouse zooming and panning.
 
-    Displays a QImage or QPixmap (QImage is internally converted to a QPixmap).
-    To display any other image format, you must first convert it to a QImage or QPixmap.
+_popupWindows = {}
 
-    Some useful image format conversion utilities:
-        qimage2ndarray: NumPy ndarray <==> QImage    (https://github.com/hmeine/qimage2ndarray)
-        ImageQt: PIL Image <==> QImage  (https://github.com/python-pillow/Pillow/blob/master/PIL/ImageQt.py)
 
-    Mouse interaction:
-        Left mouse button drag: Pan image.
-        Right mouse button drag: Zoom box.
-        Right mouse button doubleclick: Zoom to show entire image.
+def popupWindows():
+    """ Returns the CrosshairWindow and ThruPlaneWindow canvas classes.
+    They are built the first time a popup is opened, so matplotlib is only imported then.
     """
+    if not _popupWindows:
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+        from matplotlib.figure import Figure
 
-    # Mouse button signals emit image scene (x, y) coordinates.
-    # !!! For image (row, column) matrix indexing, row = y and column = x.
-    leftMouseButtonPressed = pyqtSignal(float, float)
-    rightMouseButtonPressed = pyqtSignal(float, float)
-    leftMouseButtonReleased = pyqtSignal(float, float)
-    rightMouseButtonReleased = pyqtSignal(float, float)
-    leftMouseButtonDoubleClicked = pyqtSignal(float, float)
-    rightMouseButtonDoubleClicked = pyqtSignal(float, float)
-    
-    def __init__(self):
-        QGraphicsView.__init__(self)
+        class CrosshairWindow(FigureCanvasQTAgg):
 
-        # Image is displayed as a QPixmap in a QGraphicsScene attached to this QGraphicsView.
-        self.scene = QGraphicsScene()
-        self.setScene(self.scene)
-        
-        
-#         scene = QGraphicsScene()
-#         view = QGraphicsView(scene)
-#         view.show()
-        
-        
-        #set the focus to this viewer
-        self.setFocusPolicy(Qt.StrongFocus)
+            def __init__(self, parent=None, width=5, height=4, dpi=100):
+                self.fig = Figure(figsize=(width, height), dpi=dpi)
+                self.axes1 = self.fig.add_subplot(211)
+                self.axes1.set_title("Vertical Profile")
+                self.axes2 = self.fig.add_subplot(212)
+                self.axes2.set_title("Horizontal Profile")
+                self.fig.subplots_adjust(hspace=0.8)
+                super(CrosshairWindow, self).__init__(self.fig)
+
+        class ThruPlaneWindow(FigureCanvasQTAgg):
 
-        # Store a local handle to the scene's current image pixmap.
-        self._pixmapHandle = None
+            def __init__(self, parent=None, width=5, height=4, dpi=100):
+                self.fig2 = Figure(figsize=(width, height), dpi=dpi)
+                self.plt1 = self.fig2.add_subplot(221)
+                self.plt2 = self.fig2.add_subplot(222)
+                self.plt3 = self.fig2.add_subplot(212)
 
-        # Image aspect ratio mode.
-        # !!! ONLY applies to full image. Aspect ratio is always ignored when zooming.
-        #   Qt.IgnoreAspectRatio: Scale image to fit viewport.
-        #   Qt.KeepAspectRatio: Scale image to fit inside viewport, preserving aspect ratio.
-        #   Qt.KeepAspectRatioByExpanding: Scale image to fill the viewport, preserving aspect ratio.
-        self.aspectRatioMode = Qt.KeepAspectRatio
+                self.fig2.subplots_adjust(hspace=0.8, wspace=0.5)
 
-        # Scroll bar behaviour.
-        #   Qt.ScrollBarAlwaysOff: Never shows a scroll bar.
-        #   Qt.ScrollBarAlwaysOn: Always shows a scroll bar.
-        #   Qt.ScrollBarAsNeeded: Shows a scroll bar only when zoomed.
-        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+                super(ThruPlaneWindow, self).__init__(self.fig2)
 
-        # Stack of QRectF zoom boxes in scene coordinates.
-        self.zoomStack = []
+        _popupWindows['CrosshairWindow'] = CrosshairWindow
+        _popupWindows['ThruPlaneWindow'] = ThruPlaneWindow
+    return _popupWindows['CrosshairWindow'], _popupWindows['ThruPlaneWindow']
+
+
+class QtImageViewer(viewerCore.ViewerCore):
+    """ Image viewer for NIfTI and DICOM volumes with profile popups, resampling and
+    cine playback of 4D volumes. See viewerCore.ViewerCore for the shared viewer.
+    """
+
+    frameChanged = pyqtSignal(int)
+    roiChanged = pyqtSignal(object)
+    
+    def __init__(self):
+        viewerCore.ViewerCore.__init__(self)
         
         # -------------------
-        self.__fileName = None
-        self.__imageData = None
-        self.__pixeldims = None
-        self.__pixelspacing = None
-        self.__imgorientation = 1
-        self.__curSlice = 0
+        self.__resampleGrid = None
+        self.__resampleFill = 0
+        self.__resampleSpacing = None
+        self.__sliceCache = OrderedDict()
         
         # -------------------
-        self.__crossshow = False
-        self.__lineX = QLineF()
-        self.__lineY = QLineF() 
+        self.__volume4D = None
+        self.__frame = 0
+        self.__cineTimer = QTimer(self)
+        self.__cineTimer.setTimerType(Qt.PreciseTimer)
+        self.__cineTimer.timeout.connect(self.cineTick)
+        self.__cineBuffer = OrderedDict()
+        self.__prefetchPool = None
+        self.__cineFps = 0.0
+        self.__cineStart = None
+        self.__cineStats = {'shown': 0, 'dropped': 0}
         
         # -------------------
-        self.__crosshair = 0
-        self.__thruPlane = 0
-        self.__vert = 0
-        self.__horiz = 0
-        self.__flipX = False
-        self.__flipY = False
-        self.__rotateAngle = 270
+        self.__pyramidEnabled = False
+        self.__pyramid = None
+        self.__pyramidKey = None
+        self.__lastSliceTime = 0.0
+        self.__pyramidTimer = QTimer(self)
+        self.__pyramidTimer.setSingleShot(True)
+        self.__pyramidTimer.timeout.connect(self.pyramidIdle)
         
         # -------------------
-        self.__winlevel = 0
-        self.__winwidth = 256
-
-        # Flags for enabling/disabling mouse interaction.
-        self.canZoom = True
-        self.canPan = True
-
-    def hasImage(self):
-        """ Returns whether or not the scene contains an image pixmap.
-        """
-        return self._pixmapHandle is not None
-
-    def clearImage(self):
-        """ Removes the current image pixmap from the scene if it exists.
-        """
-        if self.hasImage():
-            self.scene.removeItem(self._pixmapHandle)
-            self._pixmapHandle = None
-
-    def pixmap(self):
-        """ Returns the scene's current image pixmap as a QPixmap, or else None if no image exists.
-        :rtype: QPixmap | None
-        """
-        if self.hasImage():
-            return self._pixmapHandle.pixmap()
-        return None
+        # Region of interest, a scene rectangle (the bounds of an ellipse)
+        self.__roiShape = None
+        self.__roiStart = None
+        self.__roiRect = None
+        self.__roiItem = None
+        self.__roiStats = OrderedDict()
 
-    def image(self):
-        """ Returns the scene's current image pixmap as a QImage, or else None if no image exists.
-        :rtype: QImage | None
-        """
-        if self.hasImage():
-            return self._pixmapHandle.pixmap().toImage()
-        return None
-
-    def setImage(self, image):
-        """ Set the scene's current image pixmap to the input QImage or QPixmap.
-        Raises a RuntimeError if the input image has type other than QImage or QPixmap.
-        :type image: QImage | QPixmap
-        """
-        if type(image) is QPixmap:
-            pixmap = image
-        elif type(image) is QImage:
-            pixmap = QPixmap.fromImage(image)
-        else:
-            raise RuntimeError("ImageViewer.setImage: Argument must be a QImage or QPixmap.")
-        
-        if self.hasImage():
-            self._pixmapHandle.setPixmap(pixmap)
-        else:
-            self._pixmapHandle = self.scene.addPixmap(pixmap)
-            
-        self.setSceneRect(QRectF(pixmap.rect()))  # Set scene size to image size.
-#         self.setSliceOrientation(self.__imgorientation)
-        self.updateViewer()
-        
-        
     def buildCrosshairPopup(self):
+        CrosshairWindow, ThruPlaneWindow = popupWindows()
         self.ch = CrosshairWindow(self, width=5, height=4, dpi=100)
 
-        if self.__imgorientation == 1:
-            horizArr = self.__imageData[:,0,self.getCurSlice()]
-            vertArr = self.__imageData[0,:,self.getCurSlice()]
-        elif self.__imgorientation == 2:   
-            horizArr = self.__imageData[:,self.getCurSlice(),0]
-            vertArr = self.__imageData[0,self.getCurSlice(),:]
-        elif self.__imgorientation == 3:
-            horizArr = self.__imageData[self.getCurSlice(),:,0]
-            vertArr = self.__imageData[self.getCurSlice(),0,:]
+        if self._imgorientation in (1, 2, 3):
+            plane = self.getPlane(self._imgorientation, self.getCurSlice())
+            horizArr = plane[:,0]
+            vertArr = plane[0,:]
         else:
             print("ERROR: Invlaid plane")
             
@@ -219,20 +168,9 @@ class QtImageViewer(QGraphicsView):
         self.display_HorizLine(self.getHorizVal())
         
             
-    def clearCrosshairPopup(self):
-        self.ch.close()
-        self.__crosshair = 0
-        self.scene.removeItem(self.HLine)
-        self.scene.removeItem(self.VLine)
-        self.setHorizVal(0)
-        self.setVertVal(0)
-        if(self.__thruPlane == 2):
-            self.__thruPlane = 0
-            self.tp.close()
-        
     def setCrosshair(self, value):
-        if self.__imageData is not None:
-            self.__crosshair = value
+        if self._imageData is not None:
+            self._crosshair = value
             if(value == 2):
                 self.buildCrosshairPopup()
             else:
@@ -242,20 +180,21 @@ class QtImageViewer(QGraphicsView):
         
             
     def buildThruPlanePopup(self):
+        CrosshairWindow, ThruPlaneWindow = popupWindows()
         self.tp = ThruPlaneWindow(self, width=5, height=4, dpi=100)
 
-        if self.__imgorientation == 1:
-            data1 = np.rot90(self.__imageData[:,self.getHorizVal(),:])
-            data2 = np.rot90(self.__imageData[self.getVertVal(),:,:]) 
-            data3 = self.__imageData[self.getVertVal(),self.getHorizVal(),:]
-        elif self.__imgorientation == 2:
-            data1 = np.rot90(self.__imageData[:,:,self.getHorizVal()])
-            data2 = np.rot90(self.__imageData[self.getVertVal(),:,:])
-            data3 = self.__imageData[self.getVertVal(),:,self.getHorizVal()]
-        elif self.__imgorientation == 3:
-            data1 = np.rot90(self.__imageData[:,:,self.getHorizVal()])
-            data2 = np.rot90(self.__imageData[:,self.getVertVal(),:])
-            data3 = self.__imageData[:,self.getVertVal(),self.getHorizVal()]
+        if self._imgorientation == 1:
+            data1 = np.rot90(self.getPlane(2, self.getHorizVal()))
+            data2 = np.rot90(self.getPlane(3, self.getVertVal())) 
+            data3 = self.getPlane(3, self.getVertVal())[self.getHorizVal(),:]
+        elif self._imgorientation == 2:
+            data1 = np.rot90(self.getPlane(1, self.getHorizVal()))
+            data2 = np.rot90(self.getPlane(3, self.getVertVal()))
+            data3 = self.getPlane(3, self.getVertVal())[:,self.getHorizVal()]
+        elif self._imgorientation == 3:
+            data1 = np.rot90(self.getPlane(1, self.getHorizVal()))
+            data2 = np.rot90(self.getPlane(2, self.getVertVal()))
+            data3 = self.getPlane(2, self.getVertVal())[:,self.getHorizVal()]
 
 
         self.tp.plt1.imshow(data1, aspect='auto')
@@ -273,18 +212,18 @@ class QtImageViewer(QGraphicsView):
         
         
     def updateThroughPlane(self):
-        if self.__imgorientation == 1:
-            data1 = np.rot90(self.__imageData[:,self.getHorizVal(),:])
-            data2 = np.rot90(self.__imageData[self.getVertVal(),:,:]) 
-            data3 = self.__imageData[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
-        elif self.__imgorientation == 2:
-            data1 = np.rot90(self.__imageData[:,:,self.getHorizVal()])
-            data2 = np.rot90(self.__imageData[self.getVertVal(),:,:])
-            data3 = self.__imageData[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
-        elif self.__imgorientation == 3:
-            data1 = np.rot90(self.__imageData[:,:,self.getHorizVal()])
-            data2 = np.rot90(self.__imageData[:,self.getVertVal(),:])
-            data3 = self.__imageData[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
+        if self._imgorientation == 1:
+            data1 = np.rot90(self.getPlane(2, self.getHorizVal()))
+            data2 = np.rot90(self.getPlane(3, self.getVertVal())) 
+            data3 = self.getPlane(3, self.getVertVal())[self.getImgHeight()-1-self.getHorizVal(),:]
+        elif self._imgorientation == 2:
+            data1 = np.rot90(self.getPlane(1, self.getHorizVal()))
+            data2 = np.rot90(self.getPlane(3, self.getVertVal()))
+            data3 = self.getPlane(3, self.getVertVal())[:,self.getImgHeight()-1-self.getHorizVal()]
+        elif self._imgorientation == 3:
+            data1 = np.rot90(self.getPlane(1, self.getHorizVal()))
+            data2 = np.rot90(self.getPlane(2, self.getVertVal()))
+            data3 = self.getPlane(2, self.getVertVal())[:,self.getImgHeight()-1-self.getHorizVal()]
 
 
         self.tp.plt1.clear()
@@ -302,12 +241,8 @@ class QtImageViewer(QGraphicsView):
         self.tp.draw()
         
     
-    def clearThruPlanePopup(self):
-        self.tp.close()
-            
-            
     def setThruPlane(self, value):
-        self.__thruPlane = value
+        self._thruPlane = value
         if(value == 2):
             self.buildThruPlanePopup()
         else:
@@ -316,12 +251,12 @@ class QtImageViewer(QGraphicsView):
     def updateVerticalProfile(self, value):
         self.setVertVal(value)
         
-        if self.__imgorientation == 1:
-            vertArr = self.__imageData[value,:,self.getCurSlice()]
-        elif self.__imgorientation == 2:   
-            vertArr = self.__imageData[value,self.getCurSlice(),:]
-        elif self.__imgorientation == 3:
-            vertArr = self.__imageData[self.getCurSlice(),value,:]
+        if self._imgorientation == 1:
+            vertArr = self.getPlane(1, self.getCurSlice())[value,:]
+        elif self._imgorientation == 2:   
+            vertArr = self.getPlane(2, self.getCurSlice())[value,:]
+        elif self._imgorientation == 3:
+            vertArr = self.getPlane(3, self.getCurSlice())[value,:]
         else:
             print("ERROR: Invlaid plane")
             
@@ -331,7 +266,7 @@ class QtImageViewer(QGraphicsView):
         self.ch.axes1.plot(vertArr)
         self.ch.draw()
         
-        if(self.__thruPlane == 2):
+        if(self._thruPlane == 2):
             self.updateThroughPlane()
         
         self.display_VertLine(value)
@@ -340,12 +275,12 @@ class QtImageViewer(QGraphicsView):
         self.setHorizVal(value)
         
         
-        if self.__imgorientation == 1:
-            horizArr = self.__imageData[:,self.getImgHeight()-1-value,self.getCurSlice()]
-        elif self.__imgorientation == 2:
-            horizArr = self.__imageData[:,self.getCurSlice(),self.getImgHeight()-1-value]
-        elif self.__imgorientation == 3:
-            horizArr = self.__imageData[self.getCurSlice(),:,self.getImgHeight()-1-value]
+        if self._imgorientation == 1:
+            horizArr = self.getPlane(1, self.getCurSlice())[:,self.getImgHeight()-1-value]
+        elif self._imgorientation == 2:
+            horizArr = self.getPlane(2, self.getCurSlice())[:,self.getImgHeight()-1-value]
+        elif self._imgorientation == 3:
+            horizArr = self.getPlane(3, self.getCurSlice())[:,self.getImgHeight()-1-value]
         else:
             print("ERROR: Invlaid plane")
         
@@ -354,313 +289,415 @@ class QtImageViewer(QGraphicsView):
         self.ch.axes2.plot(horizArr)
         self.ch.draw()
         
-        if(self.__thruPlane == 2):
+        if(self._thruPlane == 2):
             self.updateThroughPlane()
         self.display_HorizLine(value)
          
-    def display_VertLine(self, value):
-        try:
-            self.scene.removeItem(self.VLine)
-        except:
-            pass
-        self.VLine = self.scene.addLine(value, 0, value, self.getImgHeight(), QPen(Qt.red))
-    
-         
-    def display_HorizLine(self, value):
-        try:
-            self.scene.removeItem(self.HLine)
-        except:
-            pass
-        self.HLine = self.scene.addLine(0, value, self.getImgWidth(), value, QPen(Qt.green))
-
-        
-    def getHorizVal(self):
-        return self.__horiz
-    
-    def getVertVal(self):
-        return self.__vert
-        
-    def setHorizVal(self, value):
-        self.__horiz = value
+    def resampleImage(self, spacing=None, fill_value=0, onDemand=False, numThreads=None):
+        """ Resample the volume to the given spacing (isotropic at the finest spacing by default).
+        With onDemand=True only the displayed planes are resliced, when they are requested, and
+        the last RESLICE_CACHE_SIZE planes are kept. Otherwise the whole volume is resampled
+        with numThreads threads (default: one per core).
+        """
+        # after an on-demand resample the volume still has its original spacing
+        shown_spacing = [float(s) for s in self._pixelspacing[:3]]
+        if self.__resampleGrid is not None:
+            orig_spacing = list(self.__resampleSpacing)
+        else:
+            orig_spacing = shown_spacing
+        orig_size = np.array(self._imageData.shape[:3])
     
-    def setVertVal(self, value):
-        self.__vert = value
-
+        if spacing is None:
+            min_spacing = min(orig_spacing)
+            new_spacing = [min_spacing]*3
+        else:
+            new_spacing = [float(s) for s in spacing]
     
-    def setWindowLevel(self, value):
-        self.__winlevel = value
-        self.imgWindowChange(self.__winlevel, self.__winwidth)
+        new_size = orig_size*(np.array(orig_spacing)/np.array(new_spacing))
+        new_size = [int(s) for s in np.ceil(new_size)] #  Image dimensions are in integers
+        
+        self.__sliceCache.clear()
+        if self.__volume4D is not None and not onDemand:
+            print("ERROR: 4D volumes are only resampled on demand")
+            onDemand = True
+        if onDemand:
+            # voxel position in the original volume of every resampled index, per axis
+            self.__resampleGrid = [np.arange(n)*new_spacing[i]/orig_spacing[i] for i, n in enumerate(new_size)]
+            self.__resampleFill = fill_value
+            self.__resampleSpacing = orig_spacing
+        else:
+            import SimpleITK as sitk
+
+            self.__resampleGrid = None
+            # numpy (x,y,z) becomes an sitk (z,y,x) image and comes back as (x,y,z), no transpose needed
+            sitk_image = sitk.GetImageFromArray(self._imageData)
+            sitk_image.SetSpacing(orig_spacing[::-1])
+        
+            resample_filter = sitk.ResampleImageFilter()
+            resample_filter.SetNumberOfThreads(numThreads or os.cpu_count())
+            resample_filter.SetSize(new_size[::-1])
+            resample_filter.SetTransform(sitk.Transform())
+            resample_filter.SetInterpolator(sitk.sitkLinear)
+            resample_filter.SetOutputOrigin(sitk_image.GetOrigin())
+            resample_filter.SetOutputSpacing(new_spacing[::-1])
+            resample_filter.SetOutputDirection(sitk_image.GetDirection())
+            resample_filter.SetDefaultPixelValue(fill_value)
+            resample_filter.SetOutputPixelType(sitk_image.GetPixelIDValue())
+            
+            self._imageData = sitk.GetArrayFromImage(resample_filter.Execute(sitk_image))
+            
+        self._pixeldims = list(new_size)
+        self.rescaleAffine(shown_spacing, new_spacing)
+        self._pixelspacing = new_spacing
+        self.buildPyramid()
+        self._winlevel = self._imageData.min()
+        self._winwidth = self._imageData.max().item()-self._imageData.min().item()         
+        self._imgorientation = 1 # x-y
+        self._curSlice = self._pixeldims[2]//2
+        self.setSlice(self._curSlice) 
+        
+    def getPlane(self, orientation, index, frame=None, view=None):
+        """ Returns plane index of the volume for orientation 1 (x-y), 2 (x-z) or 3 (y-z),
+        resliced from the original data when on-demand resampling is active.
+        frame picks another frame of a 4D volume than the displayed one, view is the part
+        of an oblique plane to sample (see viewerCore.ViewerCore.obliqueView).
+        """
+        data = self._imageData if frame is None else self.__volume4D[..., frame]
+        if self.__resampleGrid is None or self.isOblique():
+            return self.reslicePlane(data, orientation, index, view)
+        
+        key = (self.__frame if frame is None else frame, orientation, index)
+        if key in self.__sliceCache:
+            self.__sliceCache.move_to_end(key)
+            return self.__sliceCache[key]
+        
+        plane = self.reslicePlane(data, orientation, index)
+        self.__sliceCache[key] = plane
+        if len(self.__sliceCache) > RESLICE_CACHE_SIZE:
+            self.__sliceCache.popitem(last=False)
+        return plane
+        
+    def setPyramidEnabled(self, value):
+        """ Build a multi-resolution pyramid (see pyramid.py) of 3D volumes on a background
+        thread and draw from it when zoomed out and while scrolling fast.
+        """
+        self.__pyramidEnabled = bool(value)
+        self.buildPyramid(self.__pyramidKey)
         
-    def setWindowWidth(self, value):
-        self.__winwidth = value
-        self.imgWindowChange(self.__winlevel, self.__winwidth)
-    
-    def getWindowLevel(self):
-        return self.__winlevel
+    def isPyramidEnabled(self):
+        return self.__pyramidEnabled
         
-    def getWindowWidth(self):
-        return self.__winwidth        
+    def getPyramid(self):
+        return self.__pyramid
         
-    def imgWindowChange(self, winowlevel, windowwidth):
-        self.__winlevel = winowlevel
-        self.__winwidth = windowwidth
+    def buildPyramid(self, key=None):
+        """ Start the pyramid of the displayed volume, key is its cache key (None keeps it in memory).
+        """
+        if self.__pyramid is not None:
+            self.__pyramid.cancel()
+        self.__pyramid = None
+        self.__pyramidKey = key
+        if self.__pyramidEnabled and self._imageData is not None and self.__volume4D is None \
+                and self.__resampleGrid is None:
+            self.__pyramid = pyramid.VolumePyramid(self._imageData, key)
+            self.__pyramid.start()
+            
+    def pyramidLevel(self, fast):
+        """ Pyramid level to draw the current slice from: the coarsest one that is still as fine
+        as the screen, one coarser while scrolling fast. Level 0 is the volume itself.
+        """
+        if self.__pyramid is None or self.__resampleGrid is not None or self.isOblique() or self.getSlabWidth() > 1:
+            return 0
+        region = self.renderRegion(self.displayShape(self._imgorientation))
+        step = 1 if region is None else region[1]
+        level = int(math.log2(step)) + (1 if fast else 0)
+        return min(level, self.__pyramid.getLevelCount()-1)
+        
+    def pyramidIdle(self):
+        self.__lastSliceTime = 0.0
+        if self._imageData is not None:
+            self.setSlice(self._curSlice)
+            
+    def setSlice(self, slice):
+        if self.__pyramid is None:
+            viewerCore.ViewerCore.setSlice(self, slice)
+        else:
+            self.pyramidSlice(slice)
+        # not while scrolling fast, the idle timer sets the slice again
+        if self.__roiRect is not None and not self.__pyramidTimer.isActive():
+            self.updateROI()
+            
+    def pyramidSlice(self, slice):
+        now = time.perf_counter()
+        fast = (slice != self._curSlice) and (now - self.__lastSliceTime < PYRAMID_SCROLL_INTERVAL)
+        self.__lastSliceTime = now
+        level = self.pyramidLevel(fast)
+        if level == 0 or not (self.getSliceMin() <= slice <= self.getSliceMax()):
+            viewerCore.ViewerCore.setSlice(self, slice)
+        else:
+            self._curSlice = slice
+            t0 = time.perf_counter()
+            plane = self.__pyramid.getPlane(level, self.sliceAxis(self._imgorientation), slice)
+            self.markStage('extract', t0)
+            self.displayPlane(plane, 1 << level, self.displayShape(self._imgorientation))
+        if fast:
+            self.__pyramidTimer.start(PYRAMID_IDLE_MS)
+            
+    def refreshPlane(self):
+        if self.__pyramid is not None:
+            self.setSlice(self._curSlice)  # the pyramid level depends on the view
+        else:
+            viewerCore.ViewerCore.refreshPlane(self)
         
-        self.setSlice(self.__curSlice)            
-    
-    def imgProcessing(self, data):
-        # display levels
-        nlevels = 256    #int8
-        bpp = 8
+    def setROIShape(self, shape):
+        """ Draw a region of interest of shape (one of roiStats.ROI_SHAPES) by dragging with the
+        left mouse button instead of panning, None removes it. Its statistics are sent
+        by roiChanged whenever the ROI or the displayed plane changes.
+        """
+        if shape is not None and shape not in roiStats.ROI_SHAPES:
+            raise RuntimeError("Unknown ROI shape %s, use one of %s" % (shape, roiStats.ROI_SHAPES))
+        self.__roiShape = shape
+        if shape is None:
+            self.setROI(None)
+        elif self.__roiRect is not None:
+            self.setROI(self.__roiRect)
+            
+    def getROIShape(self):
+        return self.__roiShape
         
-        y_min = 0
-        y_max = nlevels -1 
+    def setROI(self, rect):
+        """ Set the ROI to the scene rectangle rect, None removes it.
+        """
+        if self.__roiItem is not None:
+            self.scene.removeItem(self.__roiItem)
+            self.__roiItem = None
+        self.__roiRect = None if rect is None else QRectF(rect).normalized()
+        if self.__roiRect is None or self.__roiShape is None:
+            self.__roiRect = None
+            self.__roiStats.clear()
+            self.roiChanged.emit(None)
+            return
+        pen = QPen(Qt.yellow)
+        pen.setCosmetic(True)
+        if self.__roiShape == 'ellipse':
+            self.__roiItem = self.scene.addEllipse(self.__roiRect, pen)
+        else:
+            self.__roiItem = self.scene.addRect(self.__roiRect, pen)
+        self.__roiItem.setZValue(1)
+        self.updateROI()
         
-        dout = ((data - (self.__winwidth/2+self.__winlevel - 0.5))/(self.__winwidth - 1) + 0.5) * (y_max-y_min) + y_min
+    def getROI(self):
+        return self.__roiRect
         
-        dout[dout<y_min] = y_min
-        dout[dout>y_max] = y_max
+    def updateROI(self):
+        self.roiChanged.emit(self.measureROI())
         
-        return dout.astype(np.uint8) 
-    
-    def resampleImage(self, spacing=None,fill_value=0):
-        
-        sitk_image = sitk.GetImageFromArray(self.__imageData)
-        sitk_image.SetSpacing([float(self.__pixelspacing[2]), \
-                               float(self.__pixelspacing[1]), \
-                               float(self.__pixelspacing[0])])
-        
-        num_dim = sitk_image.GetDimension()
-        orig_pixelid = sitk_image.GetPixelIDValue()
-        orig_origin = sitk_image.GetOrigin()
-        orig_direction = sitk_image.GetDirection()
-        orig_spacing = sitk_image.GetSpacing()
-        orig_size = np.array(sitk_image.GetSize(), dtype=np.int)
-    
-        if spacing is None:
-            min_spacing = min(orig_spacing)
-            new_spacing = [min_spacing]*num_dim
+    def measureROI(self):
+        """ Statistics of the raw values of the displayed plane inside the ROI, see
+        roiStats.PlaneStats.measure, with its 'area' in squared spacing units (mm^2).
+        Returns None without a ROI or when it is outside the plane.
+        """
+        if self.__roiRect is None or self._imageData is None:
+            return None
+        key = (self.__frame, self._imgorientation, self._curSlice, self.getSlabWidth(), self.getSlabMode(),
+               self.getObliqueTilts(), id(self._imageData), id(self.__resampleGrid))
+        if key in self.__roiStats:
+            self.__roiStats.move_to_end(key)
         else:
-            new_spacing = [float(s) for s in spacing]
-    
-        sitk_interpolator = sitk.sitkLinear
-    
-        new_size = orig_size*(np.array(orig_spacing)/np.array(new_spacing))
-        new_size = np.ceil(new_size).astype(np.int) #  Image dimensions are in integers
-        new_size = [int(s) for s in new_size] #  SimpleITK expects lists, not ndarrays
-    
-        resample_filter = sitk.ResampleImageFilter()
-    
-        resampled_sitk_image = resample_filter.Execute(sitk_image,
-                                                       new_size,
-                                                       sitk.Transform(),
-                                                       sitk_interpolator,
-                                                       orig_origin,
-                                                       new_spacing,
-                                                       orig_direction,
-                                                       fill_value,
-                                                       orig_pixelid)
-    
-        self.__imageData = np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0])
-        self.__pixeldims = self.__imageData.shape
-        self.__pixelspacing = [new_spacing,new_spacing,new_spacing]
-        self.__winlevel = self.__imageData.min()
-        self.__winwidth = self.__imageData.max()-self.__imageData.min()         
-        self.__imgorientation = 1 # x-y
-        self.__curSlice = self.__pixeldims[2]//2
-        self.setSlice(self.__curSlice) 
-        
-    def setCrossShow(self, value):
-        if value == 0:
-            self.__crossshow = False
+            self.__roiStats[key] = roiStats.PlaneStats(self.getPlane(self._imgorientation, self._curSlice))
+            if len(self.__roiStats) > ROI_CACHE_SIZE:
+                self.__roiStats.popitem(last=False)
+        stats = self.__roiStats[key]
+        shape = stats.getShape()
+        
+        # the ROI in plane pixels, a pixel is inside when its center is
+        toPlane, invertible = self.planeTransform(shape).inverted()
+        rect = toPlane.mapRect(self.__roiRect)
+        r0, r1 = int(math.ceil(rect.top() - 0.5)), int(math.floor(rect.bottom() - 0.5)) + 1
+        c0, c1 = int(math.ceil(rect.left() - 0.5)), int(math.floor(rect.right() - 0.5)) + 1
+        result = stats.measure(self.__roiShape, r0, r1, c0, c1)
+        if result is not None:
+            # spacing of the plane samples, oblique planes have fewer samples than voxels
+            area = 1.0
+            for n, a in zip(shape, self.planeAxes(self._imgorientation)):
+                spacing = 1.0 if self._pixelspacing is None else float(self._pixelspacing[a])
+                area *= spacing*max(self._pixeldims[a]-1, 1)/max(n-1, 1)
+            result['area'] = result['pixels']*area
+        return result
+        
+    def mousePressEvent(self, event):
+        if self.__roiShape is not None and event.button() == Qt.LeftButton and self.hasImage():
+            self.__roiStart = self.mapToScene(event.pos())
+            self.setROI(QRectF(self.__roiStart, self.__roiStart))
+            event.accept()
         else:
-            self.__crossshow = True
-    
-    def getImageMaximum(self):
-        if self.__imageData is not None:
-            return self.__imageData.max()
+            viewerCore.ViewerCore.mousePressEvent(self, event)
+            
+    def mouseMoveEvent(self, event):
+        viewerCore.ViewerCore.mouseMoveEvent(self, event)
+        if self.__roiStart is not None:
+            rect = QRectF(self.__roiStart, self.mapToScene(event.pos())).normalized()
+            self.__roiItem.setRect(rect)
+            self.__roiRect = rect
+            self.updateROI()
+            
+    def mouseReleaseEvent(self, event):
+        if self.__roiStart is not None and event.button() == Qt.LeftButton:
+            self.__roiStart = None
+            event.accept()
         else:
-            return 0
+            viewerCore.ViewerCore.mouseReleaseEvent(self, event)
         
-    def getImageMinimum(self):
-        if self.__imageData is not None:
-            return self.__imageData.min()
-        else:
-            return 0  
+    def setSlab(self, width, mode='max'):
+        self.__sliceCache.clear()
+        viewerCore.ViewerCore.setSlab(self, width, mode)
         
-    def getWinLevelRange(self):
-        if self.__imageData is None:
-            return [0,1]
-        else:
-            return [self.__imageData.min(), self.__imageData.max()]  
-    
-    def getWinWidthRange(self):
-        if self.__imageData is None:
-            return [0,1]
+    def reslicePlane(self, data, orientation, index, view=None):
+        """ Plane of the 3D array data, without caching so it can run on a prefetch thread.
+        """
+        if self.__resampleGrid is None:
+            return self.samplePlane(data, orientation, index, view)
+        
+        axis = self.sliceAxis(orientation)
+        if self.isOblique():
+            # oblique planes are interpolated from the original voxels anyway
+            return self.obliquePlane(data, orientation, self.__resampleGrid[axis][index], self.__resampleSpacing, view)
+        elif self.getSlabWidth() > 1:
+            # slabs are projected on the voxel grid, around the nearest original slice
+            position = int(round(self.__resampleGrid[axis][index]))
+            plane = self.slabPlane(data, orientation, min(max(position, 0), data.shape[axis]-1))
         else:
-            return [0, self.__imageData.max()-self.__imageData.min()]  
+            plane = resliceAxis(data, axis, self.__resampleGrid[axis][index:index+1], self.__resampleFill)
+            plane = np.take(plane, 0, axis=axis)
+        inPlane = self.planeAxes(orientation)
+        plane = resliceAxis(plane, 0, self.__resampleGrid[inPlane[0]], self.__resampleFill)
+        plane = resliceAxis(plane, 1, self.__resampleGrid[inPlane[1]], self.__resampleFill)
+        return plane
+        
+    def getFrameCount(self):
+        if self.__volume4D is None:
+            return 1
+        return self.__volume4D.shape[3]
+        
+    def getCurFrame(self):
+        return self.__frame
+        
+    def setFrame(self, frame):
+        """ Show frame (time point or bin) of a 4D volume at the current slice.
+        """
+        if self.__volume4D is not None and 0 <= frame < self.getFrameCount():
+            self.__frame = frame
+            self._imageData = self.__volume4D[..., frame]
+            self.setSlice(self._curSlice)
+            self.frameChanged.emit(frame)
             
-    def setSliceOrientation(self, orientation):
-        if orientation == 1:
-            self.__imgorientation = 1
-            self.setSliceOrientationToXY()
-        elif orientation == 2:   
-            self.__imgorientation = 2
-            self.setSliceOrientationToXZ()
-        else:
-            self.__imgorientation = 3
-            self.setSliceOrientationToYZ()
-    
-    def setSliceOrientationToXY(self):
-        self.__imgorientation = 1
-        if (self.__imageData is not None):
-            self.__curSlice = self.__pixeldims[2]//2
-            self.setSlice(self.__curSlice) 
-    
-    def setSliceOrientationToXZ(self):
-        self.__imgorientation = 2
-        if (self.__imageData is not None):
-            self.__curSlice = self.__pixeldims[1]//2
-            self.setSlice(self.__curSlice) 
-    
-    def setSliceOrientationToYZ(self):
-        self.__imgorientation = 3
-        if (self.__imageData is not None):
-            self.__curSlice = self.__pixeldims[0]//2 
-            self.setSlice(self.__curSlice) 
-        
-    def setFlipX(self, value):
-        self.__flipX = value
-        self.setSlice(self.__curSlice) 
-    
-    def setFlipY(self, value):
-        self.__flipY = value
-        self.setSlice(self.__curSlice)   
-    
-    def setRotateAngle(self, value):
-        self.__rotateAngle = value
-        self.setSlice(self.__curSlice)  
+    def startCine(self, fps=10.0):
+        """ Play the frames of a 4D volume at fps frames per second, looping.
+        Frames are read ahead into a ring buffer of CINE_PREFETCH planes on background threads.
+        When a frame is late the ones that are due meanwhile are skipped and counted as dropped.
+        """
+        if self.getFrameCount() < 2:
+            return
+        if not fps > 0:
+            print("ERROR: cine frame rate must be positive, got %s" % fps)
+            return
+        self.stopCine()
+        self.__cineFps = float(fps)
+        self.__cineStats = {'shown': 0, 'dropped': 0}
+        self.__cineStartFrame = self.__frame
+        self.__cineStep = -1
+        self.__cineStart = time.perf_counter()
+        self.prefetchFrames(self.__frame)
+        self.__cineTimer.start(max(1, int(1000/self.__cineFps)))
+        
+    def stopCine(self):
+        if self.__cineTimer.isActive():
+            self.__cineStats['elapsed'] = time.perf_counter() - self.__cineStart
+        self.__cineTimer.stop()
+        for future in self.__cineBuffer.values():
+            future.cancel()
+        self.__cineBuffer.clear()
+        
+    def shutdownPrefetch(self):
+        """ Stop the cine and release the prefetch threads, a new pool is made by the next cine.
+        """
+        self.stopCine()
+        if self.__prefetchPool is not None:
+            self.__prefetchPool.shutdown(wait=False)
+            self.__prefetchPool = None
+            
+    def closeEvent(self, event):
+        self.shutdownPrefetch()
+        viewerCore.ViewerCore.closeEvent(self, event)
         
-    def getRotateAngle(self):
-        return self.__rotateAngle
-    
-    def getCurSlice(self):
-        return self.__curSlice
-    
-    def getImgOrientation(self):
-        return self.__imgorientation
-    
-    def getCrosshair(self):
-        return self.__crosshair
-       
-    def get_qimage(self,image:np.ndarray):
-#         assert (np.max(image) <= 256)
-        image8 = image.astype(np.uint8, order='C', casting='unsafe')
-        height, width = image8.shape
-        bytesPerLine = width
-        image = QImage(image8.data, width, height, bytesPerLine, QImage.Format_Indexed8)
-        return image
- 
-    def setSlice(self, slice):
-        if (self.__imageData is not None) and (slice>=self.getSliceMin() and slice<=self.getSliceMax()):
-            self.__curSlice = slice
-            if self.__imgorientation == 1:   #x-y
-#                 localData = self.__imageData[:,:,slice]
-                data = self.imgProcessing(self.__imageData[:,:,slice])  
-                qimage = self.get_qimage(data)
-#                 qimage = qimage.mirrored(self.__flipX, self.__flipY)
-                rotate = QTransform()
-                rotate.rotate(self.__rotateAngle)
-                qimg = qimage.transformed(rotate)
-                self.setImage(qimg)                
-            elif self.__imgorientation == 2:  #x-z
-                data = self.imgProcessing(self.__imageData[:,slice,:])              
-                qimage = self.get_qimage(data)
-#                 qimage = qimage.mirrored(self.__flipX, self.__flipY)   
-                rotate = QTransform()
-                rotate.rotate(self.__rotateAngle)
-                qimg = qimage.transformed(rotate)                
-                self.setImage(qimg) 
-            else:                          #y-z
-                data = self.imgProcessing(self.__imageData[slice,:,:])              
-                qimage = self.get_qimage(data)
-#                 qimage = qimage.mirrored(self.__flipX, self.__flipY)   
-                rotate = QTransform()
-                rotate.rotate(self.__rotateAngle)
-                qimg = qimage.transformed(rotate)                
-                self.setImage(qimg)   
-    
-    def getImgWidth(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]
-            else:
-                return 0            
+    def isCinePlaying(self):
+        return self.__cineTimer.isActive()
         
-    def getImgHeight(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]
-            else:
-                return 0  
+    def getCineStats(self):
+        """ Returns the target fps, the frames shown and dropped and the achieved fps of the last cine run.
+        """
+        stats = dict(self.__cineStats)
+        stats['fps'] = self.__cineFps
+        if self.__cineTimer.isActive():
+            stats['elapsed'] = time.perf_counter() - self.__cineStart
+        elapsed = stats.get('elapsed', 0)
+        stats['achievedFps'] = stats['shown'] / elapsed if elapsed > 0 else 0.0
+        return stats
+        
+    def readFramePlane(self, frame, orientation, index, view=None):
+        # runs on a prefetch thread, np.array forces the read from a memory mapped volume
+        return np.array(self.reslicePlane(self.__volume4D[..., frame], orientation, index, view))
+        
+    def cineView(self):
+        """ The part of the oblique plane to sample for the view, computed on the GUI thread
+        for the prefetch threads. None for axis aligned planes.
+        """
+        if not self.isOblique():
+            return None
+        return self.obliqueView(self.displayShape(self._imgorientation))
+        
+    def prefetchFrames(self, frame):
+        n = self.getFrameCount()
+        view = self.cineView()
+        wanted = [((frame + k) % n, self._imgorientation, self._curSlice, view) for k in range(1, CINE_PREFETCH+1)]
+        for key in list(self.__cineBuffer):
+            if key not in wanted:
+                self.__cineBuffer.pop(key).cancel()
+        if self.__prefetchPool is None:
+            self.__prefetchPool = ThreadPoolExecutor(max_workers=2)
+        for key in wanted:
+            if key not in self.__cineBuffer:
+                self.__cineBuffer[key] = self.__prefetchPool.submit(self.readFramePlane, *key)
+        
+    def cineTick(self):
+        step = int((time.perf_counter() - self.__cineStart)*self.__cineFps)
+        if step <= self.__cineStep:
+            return
+        if self.__cineStep >= 0:
+            self.__cineStats['dropped'] += step - self.__cineStep - 1
+        self.__cineStep = step
+        
+        frame = (self.__cineStartFrame + step) % self.getFrameCount()
+        view = self.cineView()
+        key = (frame, self._imgorientation, self._curSlice, view)
+        t0 = time.perf_counter()
+        if key in self.__cineBuffer:
+            plane = self.__cineBuffer.pop(key).result()
+        else:
+            plane = self.readFramePlane(*key)
+        self.markStage('extract', t0)
         
-    def getSliceMin(self):
-        return 0
-    
-    def getSliceMax(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]-1
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]-1
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]-1
-            else:
-                return 0
-    
-    def getSliceRange(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]
-            else:
-                return 0
-    
-    def loadDicomSeries(self, folderName=""):  
+        self.__frame = frame
+        self._imageData = self.__volume4D[..., frame]
+        if view is None:
+            self.displayPlane(plane)
+        else:
+            self.displayPlane(plane, shape=self.displayShape(self._imgorientation), view=view)
+        self.__cineStats['shown'] += 1
+        self.prefetchFrames(frame)
+        self.frameChanged.emit(frame)
+        
+    def loadDicomSeries(self, folderName="", seriesID=None):  
         '''
         lstFilesDCM = []
             
@@ -672,147 +709,71 @@ class QtImageViewer(QGraphicsView):
         # Get ref file
         RefDs = dicom.read_file(lstFilesDCM[0])
         
-        self.__pixeldims = [int(RefDs.Rows), int(RefDs.Columns), len(lstFilesDCM)]
-        self.__pixelspacing = [(float)(RefDs.PixelSpacing[0]), (float)(RefDs.PixelSpacing[1]), (float)(RefDs.SliceThickness)]
+        self._pixeldims = [int(RefDs.Rows), int(RefDs.Columns), len(lstFilesDCM)]
+        self._pixelspacing = [(float)(RefDs.PixelSpacing[0]), (float)(RefDs.PixelSpacing[1]), (float)(RefDs.SliceThickness)]
         
-        self.__imageData = np.zeros(self.__pixeldims, dtype=float)
-        self.__fileName = folderName
+        self._imageData = np.zeros(self._pixeldims, dtype=float)
+        self._fileName = folderName
     
         # It cannot read compressed dicom data
         for filenameDCM in lstFilesDCM:
             # read the file
             ds = dicom.read_file(filenameDCM)
             # store the raw image data
-            self.__imageData[:, :, lstFilesDCM.index(filenameDCM)] = ds.pixel_array    
+            self._imageData[:, :, lstFilesDCM.index(filenameDCM)] = ds.pixel_array    
         '''
-        reader = sitk.ImageSeriesReader()
-        series_ids = reader.GetGDCMSeriesIDs(str(folderName))        
-        assert len(series_ids) == 1, 'Assuming only one series per folder.'
-        filenames = reader.GetGDCMSeriesFileNames(str(folderName), series_ids[0])
-        reader.SetFileNames(filenames)        
-        image = reader.Execute()
-        
-        self.__pixeldims = image.GetSize()
-        self.__pixelspacing = image.GetSpacing()
-        self.__imageData = sitk.GetArrayFromImage(image) #np.transpose(sitk.GetArrayFromImage(image), axes=[2,1,0])
-        self.__winlevel = self.__imageData.min()
-        self.__winwidth = self.__imageData.max()-self.__imageData.min()         
-        self.__imgorientation = 1 # x-y
-        self.__curSlice = self.__pixeldims[2]//2
-        self.setSlice(self.__curSlice) 
+        import dicomLoader
+
+        selected = dicomLoader.chooseSeries(folderName, seriesID, self)
+        if selected is None:
+            return
+        
+        self._imageData, info = dicomLoader.readSeries(*selected)
+        self._imageData = volumeCache.applyDtypePolicy(self._imageData, self._dtypePolicy)
+        self.shutdownPrefetch()
+        self.__volume4D = None
+        self.__frame = 0
+        self.__resampleGrid = None
+        self.__sliceCache.clear()
+        self._pixeldims = list(self._imageData.shape)
+        self.buildPyramid()
+        self._pixelspacing = info['spacing']
+        self._affine = viewerCore.volumeAffine(info)
+        self._winlevel = info['stats']['min']
+        self._winwidth = info['stats']['max']-info['stats']['min']         
+        self._imgorientation = 1 # x-y
+        self._curSlice = self._pixeldims[2]//2
+        self.setSlice(self._curSlice) 
         
         #self.resampleImage() works, but it takes time to get isotropic image
         
-        self.__fileName = str(folderName)        
+        self._fileName = str(folderName)        
         
     def loadNIFTI(self, fileName=""):
         if len(fileName) and os.path.isfile(fileName):
-            img = nib.load(fileName)
-        
-            self.__pixeldims = list(img.shape)
-            self.__pixelspacing = list(img.header.get_zooms())
-            self.__imageData = img.get_data()
-            self.__winlevel = self.__imageData.min()
-            self.__winwidth = self.__imageData.max()-self.__imageData.min()  
-            self.__imgorientation = 1 # x-y   
-            self.__curSlice = self.__pixeldims[2]//2
-            self.setSlice(self.__curSlice)
+            volume, info = volumeCache.loadNIFTI(fileName, self._dtypePolicy)
+            self.shutdownPrefetch()
+            self.__resampleGrid = None
+            self.__sliceCache.clear()
             
-            self.__fileName = fileName
-
-    def loadImageFromFile(self, fileName=""):
-        """ Load an image from file.
-        Without any arguments, loadImageFromFile() will popup a file dialog to choose the image file.
-        With a __fileName argument, loadImageFromFile(__fileName) will attempt to load the specified image file directly.
-        """
-        fileName, dummy = QFileDialog.getOpenFileName(self, "Open image file.")
-        if len(fileName) and os.path.isfile(fileName):
-            image = QImage(fileName)
-            self.setImage(image)
-
-    def updateViewer(self):
-        """ Show current zoom (if showing entire image, apply current aspect ratio mode).
-        """
-        if not self.hasImage():
-            return
-        if len(self.zoomStack) and self.sceneRect().contains(self.zoomStack[-1]):
-            self.fitInView(self.zoomStack[-1], Qt.IgnoreAspectRatio)  # Show zoomed rect (ignore aspect ratio).
-        else:
-            self.zoomStack = []  # Clear the zoom stack (in case we got here because of an invalid zoom).
-            self.fitInView(self.sceneRect(), self.aspectRatioMode)  # Show entire image (use current aspect ratio mode).
-
-    def resizeEvent(self, event):
-        """ Maintain current zoom on resize.
-        """
-        self.updateViewer()
-
-    def mousePressEvent(self, event):
-        """ Start mouse pan or zoom mode.
-        """
-        scenePos = self.mapToScene(event.pos())
-        if event.button() == Qt.LeftButton:
-            if self.canPan:
-                self.setDragMode(QGraphicsView.ScrollHandDrag)
-            self.leftMouseButtonPressed.emit(scenePos.x(), scenePos.y())
-        elif event.button() == Qt.RightButton:
-            if self.canZoom:
-                self.setDragMode(QGraphicsView.RubberBandDrag)
-            self.rightMouseButtonPressed.emit(scenePos.x(), scenePos.y())
-        QGraphicsView.mousePressEvent(self, event)
-
-    def mouseReleaseEvent(self, event):
-        """ Stop mouse pan or zoom mode (apply zoom if valid).
-        """
-        QGraphicsView.mouseReleaseEvent(self, event)
-        scenePos = self.mapToScene(event.pos())
-        if event.button() == Qt.LeftButton:
-            self.setDragMode(QGraphicsView.NoDrag)
-            self.leftMouseButtonReleased.emit(scenePos.x(), scenePos.y())
-        elif event.button() == Qt.RightButton:
-            if self.canZoom:
-                viewBBox = self.zoomStack[-1] if len(self.zoomStack) else self.sceneRect()
-                selectionBBox = self.scene.selectionArea().boundingRect().intersected(viewBBox)
-                self.scene.setSelectionArea(QPainterPath())  # Clear current selection area.
-                if selectionBBox.isValid() and (selectionBBox != viewBBox):
-                    self.zoomStack.append(selectionBBox)
-                    self.updateViewer()
-            self.setDragMode(QGraphicsView.NoDrag)
-            self.rightMouseButtonReleased.emit(scenePos.x(), scenePos.y())
-
-    def mouseDoubleClickEvent(self, event):
-        """ Show entire image.
-        """
-        scenePos = self.mapToScene(event.pos())
-        if event.button() == Qt.LeftButton:
-            self.leftMouseButtonDoubleClicked.emit(scenePos.x(), scenePos.y())
-        elif event.button() == Qt.RightButton:
-            if self.canZoom:
-                self.zoomStack = []  # Clear zoom stack.
-                self.updateViewer()
-            self.rightMouseButtonDoubleClicked.emit(scenePos.x(), scenePos.y())
-        QGraphicsView.mouseDoubleClickEvent(self, event)
-        
-    def mouseMoveEvent(self, event):
-        scenePos = self.mapToScene(event.pos())
-        
-        # record the position for cross drawing
-        self.__lineX.setLine(scenePos.x(),self.sceneRect().y(),scenePos.x(), self.sceneRect().y()+ self.sceneRect().height())      
-        self.__lineY.setLine(self.sceneRect().x(),scenePos.y(),self.sceneRect().x()+ self.sceneRect().width(),scenePos.y())  
-        
-        self.scene.invalidate(self.scene.sceneRect())
-        QGraphicsView.mouseMoveEvent(self, event)  # in PyQt5, update() doesn't trigger drawForeground()
-        
-    def drawForeground(self, painter, rect):
-        if self.__crossshow == True:
-            painter.save()
-            pen = QPen()
-            pen.setWidth(2)
-            pen.setColor(QColor(255,0,0))
-            painter.setPen(pen)
-            painter.drawLine(self.__lineX)
-            pen.setColor(QColor(0,255,0))
-            painter.setPen(pen)        
-            painter.drawLine(self.__lineY)
-            painter.restore()
-        QGraphicsView.drawForeground(self, painter, rect)          
+            # 4D volumes show one frame (time point or bin) at a time
+            self.__frame = 0
+            if volume.ndim == 4:
+                self.__volume4D = volume
+                self._imageData = volume[..., 0]
+            else:
+                self.__volume4D = None
+                self._imageData = volume
+        
+            self._pixeldims = list(self._imageData.shape)
+            self._pixelspacing = info['spacing']
+            self._affine = viewerCore.volumeAffine(info)
+            self._winlevel = info['stats']['min']
+            self._winwidth = info['stats']['max']-info['stats']['min']  
+            self._imgorientation = 1 # x-y   
+            self.buildPyramid(pyramid.pyramidKey(info, self._imageData))
+            self._curSlice = self._pixeldims[2]//2
+            self.setSlice(self._curSlice)
+            
+            self._fileName = fileName
 
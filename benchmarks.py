@@ -0,0 +1,324 @@
+#! /usr/bin/env python3
+"""
+benchmarks.py: headless timing of the viewer loading and rendering paths.
+
+Synthetic NIfTI volumes of several sizes and types are written to a temporary
+folder and timed through loadNIFTI, setSlice, imgProcessing, window dragging,
+the 3DViewer colormap and the Segmenter seed segmentation. Results are saved as
+JSON, and a previous results file can be given with --compare to report the
+changes between versions.
+
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import importlib
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+import nibabel as nib
+import volumeCache
+import ViewerSetup
+import setup3D
+
+from PyQt5.QtCore import QRectF
+from PyQt5.QtWidgets import QApplication
+
+__author__ = ""
+__version__ = ""
+
+# Volume shapes (x, y, z) benchmarked by name.
+SIZES = {'small': (128, 128, 64),
+         'medium': (256, 256, 128),
+         'large': (512, 512, 256)}
+
+DTYPES = ['uint8', 'int16', 'float32', 'float64']
+
+# A metric that got slower by more than this factor is reported as a regression.
+REGRESSION_RATIO = 1.2
+
+# Size of the offscreen viewers, so the rendering is limited to the viewport as in the viewers.
+VIEWER_SIZE = (800, 800)
+
+
+def makeVolume(shape, dtype, seed=0):
+    """ Returns a volume of the given shape and type holding a bright sphere on a noisy background.
+    """
+    rng = np.random.default_rng(seed)
+    x, y = np.meshgrid(np.arange(shape[0]), np.arange(shape[1]), indexing='ij')
+    volume = np.empty(shape, dtype=dtype)
+    top = 250 if dtype == 'uint8' else 1000
+    for z in range(shape[2]):
+        r2 = ((x-shape[0]/2)/shape[0])**2 + ((y-shape[1]/2)/shape[1])**2 + ((z-shape[2]/2)/shape[2])**2
+        plane = np.where(r2 < 0.09, 0.8*top, 0.2*top) + rng.normal(0, 0.05*top, shape[:2])
+        volume[:,:,z] = np.clip(plane, 0, top)
+    return volume
+
+
+def writeVolume(folder, size, dtype):
+    fileName = os.path.join(folder, '%s-%s.nii' % (size, dtype))
+    nib.save(nib.Nifti1Image(makeVolume(SIZES[size], dtype), np.eye(4)), fileName)
+    return fileName
+
+
+def summary(times):
+    """ Returns the mean, median, 95th percentile and minimum of times (seconds) in ms.
+    """
+    ms = np.array(times)*1000
+    return {'mean_ms': float(ms.mean()), 'median_ms': float(np.median(ms)),
+            'p95_ms': float(np.percentile(ms, 95)), 'min_ms': float(ms.min()), 'count': len(ms)}
+
+
+def timeCalls(func, args):
+    """ Calls func once per entry of args and returns the time of each call.
+    """
+    times = []
+    for arg in args:
+        t0 = time.perf_counter()
+        func(*arg)
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def showViewer(app, viewer):
+    """ Show viewer offscreen at VIEWER_SIZE and let it fit the scene.
+    """
+    viewer.resize(*VIEWER_SIZE)
+    viewer.show()
+    app.processEvents()
+    viewer.updateViewer()
+    app.processEvents()
+
+
+def benchLoad(fileName, repeats):
+    """ loadNIFTI without a cache entry (decode and store) and from the cache (memory map).
+    """
+    def load(clear):
+        if clear:
+            shutil.rmtree(os.path.join(volumeCache.CACHE_DIR, 'volumes'), ignore_errors=True)
+        viewer = ViewerSetup.QtImageViewer()
+        t0 = time.perf_counter()
+        viewer.loadNIFTI(fileName)
+        return time.perf_counter() - t0
+
+    cold = [load(True) for i in range(repeats)]
+    cached = [load(False) for i in range(repeats)]
+    return {'load_cold': summary(cold), 'load_cached': summary(cached)}
+
+
+def benchRender(app, fileName, repeats):
+    """ setSlice latency per orientation fitted to the viewer and zoomed in on a quarter of
+    the plane, imgProcessing alone and window drag throughput.
+    """
+    viewer = ViewerSetup.QtImageViewer()
+    showViewer(app, viewer)
+    viewer.loadNIFTI(fileName)
+    app.processEvents()
+    results = {}
+    for orientation, name in [(1, 'xy'), (2, 'xz'), (3, 'yz')]:
+        viewer.setSliceOrientation(orientation)
+        app.processEvents()
+        slices = range(viewer.getSliceMin(), viewer.getSliceMax()+1)
+        times = []
+        for i in range(repeats):
+            times += timeCalls(viewer.setSlice, [(s,) for s in slices])
+        results['set_slice_' + name] = summary(times)
+
+    viewer.setSliceOrientation(1)
+    app.processEvents()
+    scene = viewer.sceneRect()
+    viewer.zoomStack.append(QRectF(scene.x() + scene.width()/4, scene.y() + scene.height()/4,
+                                   scene.width()/4, scene.height()/4))
+    viewer.updateViewer()
+    app.processEvents()
+    slices = range(viewer.getSliceMin(), viewer.getSliceMax()+1)
+    results['set_slice_zoomed'] = summary(timeCalls(viewer.setSlice, [(s,) for s in slices]*repeats))
+    viewer.zoomStack = []
+    viewer.updateViewer()
+    app.processEvents()
+
+    plane = viewer.getPlane(1, viewer.getCurSlice())
+    results['img_processing'] = summary(timeCalls(viewer.imgProcessing, [(plane,)]*(20*repeats)))
+
+    # a drag sweeps the level and the width, each step redraws the slice
+    level = viewer.getWindowLevel()
+    width = viewer.getWindowWidth()
+    steps = [(level + width*t/4, width*(0.5 + t/2)) for t in np.linspace(0, 1, 50*repeats)]
+    times = timeCalls(viewer.imgWindowChange, steps)
+    results['window_drag'] = summary(times)
+    results['window_drag']['updates_per_s'] = len(times)/sum(times)
+    return results
+
+
+def benchColormap(app, fileName, repeats):
+    """ 3DViewer.colormap on the middle slice of the volume, a color table swap per call.
+    """
+    viewer3D = importlib.import_module('3DViewer')
+    from rangeSlider import RangeSlider
+
+    viewer = setup3D.QtImageViewer()
+    showViewer(app, viewer)
+    viewer.loadNIFTI(fileName)
+    transparency = RangeSlider()
+    transparency.setMaximum(255)
+    transparency.setValue(20, 230)
+    saturation = RangeSlider()
+    saturation.setMaximum(255)
+    saturation.setValue(60, 200)
+    return summary(timeCalls(viewer3D.colormap, [([viewer], transparency, saturation)]*(20*repeats)))
+
+
+def importSegmenter():
+    """ Returns the SegmenterSetup module, or the reason it cannot be imported.
+    SegmenterSetup switches matplotlib to Tk, which needs a display, so matplotlib
+    is put on the headless Agg backend and the switch is skipped while importing it.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    use = matplotlib.use
+    matplotlib.use = lambda *args, **kwargs: None
+    try:
+        return importlib.import_module('SegmenterSetup')
+    except ImportError as err:
+        return str(err)
+    finally:
+        matplotlib.use = use
+
+
+def benchSegmentation(segmenter, fileName, repeats):
+    """ SegmenterSetup.segSliceBasedOnSeed from a seed in the middle of the middle slice.
+    """
+    if isinstance(segmenter, str):
+        print("ERROR: segmentation skipped, %s" % segmenter)
+        return {'skipped': segmenter}
+
+    viewer = segmenter.QtImageViewer()
+    volume = np.asanyarray(nib.load(fileName).dataobj)
+    plane = np.asarray(volume[:,:,volume.shape[2]//2], dtype=float)
+    seed = (plane.shape[0]//2, plane.shape[1]//2)
+    stdout = sys.stdout
+    try:
+        sys.stdout = open(os.devnull, 'w')   # segSliceBasedOnSeed prints its thresholds
+        times = timeCalls(viewer.segSliceBasedOnSeed, [(plane, seed[0], seed[1], 0.5)]*repeats)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return summary(times)
+
+
+def runBenchmarks(app, sizes, dtypes, repeats, folder, segmenter):
+    results = {}
+    for size in sizes:
+        for dtype in dtypes:
+            name = '%s-%s' % (size, dtype)
+            print("%s %s" % (name, 'x'.join(str(n) for n in SIZES[size])))
+            fileName = writeVolume(folder, size, dtype)
+            entry = {'shape': list(SIZES[size]), 'dtype': dtype}
+            entry.update(benchLoad(fileName, repeats))
+            entry.update(benchRender(app, fileName, repeats))
+            entry['colormap'] = benchColormap(app, fileName, repeats)
+            entry['segmentation'] = benchSegmentation(segmenter, fileName, repeats)
+            results[name] = entry
+            os.remove(fileName)
+    return results
+
+
+def environment():
+    import PyQt5.QtCore
+    return {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'platform': platform.platform(),
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'qt': PyQt5.QtCore.QT_VERSION_STR, 'cpus': os.cpu_count()}
+
+
+def metricTimes(results):
+    """ Returns {'volume/metric': median ms} for every timed metric of results.
+    """
+    times = {}
+    for name, entry in results.items():
+        for metric, value in entry.items():
+            if isinstance(value, dict) and 'median_ms' in value:
+                times[name + '/' + metric] = value['median_ms']
+    return times
+
+
+def compareResults(baseline, results, ratio=REGRESSION_RATIO):
+    """ Print the median time of each metric against a baseline run.
+    Returns the number of metrics more than ratio times slower.
+    """
+    old = metricTimes(baseline['results'])
+    new = metricTimes(results)
+    regressions = 0
+    for key in sorted(set(old) & set(new)):
+        change = new[key]/old[key] if old[key] > 0 else float('inf')
+        flag = ''
+        if change > ratio:
+            flag = '  REGRESSION'
+            regressions += 1
+        print("%-40s %10.3f ms %10.3f ms %6.2fx%s" % (key, old[key], new[key], change, flag))
+    if regressions:
+        print("ERROR: %d metrics are more than %.2fx slower than %s" % (regressions, ratio, baseline['environment']['time']))
+    return regressions
+
+
+def printResults(results):
+    for key, value in sorted(metricTimes(results).items()):
+        print("%-40s %10.3f ms" % (key, value))
+
+
+def parseArgs():
+    global args
+    parser = argparse.ArgumentParser(description='Benchmark the viewer loading and rendering.')
+    parser.add_argument('-s', '--sizes', help='Volume sizes, from %s' % list(SIZES), default='small,medium')
+    parser.add_argument('-d', '--dtypes', help='Volume types, from %s' % DTYPES, default='int16,float32')
+    parser.add_argument('-r', '--repeats', help='Repeats of each measurement', type=int, default=3)
+    parser.add_argument('-o', '--output', help='JSON file for the results', default='benchmarks.json')
+    parser.add_argument('-c', '--compare', help='JSON results of an earlier run to compare against', default='')
+
+    args = parser.parse_args()
+
+
+def main():
+    sizes = args.sizes.split(',')
+    dtypes = args.dtypes.split(',')
+    for size in sizes:
+        if size not in SIZES:
+            raise RuntimeError("Unknown size %s, use one of %s" % (size, list(SIZES)))
+    for dtype in dtypes:
+        if dtype not in DTYPES:
+            raise RuntimeError("Unknown dtype %s, use one of %s" % (dtype, DTYPES))
+
+    segmenter = importSegmenter()
+    app = QApplication(sys.argv)
+
+    # a private cache, so cold loads do not touch the user cache
+    folder = tempfile.mkdtemp(prefix='imageviewers-bench-')
+    volumeCache.CACHE_DIR = os.path.join(folder, 'cache')
+    volumeCache.ENABLED = True
+    try:
+        results = runBenchmarks(app, sizes, dtypes, args.repeats, folder, segmenter)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print("Results saved to %s" % args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compareResults(baseline, results):
+            sys.exit(1)
+    else:
+        printResults(results)
+
+
+if __name__ == '__main__':
+    parseArgs()
+    main()
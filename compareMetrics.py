@@ -0,0 +1,197 @@
+#! /usr/bin/env python3
+"""
+compareMetrics.py: per-slice quantitative comparison of two volumes of the same shape.
+
+For every slice along an axis VolumeComparison computes the RMSE, the mean absolute
+error, the correlation and the SSIM (mean over 7x7 windows inside the slice, with the
+window sums taken from summed-area tables) of the left against the right volume. The
+slices are split into chunks sized to bound the memory of the float64 temporaries,
+each chunk is computed for all its slices at once, and the chunks run on a pool of
+background threads. Results are filled in as chunks finish, pending slices and the
+slices of chunks that failed are NaN.
+
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+__author__ = ""
+__version__ = ""
+
+METRICS = ['rmse', 'mae', 'correlation', 'ssim']
+
+# Side of the square SSIM window and the SSIM stability constants.
+SSIM_WINDOW = 7
+SSIM_K1 = 0.01
+SSIM_K2 = 0.03
+
+# Memory used by the temporaries of one chunk, about ten float64 copies of its slices.
+METRIC_CHUNK_BYTES = 64*1024*1024
+
+
+def boxMean(data, width):
+    """ Mean of data (x, y, slices) over every width x width window inside a plane, for all
+    slices at once.
+    """
+    x, y, n = data.shape
+    table = np.zeros((x+1, y+1, n), dtype=np.float64)
+    np.cumsum(data, axis=0, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    total = table[width:, width:] - table[:-width, width:] - table[width:, :-width] + table[:-width, :-width]
+    return total/(width*width)
+
+
+def sliceMetrics(left, right, dataRange):
+    """ Metrics of the slices of left against right, both (x, y, slices), as a dict of
+    METRICS to arrays of one value per slice. dataRange is the value range used by the
+    SSIM constants. The correlation of a constant slice is NaN.
+    """
+    a = np.array(left, dtype=np.float64)
+    b = np.array(right, dtype=np.float64)
+    pixels = a.shape[0]*a.shape[1]
+
+    diff = a - b
+    rmse = np.sqrt(np.einsum('ijk,ijk->k', diff, diff)/pixels)
+    mae = np.abs(diff, out=diff).sum(axis=(0, 1))/pixels
+    del diff
+
+    # centering on the slice means keeps the window sums of squares accurate
+    meanA = a.mean(axis=(0, 1))
+    meanB = b.mean(axis=(0, 1))
+    a -= meanA
+    b -= meanB
+    saa = np.einsum('ijk,ijk->k', a, a)
+    sbb = np.einsum('ijk,ijk->k', b, b)
+    sab = np.einsum('ijk,ijk->k', a, b)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlation = np.where((saa > 0) & (sbb > 0), sab/np.sqrt(saa*sbb), np.nan)
+
+    width = min(SSIM_WINDOW, a.shape[0], a.shape[1])
+    count = width*width
+    norm = count/(count - 1.0) if count > 1 else 1.0
+    muA = boxMean(a, width)
+    muB = boxMean(b, width)
+    varA = (boxMean(a*a, width) - muA*muA)*norm
+    varB = (boxMean(b*b, width) - muB*muB)*norm
+    covAB = (boxMean(a*b, width) - muA*muB)*norm
+    muA += meanA
+    muB += meanB
+    c1 = (SSIM_K1*dataRange)**2
+    c2 = (SSIM_K2*dataRange)**2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ssimMap = ((2*muA*muB + c1)*(2*covAB + c2))/((muA*muA + muB*muB + c1)*(varA + varB + c2))
+    ssim = ssimMap.mean(axis=(0, 1))
+
+    return {'rmse': rmse, 'mae': mae, 'correlation': correlation, 'ssim': ssim}
+
+
+def chunkSlices(shape, axis, chunkBytes=METRIC_CHUNK_BYTES):
+    """ Number of slices along axis of a volume of shape computed together.
+    """
+    pixels = int(np.prod(shape))//shape[axis]
+    return max(1, min(shape[axis], chunkBytes//(pixels*8*10)))
+
+
+class VolumeComparison(object):
+    """ Per-slice METRICS of left against right along axis, computed in the background.
+    """
+
+    def __init__(self, left, right, axis, numThreads=None, chunkBytes=METRIC_CHUNK_BYTES):
+        if left.shape != right.shape:
+            raise RuntimeError("VolumeComparison: volumes differ in shape %s and %s." % (left.shape, right.shape))
+        self.__left = left
+        self.__right = right
+        self.__axis = axis
+        self.__numThreads = numThreads or os.cpu_count()
+        self.__chunk = chunkSlices(left.shape, axis, chunkBytes)
+        count = left.shape[axis]
+        self.__metrics = dict((name, np.full(count, np.nan)) for name in METRICS)
+        self.__done = 0
+        self.__failed = 0
+        self.__lock = threading.Lock()
+        self.__cancelled = False
+        self.__thread = None
+
+    def start(self):
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.run, daemon=True)
+            self.__thread.start()
+
+    def cancel(self):
+        self.__cancelled = True
+
+    def wait(self, timeout=None):
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+
+    def getSlab(self, data, first, last):
+        """ Slices [first, last) of data as a (x, y, slices) block.
+        """
+        key = [slice(None)]*3
+        key[self.__axis] = slice(first, last)
+        return np.moveaxis(np.asarray(data[tuple(key)]), self.__axis, 2)
+
+    def computeChunk(self, first, last, dataRange):
+        if self.__cancelled:
+            return
+        try:
+            values = sliceMetrics(self.getSlab(self.__left, first, last),
+                                  self.getSlab(self.__right, first, last), dataRange)
+        except Exception as e:
+            print("ERROR: comparing slices %d to %d failed: %s" % (first, last-1, e))
+            with self.__lock:
+                self.__failed += last - first
+            return
+        with self.__lock:
+            for name in METRICS:
+                self.__metrics[name][first:last] = values[name]
+            self.__done += last - first
+
+    def run(self):
+        count = self.getSliceCount()
+        try:
+            low = min(np.min(self.__left), np.min(self.__right))
+            high = max(np.max(self.__left), np.max(self.__right))
+            dataRange = float(high) - float(low)
+        except Exception as e:
+            print("ERROR: comparing volumes failed: %s" % e)
+            with self.__lock:
+                self.__failed = count - self.__done
+            return
+        with ThreadPoolExecutor(max_workers=self.__numThreads) as pool:
+            for first in range(0, count, self.__chunk):
+                pool.submit(self.computeChunk, first, min(first + self.__chunk, count), dataRange)
+
+    def getAxis(self):
+        return self.__axis
+
+    def getSliceCount(self):
+        return self.__left.shape[self.__axis]
+
+    def getDoneCount(self):
+        return self.__done
+
+    def getFailedCount(self):
+        return self.__failed
+
+    def isComplete(self):
+        """ True once every slice has been computed or has failed.
+        """
+        return self.__done + self.__failed == self.getSliceCount()
+
+    def getMetrics(self):
+        """ Dict of METRICS to per-slice arrays, NaN for the slices not computed yet or failed.
+        """
+        return self.__metrics
+
+    def worstSlice(self, name):
+        """ Slice with the largest error (rmse, mae) or the lowest similarity (correlation, ssim)
+        among the ones computed, None before any is.
+        """
+        values = self.__metrics[name]
+        if np.all(np.isnan(values)):
+            return None
+        return int(np.nanargmax(values) if name in ('rmse', 'mae') else np.nanargmin(values))
@@ -0,0 +1,130 @@
+#! /usr/bin/env python3
+"""
+dicomLoader.py: DICOM series ingestion for the QtImageViewer widgets.
+
+Slices of a series are decoded in a thread pool straight into a memory-mappable
+volume in the volumeCache, keyed by the series instance UID, so a series that was
+opened before is mapped from disk instead of decoded again.
+
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import SimpleITK as sitk
+import volumeCache
+
+from PyQt5.QtWidgets import QInputDialog
+
+__author__ = ""
+__version__ = ""
+
+
+def listSeries(folderName):
+    """ Returns a list of (seriesUID, description, fileNames) for every DICOM series in folderName.
+    File names are sorted by slice position.
+    """
+    reader = sitk.ImageSeriesReader()
+    series = []
+    for uid in reader.GetGDCMSeriesIDs(str(folderName)):
+        fileNames = reader.GetGDCMSeriesFileNames(str(folderName), uid)
+        series.append((uid, seriesDescription(fileNames[0]), fileNames))
+    return series
+
+
+def seriesDescription(fileName):
+    """ Returns the modality and series description of a DICOM file without decoding its pixels.
+    """
+    reader = sitk.ImageFileReader()
+    reader.SetFileName(fileName)
+    reader.ReadImageInformation()
+    desc = []
+    for tag in ['0008|0060', '0008|103e']:   #modality, series description
+        if reader.HasMetaDataKey(tag):
+            desc.append(reader.GetMetaData(tag).strip())
+    return ' '.join(desc)
+
+
+def chooseSeries(folderName, seriesID=None, parent=None):
+    """ Returns (seriesUID, fileNames) for the series to load from folderName, or None.
+    Without a seriesID a folder holding several series pops up a series picker.
+    """
+    series = listSeries(folderName)
+    if len(series) == 0:
+        print("ERROR: no DICOM series found in %s" % folderName)
+        return None
+
+    if seriesID is not None:
+        for uid, desc, fileNames in series:
+            if uid == seriesID:
+                return uid, fileNames
+        print("ERROR: series %s not found in %s" % (seriesID, folderName))
+        return None
+
+    if len(series) == 1:
+        return series[0][0], series[0][2]
+
+    items = ['%s (%d images) %s' % (desc, len(fileNames), uid) for uid, desc, fileNames in series]
+    item, ok = QInputDialog.getItem(parent, "Open DICOM series", "Series:", items, 0, False)
+    if not ok:
+        return None
+    uid, desc, fileNames = series[items.index(item)]
+    return uid, fileNames
+
+
+def readSlice(fileName):
+    image = sitk.ReadImage(fileName)
+    return sitk.GetArrayFromImage(image)[0], image.GetOrigin()
+
+
+def filesSignature(fileNames):
+    stats = [os.stat(f) for f in fileNames]
+    return {'count': len(fileNames),
+            'size': sum(s.st_size for s in stats),
+            'mtime': max(s.st_mtime for s in stats)}
+
+
+def readSeries(seriesID, fileNames, numThreads=None):
+    """ Read the sorted slice files of one series into an (x, y, z) volume.
+    Returns the volume and its info dict with the (x, y, z) 'spacing' and intensity 'stats'.
+    Slices are decoded by numThreads workers (default: one per core) and written directly
+    into the cache entry, which is memory mapped when the same series is opened again.
+    """
+    key = 'dicom-' + seriesID
+    signature = filesSignature(fileNames)
+    cached = volumeCache.openEntry(key, signature)
+    if cached is not None:
+        return cached
+
+    first = sitk.ReadImage(fileNames[0])
+    firstSlice = sitk.GetArrayFromImage(first)[0]
+    # Fortran order keeps each (x, y) slice contiguous, the same layout nibabel gives NIfTI data
+    shape = firstSlice.shape[::-1] + (len(fileNames),)
+    if volumeCache.ENABLED:
+        volume = volumeCache.createEntry(key, shape, firstSlice.dtype, fortranOrder=True)
+    else:
+        volume = np.empty(shape, dtype=firstSlice.dtype, order='F')
+
+    volume[:,:,0] = firstSlice.T
+    origins = [first.GetOrigin()] + [None]*(len(fileNames)-1)
+
+    def decode(index):
+        data, origins[index] = readSlice(fileNames[index])
+        volume[:,:,index] = data.T
+
+    with ThreadPoolExecutor(max_workers=numThreads or os.cpu_count()) as pool:
+        list(pool.map(decode, range(1, len(fileNames))))
+
+    # slice spacing comes from the slice positions, the header thickness is only a fallback
+    spacing = [float(s) for s in first.GetSpacing()[:2]]
+    if len(fileNames) > 1:
+        spacing.append(float(np.linalg.norm(np.subtract(origins[1], origins[0]))) or float(first.GetSpacing()[2]))
+    else:
+        spacing.append(float(first.GetSpacing()[2]))
+
+    info = {'spacing': spacing, 'origin': list(first.GetOrigin()),
+            'direction': list(first.GetDirection()), 'signature': signature}
+    if volumeCache.ENABLED:
+        return volumeCache.commitEntry(key, volume, info)
+    return volumeCache.storeEntry(key, volume, info)
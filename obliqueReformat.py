@@ -0,0 +1,125 @@
+#! /usr/bin/env python3
+"""
+obliqueReformat.py: oblique multiplanar reformatting with trilinear interpolation.
+
+The cutting plane of an orientation is the axis aligned plane tilted about its two
+in-plane axes, in physical (voxel spacing scaled) coordinates around the volume
+center. ObliqueSampler keeps the sampling grid of the last plane geometry, so the
+next slice only shifts the grid along the plane normal before interpolating. The
+grid can cover part of the plane, coarser or finer than the volume, to match the
+visible region and the resolution of the viewport.
+
+"""
+
+import numpy as np
+
+__author__ = ""
+__version__ = ""
+
+
+def rotationMatrix(axis, degrees):
+    """ Returns the 3x3 rotation of degrees about volume axis 0, 1 or 2.
+    """
+    c = np.cos(np.radians(degrees))
+    s = np.sin(np.radians(degrees))
+    i, j = [a for a in range(3) if a != axis]
+    rot = np.eye(3)
+    rot[i, i] = c
+    rot[i, j] = -s
+    rot[j, i] = s
+    rot[j, j] = c
+    return rot
+
+
+def trilinear(data, coords, fill_value=0):
+    """ Trilinear interpolation of the 3D array data at the voxel coordinates coords
+    (3, ...), points outside the volume get fill_value.
+    """
+    shape = data.shape
+    lower = []
+    frac = []
+    inside = np.ones(coords.shape[1:], dtype=bool)
+    for axis in range(3):
+        x = coords[axis]
+        inside &= (x >= 0) & (x <= shape[axis]-1)
+        i0 = np.clip(np.floor(x), 0, max(shape[axis]-2, 0)).astype(np.intp)
+        lower.append(i0)
+        frac.append(np.clip(x - i0, 0, 1).astype(np.float32))
+
+    if data.flags.c_contiguous or data.flags.f_contiguous:
+        # one flat index and the corner offsets instead of eight 3D gathers, in memory
+        # order so Fortran ordered volumes (NIfTI memory maps) take this path too
+        flat = data.ravel(order='K')
+        strides = [int(s)//data.itemsize for s in data.strides]
+        base = lower[0]*strides[0] + lower[1]*strides[1] + lower[2]*strides[2]
+        step = [strides[axis] if shape[axis] > 1 else 0 for axis in range(3)]
+        corner = lambda dx, dy, dz: flat.take(base + dx*step[0] + dy*step[1] + dz*step[2]).astype(np.float32)
+    else:
+        upper = [np.minimum(lower[axis]+1, shape[axis]-1) for axis in range(3)]
+        pick = lambda d, axis: upper[axis] if d else lower[axis]
+        corner = lambda dx, dy, dz: data[pick(dx, 0), pick(dy, 1), pick(dz, 2)].astype(np.float32)
+
+    fx, fy, fz = frac
+    c00 = corner(0, 0, 0)*(1-fx) + corner(1, 0, 0)*fx
+    c10 = corner(0, 1, 0)*(1-fx) + corner(1, 1, 0)*fx
+    c01 = corner(0, 0, 1)*(1-fx) + corner(1, 0, 1)*fx
+    c11 = corner(0, 1, 1)*(1-fx) + corner(1, 1, 1)*fx
+    result = (c00*(1-fy) + c10*fy)*(1-fz) + (c01*(1-fy) + c11*fy)*fz
+    result[~inside] = fill_value
+    return result
+
+
+class ObliqueSampler(object):
+    """ Samples tilted planes of a volume, keeping the grid of the last plane geometry.
+    """
+
+    def __init__(self):
+        # (key, grid, normal) replaced as a whole, samplePlane may run on prefetch threads
+        self.__cached = None
+
+    def buildGrid(self, shape, spacing, axis, planeAxes, tilts, planeShape, area, size):
+        """ Voxel coordinates (3, rows, columns) of the plane through the volume center and
+        the voxel step along its normal per slice. The plane has planeShape pixels spanning
+        the volume, the grid samples its area (top, bottom, left, right), in plane pixels,
+        with size (rows, columns) samples. At zero tilt and one sample per pixel the grid
+        is the axis aligned slice.
+        """
+        spacing = np.asarray(spacing, dtype=float)
+        rot = rotationMatrix(planeAxes[0], tilts[0]).dot(rotationMatrix(planeAxes[1], tilts[1]))
+        center = (np.array(shape, dtype=float) - 1)/2*spacing
+
+        # physical offsets of the sample centers along the in-plane axes, the centers of the
+        # first and last plane pixels are on the first and last voxels
+        offsets = []
+        for a, n, first, last, count in zip(planeAxes, planeShape, area[0::2], area[1::2], size):
+            centers = first + (np.arange(count) + 0.5)*(last - first)/count - 0.5
+            offsets.append(centers/max(n - 1, 1)*2*center[a] - center[a])
+        u = rot[:, planeAxes[0]]
+        v = rot[:, planeAxes[1]]
+        grid = (center[:, None, None] + u[:, None, None]*offsets[0][None, :, None]
+                + v[:, None, None]*offsets[1][None, None, :])/spacing[:, None, None]
+        normal = rot[:, axis]*spacing[axis]/spacing
+        return grid.astype(np.float32), normal.astype(np.float32)
+
+    def samplePlane(self, data, spacing, axis, planeAxes, tilts, position, planeShape=None,
+                    area=None, size=None, fill_value=0):
+        """ Returns the samples of the plane the slice at position along axis becomes when
+        tilted by tilts (degrees about planeAxes[0] and planeAxes[1]). See buildGrid for
+        planeShape, area and size, by default the in-plane volume size, the whole plane
+        and one sample per plane pixel.
+        """
+        if planeShape is None:
+            planeShape = [data.shape[a] for a in planeAxes]
+        if area is None:
+            area = (0, planeShape[0], 0, planeShape[1])
+        if size is None:
+            size = planeShape
+        key = (data.shape, tuple(spacing), axis, tuple(planeAxes), tuple(tilts),
+               tuple(planeShape), tuple(area), tuple(size))
+        cached = self.__cached
+        if cached is None or cached[0] != key:
+            cached = (key,) + self.buildGrid(data.shape, spacing, axis, planeAxes, tilts, planeShape, area, size)
+            self.__cached = cached
+        key, grid, normal = cached
+        shift = (position - (data.shape[axis]-1)/2.0)*normal
+        return trilinear(data, grid + shift[:, None, None], fill_value)
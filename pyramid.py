@@ -0,0 +1,149 @@
+#! /usr/bin/env python3
+"""
+pyramid.py: multi-resolution pyramid of a volume for overview and fast scrolling.
+
+Level k is the volume averaged over blocks of 2^k voxels along each axis. Levels
+are built one after the other on a background thread, reading two slices of the
+previous level at a time so volumes larger than memory can be used, and are saved
+in the volume cache next to the volume they were built from.
+
+"""
+
+import json
+import hashlib
+import threading
+
+import numpy as np
+import volumeCache
+
+__author__ = ""
+__version__ = ""
+
+# Levels are halved until the largest axis is at most this many voxels.
+PYRAMID_MIN_SIZE = 64
+
+
+def levelShape(shape, level):
+    """ Shape of level of a volume of shape, every axis halved (rounding up) level times.
+    """
+    return tuple(-(-n//(1 << level)) for n in shape)
+
+
+def halve(block):
+    """ Averages a block of (x, y, 1 or 2 slices) over 2x2 in-plane pixels and its slices,
+    repeating the last row or column of an odd sized plane.
+    """
+    if block.shape[0] % 2:
+        block = np.concatenate([block, block[-1:]], axis=0)
+    if block.shape[1] % 2:
+        block = np.concatenate([block, block[:, -1:]], axis=1)
+    x, y, z = block.shape
+    return block.reshape(x//2, 2, y//2, 2, z).mean(axis=(1, 3, 4))
+
+
+def downsample(source, target):
+    """ Fills target with source halved along every axis, two slices at a time.
+    """
+    integer = np.issubdtype(target.dtype, np.integer)
+    for j in range(target.shape[2]):
+        plane = halve(np.asarray(source[:, :, 2*j:2*j+2], dtype=np.float32))
+        if integer:
+            plane = np.round(plane)
+        target[:, :, j] = plane
+
+
+def pyramidKey(info, volume):
+    """ Returns the cache key of the pyramid of a volume loaded from a file, None for other volumes.
+    """
+    if 'source' not in info:
+        return None
+    description = [info['source'], info.get('signature'), list(volume.shape), volume.dtype.str]
+    return 'pyramid-' + hashlib.sha1(json.dumps(description).encode()).hexdigest()
+
+
+class VolumePyramid(object):
+    """ The levels of a 3D volume, level 0 being the volume itself.
+    With a key the levels are read from and saved to the volume cache.
+    """
+
+    def __init__(self, volume, key=None):
+        self.__levels = [volume]
+        self.__key = key
+        self.__count = 1
+        size = max(volume.shape)
+        while (size >> self.__count) >= PYRAMID_MIN_SIZE and self.__count < 16:
+            self.__count += 1
+        self.__cancelled = False
+        self.__thread = None
+
+    def start(self):
+        """ Open the levels already in the cache and build the others on a background thread.
+        """
+        if self.__thread is None:
+            self.openCached()
+            self.__thread = threading.Thread(target=self.build, daemon=True)
+            self.__thread.start()
+
+    def levelEntry(self, level):
+        """ Returns the cache key and signature of level, a None key when it is not cached.
+        """
+        signature = {'shape': list(self.__levels[0].shape), 'level': level}
+        if self.__key is None or not volumeCache.ENABLED:
+            return None, signature
+        return '%s-%d' % (self.__key, level), signature
+
+    def openCached(self):
+        while len(self.__levels) < self.__count:
+            key, signature = self.levelEntry(len(self.__levels))
+            cached = None if key is None else volumeCache.openEntry(key, signature)
+            if cached is None:
+                return
+            self.__levels.append(cached[0])
+
+    def cancel(self):
+        self.__cancelled = True
+
+    def wait(self, timeout=None):
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+
+    def build(self):
+        for level in range(len(self.__levels), self.__count):
+            if self.__cancelled:
+                return
+            source = self.__levels[level-1]
+            shape = levelShape(self.__levels[0].shape, level)
+            key, signature = self.levelEntry(level)
+            if key is None:
+                volume = np.empty(shape, dtype=source.dtype)
+                downsample(source, volume)
+            else:
+                volume = volumeCache.createEntry(key, shape, source.dtype)
+                downsample(source, volume)
+                if self.__cancelled:
+                    return
+                volume, info = volumeCache.commitEntry(key, volume, {'signature': signature})
+            self.__levels.append(volume)
+
+    def getLevelCount(self):
+        """ Number of levels that can be used, the ones still being built are not counted.
+        """
+        return len(self.__levels)
+
+    def getMaxLevelCount(self):
+        return self.__count
+
+    def isComplete(self):
+        return len(self.__levels) == self.__count
+
+    def getLevel(self, level):
+        return self.__levels[level]
+
+    def getPlane(self, level, axis, index):
+        """ Plane of level showing full resolution slice index along axis.
+        """
+        volume = self.__levels[level]
+        index = min(index >> level, volume.shape[axis]-1)
+        key = [slice(None)]*3
+        key[axis] = index
+        return volume[tuple(key)]
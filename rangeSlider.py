@@ -181,6 +181,18 @@ class RangeSlider(QtWidgets.QSlider):
                 self.click_offset = self.__pixelPosToRangeValue(self.__pick(event.pos()))
                 self.triggerAction(self.SliderMove)
                 self.setRepeatAction(self.SliderNoAction)
+                self.setSliderDown(True)
+        else:
+            event.ignore()
+            
+    def mouseReleaseEvent(self, event):
+        # QSlider does not know about the handles pressed above, end the drag here so
+        # sliderReleased is emitted
+        if self.pressed_control != QtWidgets.QStyle.SC_None:
+            event.accept()
+            self.pressed_control = QtWidgets.QStyle.SC_None
+            self.setSliderDown(False)
+            self.update()
         else:
             event.ignore()
                                 
@@ -0,0 +1,102 @@
+#! /usr/bin/env python3
+"""
+renderProfiler.py: timing of the render stages of the QtImageViewer widgets.
+
+Each stage keeps its last ROLLING_SAMPLES durations, from which the statistics
+and a histogram over HISTOGRAM_EDGES_MS are computed. drawHUD paints them as a
+small overlay, the viewers call it from drawForeground.
+
+"""
+
+import time
+from collections import deque
+
+import numpy as np
+
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import QColor, QFont, QPen
+
+__author__ = ""
+__version__ = ""
+
+# Render stages in pipeline order, other stage names are listed after these.
+STAGES = ['extract', 'window', 'colormap', 'qimage', 'rotate', 'pixmap', 'paint']
+
+# Number of durations kept per stage.
+ROLLING_SAMPLES = 240
+
+# Upper edges (ms) of the histogram bins, the last bin holds everything slower.
+HISTOGRAM_EDGES_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100]
+
+
+class RenderProfiler(object):
+    """ Rolling per-stage timings of the render pipeline.
+    """
+
+    def __init__(self, samples=ROLLING_SAMPLES):
+        self.__samples = samples
+        self.__times = {}
+
+    def record(self, stage, seconds):
+        if stage not in self.__times:
+            self.__times[stage] = deque(maxlen=self.__samples)
+        self.__times[stage].append(seconds*1000)
+
+    def mark(self, stage, t0):
+        """ Record the time since t0 (time.perf_counter) for stage, returns the current time.
+        """
+        t = time.perf_counter()
+        self.record(stage, t - t0)
+        return t
+
+    def reset(self):
+        self.__times = {}
+
+    def getStages(self):
+        return [s for s in STAGES if s in self.__times] + sorted(s for s in self.__times if s not in STAGES)
+
+    def getStageStats(self, stage):
+        """ Returns count, mean, median, 95th percentile, max (ms) and the histogram
+        counts over HISTOGRAM_EDGES_MS of the rolling durations of stage.
+        """
+        ms = np.array(self.__times.get(stage, []))
+        if len(ms) == 0:
+            return {'count': 0}
+        return {'count': len(ms), 'mean_ms': float(ms.mean()), 'p50_ms': float(np.median(ms)),
+                'p95_ms': float(np.percentile(ms, 95)), 'max_ms': float(ms.max()),
+                'histogram': np.bincount(np.searchsorted(HISTOGRAM_EDGES_MS, ms, side='right'),
+                                         minlength=len(HISTOGRAM_EDGES_MS)+1).tolist()}
+
+    def getStats(self):
+        """ Returns {stage: stats} for every recorded stage, see getStageStats.
+        """
+        return {stage: self.getStageStats(stage) for stage in self.getStages()}
+
+    def drawHUD(self, painter, x=8, y=8):
+        """ Paint the median and 95th percentile of each stage with its histogram at (x, y)
+        in the painter's current coordinates.
+        """
+        stages = self.getStages()
+        if len(stages) == 0:
+            return
+        rowHeight = 14
+        barsWidth = 3*(len(HISTOGRAM_EDGES_MS)+1)
+        width = 170 + barsWidth
+        height = rowHeight*(len(stages)+1) + 6
+
+        painter.save()
+        painter.setFont(QFont('Monospace', 8))
+        painter.fillRect(QRectF(x, y, width, height), QColor(0, 0, 0, 160))
+        painter.setPen(QPen(QColor(255, 255, 255)))
+        painter.drawText(QRectF(x+4, y+2, width, rowHeight), Qt.AlignLeft, "stage     p50    p95 ms")
+        for row, stage in enumerate(stages):
+            stats = self.getStageStats(stage)
+            top = y + 2 + rowHeight*(row+1)
+            painter.setPen(QPen(QColor(255, 255, 255)))
+            painter.drawText(QRectF(x+4, top, width, rowHeight), Qt.AlignLeft,
+                             "%-8s %6.2f %6.2f" % (stage, stats['p50_ms'], stats['p95_ms']))
+            counts = stats['histogram']
+            for b, count in enumerate(counts):
+                bar = (rowHeight-3)*count/max(counts)
+                painter.fillRect(QRectF(x+164+3*b, top+rowHeight-2-bar, 2, bar), QColor(80, 200, 120))
+        painter.restore()
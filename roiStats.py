@@ -0,0 +1,164 @@
+#! /usr/bin/env python3
+"""
+roiStats.py: statistics of rectangular and elliptical regions of a plane.
+
+PlaneStats keeps summed-area tables of the values and of their squares, so the sum
+over any rectangle is four lookups. Min and max come from sparse tables holding the
+extreme of the 2^l x 2^k window starting at every pixel, built with the sliding
+window of slabProjection for the (l, k) of the first region that needs them; the
+window of any rectangle is then covered by four overlapping ones. A rectangle is
+measured in constant time whatever its size, an ellipse with one span per row.
+
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import slabProjection
+
+__author__ = ""
+__version__ = ""
+
+ROI_SHAPES = ['rect', 'ellipse']
+
+# Min and max window tables kept per plane, each the size of the plane. An ellipse
+# needs one per power of two span length.
+ROI_EXTREME_TABLES = 16
+
+
+def summedArea(data):
+    """ Sums of data over [0, i) x [0, j) for every (i, j), with a leading row and column of zeros.
+    """
+    dtype = np.int64 if np.issubdtype(data.dtype, np.integer) else np.float64
+    table = np.zeros((data.shape[0]+1, data.shape[1]+1), dtype=dtype)
+    np.cumsum(data, axis=0, dtype=dtype, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table
+
+
+def rectSum(table, r0, r1, c0, c1):
+    """ Sum over rows [r0, r1) and columns [c0, c1) from a summedArea table, the bounds
+    may be arrays of the same shape.
+    """
+    return table[r1, c1] - table[r0, c1] - table[r1, c0] + table[r0, c0]
+
+
+def ellipseSpans(r0, r1, c0, c1):
+    """ Rows and [first, last) columns of the pixels whose centers are inside the ellipse
+    inscribed in rows [r0, r1) and columns [c0, c1).
+    """
+    cy, cx = (r0 + r1)/2.0, (c0 + c1)/2.0
+    ry, rx = (r1 - r0)/2.0, (c1 - c0)/2.0
+    rows = np.arange(r0, r1)
+    dy = (rows + 0.5 - cy)/ry
+    dx = rx*np.sqrt(np.clip(1 - dy*dy, 0, 1))
+    first = np.ceil(cx - dx - 0.5).astype(np.intp)
+    last = np.floor(cx + dx - 0.5).astype(np.intp) + 1
+    keep = last > first
+    return rows[keep], first[keep], last[keep]
+
+
+class PlaneStats(object):
+    """ Region statistics of one plane, the tables are built when first needed and kept.
+    """
+
+    def __init__(self, plane):
+        self.__plane = np.asarray(plane)
+        self.__sums = None
+        self.__squares = None
+        self.__extremes = OrderedDict()
+
+    def getShape(self):
+        return self.__plane.shape[:2]
+
+    def getSums(self):
+        """ Summed-area tables of the values and the squared values.
+        """
+        if self.__sums is None:
+            data = self.__plane.astype(np.float64) if self.__plane.dtype.kind == 'f' else self.__plane
+            self.__sums = summedArea(data)
+            self.__squares = summedArea(data.astype(np.float64)**2)
+        return self.__sums, self.__squares
+
+    def getExtreme(self, levelRows, levelCols, mode):
+        """ Min (mode 'min') or max (mode 'max') of the window of 2^levelRows x 2^levelCols
+        pixels starting at every pixel, valid where the window is inside the plane.
+        """
+        key = (levelRows, levelCols, mode)
+        if key in self.__extremes:
+            self.__extremes.move_to_end(key)
+            return self.__extremes[key]
+        table = self.__plane
+        for axis, level in enumerate((levelRows, levelCols)):
+            width = 1 << level
+            if width > 1:
+                # slidingExtreme centers its windows, shift them to start at each pixel
+                before = (width-1)//2
+                table = np.take(slabProjection.slidingExtreme(table, axis, width, mode),
+                                range(before, table.shape[axis]), axis=axis)
+        self.__extremes[key] = table
+        while len(self.__extremes) > ROI_EXTREME_TABLES:
+            self.__extremes.popitem(last=False)
+        return table
+
+    def rectExtreme(self, r0, r1, c0, c1, mode):
+        """ Extreme over the rectangle from four overlapping power of two windows.
+        """
+        levelRows = int(r1 - r0).bit_length() - 1
+        levelCols = int(c1 - c0).bit_length() - 1
+        table = self.getExtreme(levelRows, levelCols, mode)
+        rows = [r0, r1 - (1 << levelRows)]
+        cols = [c0, c1 - (1 << levelCols)]
+        values = table[np.ix_(rows, cols)]
+        return values.max() if mode == 'max' else values.min()
+
+    def spanExtreme(self, rows, first, last, mode):
+        """ Extreme over row spans, one window table per power of two span length.
+        """
+        levels = np.floor(np.log2(last - first)).astype(int)
+        result = []
+        for level in np.unique(levels):
+            table = self.getExtreme(0, level, mode)
+            pick = levels == level
+            result.append(table[rows[pick], first[pick]])
+            result.append(table[rows[pick], last[pick] - (1 << level)])
+        values = np.concatenate(result)
+        return values.max() if mode == 'max' else values.min()
+
+    def measure(self, shape, r0, r1, c0, c1):
+        """ Statistics {'pixels', 'mean', 'std', 'min', 'max'} of the region of shape (one of
+        ROI_SHAPES) in rows [r0, r1) and columns [c0, c1), clipped to the plane.
+        Returns None when no pixel is inside.
+        """
+        if shape not in ROI_SHAPES:
+            raise RuntimeError("Unknown ROI shape %s, use one of %s" % (shape, ROI_SHAPES))
+        rows, cols = self.getShape()
+        sums, squares = self.getSums()
+        if shape == 'rect':
+            r0, r1 = max(r0, 0), min(r1, rows)
+            c0, c1 = max(c0, 0), min(c1, cols)
+            if r1 <= r0 or c1 <= c0:
+                return None
+            pixels = (r1 - r0)*(c1 - c0)
+            total = rectSum(sums, r0, r1, c0, c1)
+            total2 = rectSum(squares, r0, r1, c0, c1)
+            extreme = lambda mode: self.rectExtreme(r0, r1, c0, c1, mode)
+        else:
+            spanRows, first, last = ellipseSpans(r0, r1, c0, c1)
+            inside = (spanRows >= 0) & (spanRows < rows)
+            spanRows = spanRows[inside]
+            first = np.maximum(first[inside], 0)
+            last = np.minimum(last[inside], cols)
+            keep = last > first
+            spanRows, first, last = spanRows[keep], first[keep], last[keep]
+            if not len(spanRows):
+                return None
+            pixels = int((last - first).sum())
+            total = rectSum(sums, spanRows, spanRows+1, first, last).sum()
+            total2 = rectSum(squares, spanRows, spanRows+1, first, last).sum()
+            extreme = lambda mode: self.spanExtreme(spanRows, first, last, mode)
+
+        mean = float(total)/pixels
+        variance = max(float(total2)/pixels - mean*mean, 0.0)
+        return {'pixels': int(pixels), 'mean': mean, 'std': variance**0.5,
+                'min': extreme('min').item(), 'max': extreme('max').item()}
@@ -7,212 +7,186 @@ QtImageViewer.py: PyQt image viewer widget for a QPixmap in a QGraphicsView scen
 import os.path
 import os
 import sys
-from PIL import ImageQt
-from PIL import Image, ImageDraw
 
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import nibabel as nib
-import SimpleITK as sitk
-import scipy.io
+import volumeCache
+import viewerCore
+import slabProjection
 import PyQt5
 
-from PyQt5.QtCore import Qt, QRectF, pyqtSignal, QT_VERSION_STR, QLineF, QRegExp
+from PyQt5.QtCore import Qt, QRectF, QPointF, pyqtSignal, QT_VERSION_STR, QLineF, QRegExp
 from PyQt5.QtGui import QImage, QPixmap, QPainterPath, QPainter, QPen, QColor, QIntValidator, QTransform, QBrush
 from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QFileDialog, QGroupBox,\
                             QHBoxLayout, QVBoxLayout, QGridLayout, QWidget, QLineEdit,QPushButton,\
                             QGraphicsLineItem, QScrollBar, QCheckBox, QComboBox, QAbstractItemView, QLabel
 from PyQt5.QtWidgets import QApplication
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
-from matplotlib.figure import Figure
+
+# SimpleITK, dicomLoader and matplotlib are imported where they are first used,
+# keeping them out of the viewer startup.
 
 __author__ = ""
 __version__ = ""
 
 
-class CrosshairWindow(FigureCanvasQTAgg):
+_popupWindows = {}
 
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        self.fig = Figure(figsize=(width, height), dpi=dpi)
-        self.axes1 = self.fig.add_subplot(211)
-        self.axes1.set_title("Vertical Profile")
-        self.axes2 = self.fig.add_subplot(212)
-        self.axes2.set_title("Horizontal Profile")
-        self.fig.subplots_adjust(hspace=0.8)
-        super(CrosshairWindow, self).__init__(self.fig)
-        
-class ThruPlaneWindow(FigureCanvasQTAgg):
+# Colors of the linked cursor lines, by the volume axis the line is at a fixed index of.
+CURSOR_COLORS = {0: QColor(255, 0, 0), 1: QColor(0, 255, 0), 2: QColor(0, 128, 255)}
 
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        self.fig2 = Figure(figsize=(width, height), dpi=dpi)
-        self.plt1 = self.fig2.add_subplot(321)
-        self.plt2 = self.fig2.add_subplot(322)
-        
-        self.plt1_2 = self.fig2.add_subplot(323)
-        self.plt2_2 = self.fig2.add_subplot(324)
-        
-        self.plt3 = self.fig2.add_subplot(313)
-        
-        self.fig2.subplots_adjust(hspace=0.8, wspace=0.5)
-            
 
-        super(ThruPlaneWindow, self).__init__(self.fig2)
+def popupWindows():
+    """ Returns the CrosshairWindow and ThruPlaneWindow canvas classes.
+    They are built the first time a popup is opened, so matplotlib is only imported then.
+    """
+    if not _popupWindows:
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+        from matplotlib.figure import Figure
 
+        class CrosshairWindow(FigureCanvasQTAgg):
 
+            def __init__(self, parent=None, width=5, height=4, dpi=100):
+                self.fig = Figure(figsize=(width, height), dpi=dpi)
+                self.axes1 = self.fig.add_subplot(211)
+                self.axes1.set_title("Vertical Profile")
+                self.axes2 = self.fig.add_subplot(212)
+                self.axes2.set_title("Horizontal Profile")
+                self.fig.subplots_adjust(hspace=0.8)
+                super(CrosshairWindow, self).__init__(self.fig)
 
-class QtImageViewer(QGraphicsView):
-    """ PyQt image viewer widget for a QPixmap in a QGraphicsView scene with mouse zooming and panning.
+        class ThruPlaneWindow(FigureCanvasQTAgg):
 
-    Displays a QImage or QPixmap (QImage is internally converted to a QPixmap).
-    To display any other image format, you must first convert it to a QImage or QPixmap.
+            def __init__(self, parent=None, width=5, height=4, dpi=100):
+                self.fig2 = Figure(figsize=(width, height), dpi=dpi)
+                self.plt1 = self.fig2.add_subplot(321)
+                self.plt2 = self.fig2.add_subplot(322)
 
-    Some useful image format conversion utilities:
-        qimage2ndarray: NumPy ndarray <==> QImage    (https://github.com/hmeine/qimage2ndarray)
-        ImageQt: PIL Image <==> QImage  (https://github.com/python-pillow/Pillow/blob/master/PIL/ImageQt.py)
+                self.plt1_2 = self.fig2.add_subplot(323)
+                self.plt2_2 = self.fig2.add_subplot(324)
 
-    Mouse interaction:
-        Left mouse button drag: Pan image.
-        Right mouse button drag: Zoom box.
-        Right mouse button doubleclick: Zoom to show entire image.
-    """
+                self.plt3 = self.fig2.add_subplot(313)
 
-    # Mouse button signals emit image scene (x, y) coordinates.
-    # !!! For image (row, column) matrix indexing, row = y and column = x.
-    leftMouseButtonPressed = pyqtSignal(float, float)
-    rightMouseButtonPressed = pyqtSignal(float, float)
-    leftMouseButtonReleased = pyqtSignal(float, float)
-    rightMouseButtonReleased = pyqtSignal(float, float)
-    leftMouseButtonDoubleClicked = pyqtSignal(float, float)
-    rightMouseButtonDoubleClicked = pyqtSignal(float, float)
-    
-    def __init__(self):
-        QGraphicsView.__init__(self)
+                self.fig2.subplots_adjust(hspace=0.8, wspace=0.5)
 
-        # Image is displayed as a QPixmap in a QGraphicsScene attached to this QGraphicsView.
-        self.scene = QGraphicsScene()
-        self.setScene(self.scene)
-        
-        
-        #set the focus to this viewer
-        self.setFocusPolicy(Qt.StrongFocus)
+                super(ThruPlaneWindow, self).__init__(self.fig2)
 
-        # Store a local handle to the scene's current image pixmap.
-        self._pixmapHandle = None
+        _popupWindows['CrosshairWindow'] = CrosshairWindow
+        _popupWindows['ThruPlaneWindow'] = ThruPlaneWindow
+    return _popupWindows['CrosshairWindow'], _popupWindows['ThruPlaneWindow']
 
-        # Image aspect ratio mode.
-        # !!! ONLY applies to full image. Aspect ratio is always ignored when zooming.
-        #   Qt.IgnoreAspectRatio: Scale image to fit viewport.
-        #   Qt.KeepAspectRatio: Scale image to fit inside viewport, preserving aspect ratio.
-        #   Qt.KeepAspectRatioByExpanding: Scale image to fill the viewport, preserving aspect ratio.
-        self.aspectRatioMode = Qt.KeepAspectRatio
 
-        # Scroll bar behaviour.
-        #   Qt.ScrollBarAlwaysOff: Never shows a scroll bar.
-        #   Qt.ScrollBarAlwaysOn: Always shows a scroll bar.
-        #   Qt.ScrollBarAsNeeded: Shows a scroll bar only when zoomed.
-        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+class QtImageViewer(viewerCore.ViewerCore):
+    """ Image viewer for the 3DViewer colormaps, drawn as RGB. See viewerCore.ViewerCore
+    for the shared viewer.
 
-        # Stack of QRectF zoom boxes in scene coordinates.
-        self.zoomStack = []
-        
-        # -------------------
-        self.__fileName = None
-        self.__imageData = None
-        self.__pixeldims = None
-        self.__pixelspacing = None
-        self.__imgorientation = 1
-        self.__curSlice = 0
-        
-        # -------------------
-        self.__crossshow = False
-        self.__lineX = QLineF()
-        self.__lineY = QLineF() 
-        
-        # -------------------
-        self.__crosshair = 0
-        self.__thruPlane = 0
-        self.__vert = 0
-        self.__horiz = 0
-        self.__flipX = False
-        self.__flipY = False
-        self.__rotateAngle = 270
+    Mouse interaction:
+        Right mouse button drag: Pan image.
+        Left mouse button drag: Zoom box.
+        Left mouse button doubleclick: Zoom to show entire image.
+    """
+    
+    def __init__(self):
+        viewerCore.ViewerCore.__init__(self)
         
         # -------------------
-        self.__winlevel = 0
-        self.__winwidth = 256
-
-        # Flags for enabling/disabling mouse interaction.
-        self.canZoom = True
-        self.canPan = True
-
-    def hasImage(self):
-        """ Returns whether or not the scene contains an image pixmap.
-        """
-        return self._pixmapHandle is not None
-
-    def clearImage(self):
-        """ Removes the current image pixmap from the scene if it exists.
+        # Linked views: the volume with the slice axis first, and the cursor voxel with its lines
+        self.__contiguous = False
+        self.__axisVolume = None
+        self.__axisKey = None
+        self.__cursor = None
+        self.__cursorItems = []
+        
+    def setContiguousSlices(self, value):
+        """ Extract the slices from a copy of the volume with the slice axis first, so each
+        plane is read as one block instead of gathered with a stride across the volume.
+        The copy is made for the current orientation when first needed, and only when its
+        planes are not contiguous already.
         """
-        if self.hasImage():
-            self.scene.removeItem(self._pixmapHandle)
-            self._pixmapHandle = None
-
-    def pixmap(self):
-        """ Returns the scene's current image pixmap as a QPixmap, or else None if no image exists.
-        :rtype: QPixmap | None
+        self.__contiguous = bool(value)
+        if not self.__contiguous:
+            self.__axisVolume = None
+            self.__axisKey = None
+            
+    def isContiguousSlices(self):
+        return self.__contiguous
+        
+    def axisVolume(self, axis):
+        """ The displayed volume with axis first, its planes in the order of extractPlane.
         """
-        if self.hasImage():
-            return self._pixmapHandle.pixmap()
-        return None
-
-    def image(self):
-        """ Returns the scene's current image pixmap as a QImage, or else None if no image exists.
-        :rtype: QImage | None
+        key = (axis, slabProjection.SlabProjector.dataKey(self._imageData))
+        if key != self.__axisKey:
+            self.__axisVolume = None  # release the previous copy before making the next
+            volume = np.moveaxis(self._imageData, axis, 0)
+            if not (volume[0].flags.c_contiguous or volume[0].flags.f_contiguous):
+                volume = np.ascontiguousarray(volume)
+            self.__axisVolume = volume
+            self.__axisKey = key
+        return self.__axisVolume
+        
+    def extractPlane(self, data, orientation, index):
+        if self.__contiguous and data is self._imageData:
+            return self.axisVolume(self.sliceAxis(orientation))[index]
+        return viewerCore.ViewerCore.extractPlane(self, data, orientation, index)
+        
+    def sceneToVoxel(self, x, y):
+        """ Voxel (x, y, z) index of the scene position (x, y) on the displayed slice, None
+        when it is outside the plane.
         """
-        if self.hasImage():
-            return self._pixmapHandle.pixmap().toImage()
-        return None
-
-    def setImage(self, image):
-        """ Set the scene's current image pixmap to the input QImage or QPixmap.
-        Raises a RuntimeError if the input image has type other than QImage or QPixmap.
-        :type image: QImage | QPixmap
+        if self._imageData is None or self._planeShape is None or self.isOblique():
+            return None
+        toPlane, invertible = self.planeTransform(self._planeShape).inverted()
+        point = toPlane.map(QPointF(x, y))
+        row, column = int(np.floor(point.y())), int(np.floor(point.x()))
+        if not (0 <= row < self._planeShape[0] and 0 <= column < self._planeShape[1]):
+            return None
+        voxel = [0, 0, 0]
+        rowAxis, columnAxis = self.planeAxes(self._imgorientation)
+        voxel[rowAxis] = row
+        voxel[columnAxis] = column
+        voxel[self.sliceAxis(self._imgorientation)] = self._curSlice
+        return voxel
+        
+    def setLinkedCursor(self, voxel):
+        """ Draw the cursor of a linked view through voxel (x, y, z), one line for each of the
+        other two slices through it. None removes it.
         """
-        if type(image) is QPixmap:
-            pixmap = image
-        elif type(image) is QImage:
-            pixmap = QPixmap.fromImage(image)
-        else:
-            raise RuntimeError("ImageViewer.setImage: Argument must be a QImage or QPixmap.")
-        
-        if self.hasImage():
-            self._pixmapHandle.setPixmap(pixmap)
-        else:
-            self._pixmapHandle = self.scene.addPixmap(pixmap)
+        for item in self.__cursorItems:
+            self.scene.removeItem(item)
+        self.__cursorItems = []
+        self.__cursor = None if voxel is None else list(voxel)
+        if self.__cursor is None or self._planeShape is None or self.isOblique():
+            return
+        toScene = self.planeTransform(self._planeShape)
+        rows, columns = self._planeShape
+        rowAxis, columnAxis = self.planeAxes(self._imgorientation)
+        row = self.__cursor[rowAxis] + 0.5
+        column = self.__cursor[columnAxis] + 0.5
+        for axis, line in ((rowAxis, QLineF(0, row, columns, row)), (columnAxis, QLineF(column, 0, column, rows))):
+            pen = QPen(CURSOR_COLORS[axis])
+            pen.setCosmetic(True)
+            item = self.scene.addLine(toScene.map(line), pen)
+            item.setZValue(1)
+            self.__cursorItems.append(item)
             
-        self.setSceneRect(QRectF(pixmap.rect()))  # Set scene size to image size.
-#         self.setSliceOrientation(self.__imgorientation)
-        self.updateViewer()
-        
-        
+    def getLinkedCursor(self):
+        return self.__cursor
+
     def buildCrosshairPopup(self, data):
+        CrosshairWindow, ThruPlaneWindow = popupWindows()
         self.ch = CrosshairWindow(self, width=5, height=4, dpi=100)
 
-        if self.__imgorientation == 1:
-            horizArr = self.__imageData[:,0,self.getCurSlice()]
-            vertArr = self.__imageData[0,:,self.getCurSlice()]
+        if self._imgorientation == 1:
+            horizArr = self._imageData[:,0,self.getCurSlice()]
+            vertArr = self._imageData[0,:,self.getCurSlice()]
             horizArr2 = data[:,0,self.getCurSlice()]
             vertArr2 = data[0,:,self.getCurSlice()]
-        elif self.__imgorientation == 2:   
-            horizArr = self.__imageData[:,self.getCurSlice(),0]
-            vertArr = self.__imageData[0,self.getCurSlice(),:]
+        elif self._imgorientation == 2:   
+            horizArr = self._imageData[:,self.getCurSlice(),0]
+            vertArr = self._imageData[0,self.getCurSlice(),:]
             horizArr2 = data[:,self.getCurSlice(),0]
             vertArr2 = data[0,self.getCurSlice(),:]
-        elif self.__imgorientation == 3:
-            horizArr = self.__imageData[self.getCurSlice(),:,0]
-            vertArr = self.__imageData[self.getCurSlice(),0,:]
+        elif self._imgorientation == 3:
+            horizArr = self._imageData[self.getCurSlice(),:,0]
+            vertArr = self._imageData[self.getCurSlice(),0,:]
             horizArr2 = data[self.getCurSlice(),:,0]
             vertArr2 = data[self.getCurSlice(),0,:]
         else:
@@ -233,29 +207,10 @@ class QtImageViewer(QGraphicsView):
         
         
             
-    def clearCrosshairPopup(self):
-        self.ch.close()
-        self.__crosshair = 0
-        self.scene.removeItem(self.HLine)
-        self.scene.removeItem(self.VLine)
-        self.setHorizVal(0)
-        self.setVertVal(0)
-        if(self.__thruPlane == 2):
-            self.__thruPlane = 0
-            self.tp.close()
-            
-    def clearCrosshairs(self):
-        self.scene.removeItem(self.HLine)
-        self.scene.removeItem(self.VLine)
-        self.setHorizVal(0)
-        self.setVertVal(0)
-        if(self.__thruPlane == 2):
-            self.__thruPlane = 0
-        
     def setCrosshair(self, value, data):
         
-        if self.__imageData is not None:
-            self.__crosshair = value
+        if self._imageData is not None:
+            self._crosshair = value
             if(value == 2):
                 self.buildCrosshairPopup(data)
             else:
@@ -265,28 +220,29 @@ class QtImageViewer(QGraphicsView):
         
             
     def buildThruPlanePopup(self, data):
+        CrosshairWindow, ThruPlaneWindow = popupWindows()
         self.tp = ThruPlaneWindow(self, width=5, height=4, dpi=100)
 
-        if self.__imgorientation == 1:
-            data1 = np.rot90(self.__imageData[:,self.getHorizVal(),:])
-            data2 = np.rot90(self.__imageData[self.getVertVal(),:,:]) 
+        if self._imgorientation == 1:
+            data1 = np.rot90(self._imageData[:,self.getHorizVal(),:])
+            data2 = np.rot90(self._imageData[self.getVertVal(),:,:]) 
             data1_2 = np.rot90(data[:,self.getHorizVal(),:])
             data2_2 = np.rot90(data[self.getVertVal(),:,:]) 
-            data3 = self.__imageData[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
+            data3 = self._imageData[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
             data3_2 = data[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
-        elif self.__imgorientation == 2:
-            data1 = np.rot90(self.__imageData[:,:,self.getHorizVal()])
-            data2 = np.rot90(self.__imageData[self.getVertVal(),:,:])
+        elif self._imgorientation == 2:
+            data1 = np.rot90(self._imageData[:,:,self.getHorizVal()])
+            data2 = np.rot90(self._imageData[self.getVertVal(),:,:])
             data1_2 = np.rot90(data[:,:,self.getHorizVal()])
             data2_2 = np.rot90(data[self.getVertVal(),:,:])
-            data3 = self.__imageData[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
+            data3 = self._imageData[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
             data3_2 = data[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
-        elif self.__imgorientation == 3:
-            data1 = np.rot90(self.__imageData[:,:,self.getHorizVal()])
-            data2 = np.rot90(self.__imageData[:,self.getVertVal(),:])
+        elif self._imgorientation == 3:
+            data1 = np.rot90(self._imageData[:,:,self.getHorizVal()])
+            data2 = np.rot90(self._imageData[:,self.getVertVal(),:])
             data1_2 = np.rot90(data[:,:,self.getHorizVal()])
             data2_2 = np.rot90(data[:,self.getVertVal(),:])
-            data3 = self.__imageData[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
+            data3 = self._imageData[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
             data3_2 = data[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
 
 
@@ -309,26 +265,26 @@ class QtImageViewer(QGraphicsView):
         
         
     def updateThroughPlane(self, data):
-        if self.__imgorientation == 1:
-            data1 = np.rot90(self.__imageData[:,self.getHorizVal(),:])
-            data2 = np.rot90(self.__imageData[self.getVertVal(),:,:]) 
+        if self._imgorientation == 1:
+            data1 = np.rot90(self._imageData[:,self.getHorizVal(),:])
+            data2 = np.rot90(self._imageData[self.getVertVal(),:,:]) 
             data1_2 = np.rot90(data[:,self.getHorizVal(),:])
             data2_2 = np.rot90(data[self.getVertVal(),:,:]) 
-            data3 = self.__imageData[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
+            data3 = self._imageData[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
             data3_2 = data[self.getVertVal(),self.getImgHeight()-1-self.getHorizVal(),:]
-        elif self.__imgorientation == 2:
-            data1 = np.rot90(self.__imageData[:,:,self.getHorizVal()])
-            data2 = np.rot90(self.__imageData[self.getVertVal(),:,:])
+        elif self._imgorientation == 2:
+            data1 = np.rot90(self._imageData[:,:,self.getHorizVal()])
+            data2 = np.rot90(self._imageData[self.getVertVal(),:,:])
             data1_2 = np.rot90(data[:,:,self.getHorizVal()])
             data2_2 = np.rot90(data[self.getVertVal(),:,:])
-            data3 = self.__imageData[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
+            data3 = self._imageData[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
             data3_2 = data[self.getVertVal(),:,self.getImgHeight()-1-self.getHorizVal()]
-        elif self.__imgorientation == 3:
-            data1 = np.rot90(self.__imageData[:,:,self.getHorizVal()])
-            data2 = np.rot90(self.__imageData[:,self.getVertVal(),:])
+        elif self._imgorientation == 3:
+            data1 = np.rot90(self._imageData[:,:,self.getHorizVal()])
+            data2 = np.rot90(self._imageData[:,self.getVertVal(),:])
             data1_2 = np.rot90(data[:,:,self.getHorizVal()])
             data2_2 = np.rot90(data[:,self.getVertVal(),:])
-            data3 = self.__imageData[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
+            data3 = self._imageData[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
             data3_2 = data[:,self.getVertVal(),self.getImgHeight()-1-self.getHorizVal()]
 
         
@@ -354,12 +310,8 @@ class QtImageViewer(QGraphicsView):
         self.tp.draw()
         
     
-    def clearThruPlanePopup(self):
-        self.tp.close()
-            
-            
     def setThruPlane(self, value, data):
-        self.__thruPlane = value
+        self._thruPlane = value
         if(value == 2):
             self.buildThruPlanePopup(data)
         else:
@@ -368,14 +320,14 @@ class QtImageViewer(QGraphicsView):
     def updateVerticalProfile(self, value, data):
         self.setVertVal(value)
         
-        if self.__imgorientation == 1:
-            vertArr = self.__imageData[value,:,self.getCurSlice()]
+        if self._imgorientation == 1:
+            vertArr = self._imageData[value,:,self.getCurSlice()]
             vertArr2 = data[value,:,self.getCurSlice()]
-        elif self.__imgorientation == 2:   
-            vertArr = self.__imageData[value,self.getCurSlice(),:]
+        elif self._imgorientation == 2:   
+            vertArr = self._imageData[value,self.getCurSlice(),:]
             vertArr2 = data[value,self.getCurSlice(),:]
-        elif self.__imgorientation == 3:
-            vertArr = self.__imageData[self.getCurSlice(),value,:]
+        elif self._imgorientation == 3:
+            vertArr = self._imageData[self.getCurSlice(),value,:]
             vertArr2 = data[self.getCurSlice(),value,:]
         else:
             print("ERROR: Invlaid plane")
@@ -388,7 +340,7 @@ class QtImageViewer(QGraphicsView):
         self.ch.axes1.legend(loc='upper right')
         self.ch.draw()
         
-        if(self.__thruPlane == 2):
+        if(self._thruPlane == 2):
             self.updateThroughPlane(data)
         
         self.display_VertLine(value)
@@ -396,14 +348,14 @@ class QtImageViewer(QGraphicsView):
     def updateHorizontalProfile(self, value, data):
         self.setHorizVal(value)
         
-        if self.__imgorientation == 1:
-            horizArr = self.__imageData[:,self.getImgHeight()-1-value,self.getCurSlice()]
+        if self._imgorientation == 1:
+            horizArr = self._imageData[:,self.getImgHeight()-1-value,self.getCurSlice()]
             horizArr2 = data[:,self.getImgHeight()-1-value,self.getCurSlice()]
-        elif self.__imgorientation == 2:   
-            horizArr = self.__imageData[:,self.getCurSlice(),self.getImgHeight()-1-value]
+        elif self._imgorientation == 2:   
+            horizArr = self._imageData[:,self.getCurSlice(),self.getImgHeight()-1-value]
             horizArr2 = data[:,self.getCurSlice(),self.getImgHeight()-1-value]
-        elif self.__imgorientation == 3:
-            horizArr = self.__imageData[self.getCurSlice(),:,self.getImgHeight()-1-value]
+        elif self._imgorientation == 3:
+            horizArr = self._imageData[self.getCurSlice(),:,self.getImgHeight()-1-value]
             horizArr2 = data[self.getCurSlice(),:,self.getImgHeight()-1-value]
         else:
             print("ERROR: Invlaid plane")
@@ -415,88 +367,25 @@ class QtImageViewer(QGraphicsView):
         self.ch.axes2.legend(loc='upper right')
         self.ch.draw()
         
-        if(self.__thruPlane == 2):
+        if(self._thruPlane == 2):
             self.updateThroughPlane(data)
         self.display_HorizLine(value)
         
          
-    def display_VertLine(self, value):
-        try:
-            self.scene.removeItem(self.VLine)
-        except:
-            pass
-        self.VLine = self.scene.addLine(value, 0, value, self.getImgHeight(), QPen(Qt.red))
-    
-         
-    def display_HorizLine(self, value):
-        try:
-            self.scene.removeItem(self.HLine)
-        except:
-            pass
-        self.HLine = self.scene.addLine(0, value, self.getImgWidth(), value, QPen(Qt.green))
-
-        
-    def getHorizVal(self):
-        return self.__horiz
-    
-    def getVertVal(self):
-        return self.__vert
-        
-    def setHorizVal(self, value):
-        self.__horiz = value
-    
-    def setVertVal(self, value):
-        self.__vert = value
-
-    
-    def setWindowLevel(self, value):
-        self.__winlevel = value
-        self.imgWindowChange(self.__winlevel, self.__winwidth)
-        
-    def setWindowWidth(self, value):
-        self.__winwidth = value 
-        self.imgWindowChange(self.__winlevel, self.__winwidth)
-    
-    def getWindowLevel(self):
-        return self.__winlevel
-        
-    def getWindowWidth(self):
-        return self.__winwidth        
-        
-    def imgWindowChange(self, winowlevel, windowwidth):
-        self.__winlevel = winowlevel
-        self.__winwidth = windowwidth
-        
-        self.setSlice(self.__curSlice)            
-    
-    def imgProcessing(self, data):
-        # display levels
-        nlevels = 256    #int8
-        bpp = 8
-        
-        y_min = 0
-        y_max = nlevels -1 
-        
-        dout = ((data - (self.__winwidth/2+self.__winlevel - 0.5))/(self.__winwidth - 1) + 0.5) * (y_max-y_min) + y_min
-        
-        dout[dout<y_min] = y_min
-        dout[dout>y_max] = y_max
-        
-        return dout.astype(np.uint8) 
-    
     def resampleImage(self, spacing=None,fill_value=0):
-        
-        sitk_image = sitk.GetImageFromArray(self.__imageData)
-        sitk_image.SetSpacing([float(self.__pixelspacing[2]), \
-                               float(self.__pixelspacing[1]), \
-                               float(self.__pixelspacing[0])])
+        import SimpleITK as sitk
+
+        sitk_image = sitk.GetImageFromArray(self._imageData)
+        sitk_image.SetSpacing([float(self._pixelspacing[2]), \
+                               float(self._pixelspacing[1]), \
+                               float(self._pixelspacing[0])])
         
         num_dim = sitk_image.GetDimension()
         orig_pixelid = sitk_image.GetPixelIDValue()
         orig_origin = sitk_image.GetOrigin()
         orig_direction = sitk_image.GetDirection()
         orig_spacing = sitk_image.GetSpacing()
-        orig_size = np.array(sitk_image.GetSize(), dtype=np.int)
+        orig_size = np.array(sitk_image.GetSize(), dtype=int)
     
         if spacing is None:
             min_spacing = min(orig_spacing)
@@ -507,7 +396,7 @@ class QtImageViewer(QGraphicsView):
         sitk_interpolator = sitk.sitkLinear
     
         new_size = orig_size*(np.array(orig_spacing)/np.array(new_spacing))
-        new_size = np.ceil(new_size).astype(np.int) #  Image dimensions are in integers
+        new_size = np.ceil(new_size).astype(int) #  Image dimensions are in integers
         new_size = [int(s) for s in new_size] #  SimpleITK expects lists, not ndarrays
     
         resample_filter = sitk.ResampleImageFilter()
@@ -522,272 +411,24 @@ class QtImageViewer(QGraphicsView):
                                                        fill_value,
                                                        orig_pixelid)
     
-        self.__imageData = np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0])
-        self.__pixeldims = self.__imageData.shape
-        self.__pixelspacing = [new_spacing,new_spacing,new_spacing]
-        self.__winlevel = self.__imageData.min()
-        self.__winwidth = self.__imageData.max()-self.__imageData.min()         
-        self.__imgorientation = 1 # x-y
-        self.__curSlice = self.__pixeldims[2]//2
-        self.setSlice(self.__curSlice) 
-        
-    def setCrossShow(self, value):
-        if value == 0:
-            self.__crossshow = False
-        else:
-            self.__crossshow = True
-    
-    def getImageMaximum(self):
-        if self.__imageData is not None:
-            return self.__imageData.max()
-        else:
-            return 0
-        
-    def getImageMinimum(self):
-        if self.__imageData is not None:
-            return self.__imageData.min()
-        else:
-            return 0  
+        self._imageData = np.transpose(sitk.GetArrayFromImage(resampled_sitk_image), axes=[2,1,0])
+        self._pixeldims = self._imageData.shape
+        self.rescaleAffine(orig_spacing[::-1], new_spacing[::-1])
+        self._pixelspacing = [new_spacing,new_spacing,new_spacing]
+        self._winlevel = self._imageData.min()
+        self._winwidth = self._imageData.max().item()-self._imageData.min().item()         
+        self._imgorientation = 1 # x-y
+        self._curSlice = self._pixeldims[2]//2
+        self.setSlice(self._curSlice) 
         
-    def getWinLevelRange(self):
-        if self.__imageData is None:
-            return [0,1]
-        else:
-#             return [self.getSliceMin(), self.getSliceMax()]
-            return [self.__imageData.min(), self.__imageData.max()]  
-    
     def getWinWidthRange(self):
-        if self.__imageData is None:
+        if self._imageData is None:
             return [0,1]
         else:
 #             return [0, self.getSliceMax()-self.getSliceMin()] 
-            return [self.__imageData.min(), self.__imageData.max()]   
-            
-    def setSliceOrientation(self, orientation):
-        if orientation == 1:
-            self.__imgorientation = 1
-            self.setSliceOrientationToXY()
-        elif orientation == 2:   
-            self.__imgorientation = 2
-            self.setSliceOrientationToXZ()
-        else:
-            self.__imgorientation = 3
-            self.setSliceOrientationToYZ()
-    
-    def setSliceOrientationToXY(self):
-        self.__imgorientation = 1
-        if (self.__imageData is not None):
-            self.__curSlice = self.__pixeldims[2]//2
-            self.setSlice(self.__curSlice) 
-    
-    def setSliceOrientationToXZ(self):
-        self.__imgorientation = 2
-        if (self.__imageData is not None):
-            self.__curSlice = self.__pixeldims[1]//2
-            self.setSlice(self.__curSlice) 
-    
-    def setSliceOrientationToYZ(self):
-        self.__imgorientation = 3
-        if (self.__imageData is not None):
-            self.__curSlice = self.__pixeldims[0]//2 
-            self.setSlice(self.__curSlice) 
-        
-    def setFlipX(self, value):
-        self.__flipX = value
-        self.setSlice(self.__curSlice) 
-    
-    def setFlipY(self, value):
-        self.__flipY = value
-        self.setSlice(self.__curSlice)   
-    
-    def setRotateAngle(self, value):
-        self.__rotateAngle = value
-        self.setSlice(self.__curSlice)  
-        
-    def getRotateAngle(self):
-        return self.__rotateAngle
-    
-    def getCurSlice(self):
-        return self.__curSlice
-    
-    def getImgOrientation(self):
-        return self.__imgorientation
-    
-    def getCrosshair(self):
-        return self.__crosshair
-       
-    def get_qimage(self,image:np.ndarray):
-#         assert (np.max(image) <= 256)
-        image8 = image.astype(np.uint8, order='C', casting='unsafe')
-        height, width = image8.shape
-        bytesPerLine = width
-        image = QImage(image8.data, width, height, bytesPerLine, QImage.Format_Indexed8)
-        return image
- 
-    def setSliceOrig(self, slice):
-        if (self.__imageData is not None) and (slice>=self.getSliceMin() and slice<=self.getSliceMax()):
-            self.__curSlice = slice
-            if self.__imgorientation == 1:   #x-y
-#                 localData = self.__imageData[:,:,slice]
-                data = self.imgProcessing(self.__imageData[:,:,slice])  
-                qimage = self.get_qimage(data)
-#                 qimage = qimage.mirrored(self.__flipX, self.__flipY)
-                rotate = QTransform()
-                rotate.rotate(self.__rotateAngle)
-                qimg = qimage.transformed(rotate)
-                self.setImage(qimg)                
-            elif self.__imgorientation == 2:  #x-z
-                data = self.imgProcessing(self.__imageData[:,slice,:])              
-                qimage = self.get_qimage(data)
-#                 qimage = qimage.mirrored(self.__flipX, self.__flipY)   
-                rotate = QTransform()
-                rotate.rotate(self.__rotateAngle)
-                qimg = qimage.transformed(rotate)                
-                self.setImage(qimg) 
-            else:                          #y-z
-                data = self.imgProcessing(self.__imageData[slice,:,:])              
-                qimage = self.get_qimage(data)
-#                 qimage = qimage.mirrored(self.__flipX, self.__flipY)   
-                rotate = QTransform()
-                rotate.rotate(self.__rotateAngle)
-                qimg = qimage.transformed(rotate)                
-                self.setImage(qimg)   
-                
-                
-    def setSlice(self, slice):
-        if (self.__imageData is not None) and (slice>=self.getSliceMin() and slice<=self.getSliceMax()):
-            self.__curSlice = slice
-            if self.__imgorientation == 1:   #x-y
-                data = self.imgProcessing(self.__imageData[:,:,slice]) 
-                imgInt = (data/np.max(data)*255).astype(np.int)
-                
-                imgRGB_Mapped = np.stack([imgInt,imgInt,imgInt],axis=2)
-                im = Image.fromarray((imgRGB_Mapped * 255).astype(np.uint8))
-                
-                data2 = im.tobytes("raw","RGB")
-                qim = QImage(data2, im.size[0], im.size[1], QImage.Format_RGB888)
-                rotate = QTransform()
-                rotate.rotate(270)
-                qimg = qim.transformed(rotate)
-                pix = QPixmap.fromImage(qimg)
-                self.setImage(pix)   
-            elif self.__imgorientation == 2:  #x-z
-                data = self.imgProcessing(self.__imageData[:,slice,:])  
-                imgInt = (data/np.max(data)*255).astype(np.int)
-                
-                imgRGB_Mapped = np.stack([imgInt,imgInt,imgInt],axis=2)
-                im = Image.fromarray((imgRGB_Mapped * 255).astype(np.uint8))
-
-                data2 = im.tobytes("raw","RGB")
-                qim = QImage(data2, im.size[0], im.size[1], QImage.Format_RGB888)
-                rotate = QTransform()
-                rotate.rotate(270)
-                qimg = qim.transformed(rotate)
-                pix = QPixmap.fromImage(qimg)
-                self.setImage(pix)   
-            else:                          #y-z
-                data = self.imgProcessing(self.__imageData[slice,:,:])    
-                imgInt = (data/np.max(data)*255).astype(np.int)
-                
-                imgRGB_Mapped = np.stack([imgInt,imgInt,imgInt],axis=2)
-                im = Image.fromarray((imgRGB_Mapped * 255).astype(np.uint8))
-                
-                data2 = im.tobytes("raw","RGB")
-                qim = QImage(data2, im.size[0], im.size[1], QImage.Format_RGB888)
-                rotate = QTransform()
-                rotate.rotate(270)
-                qimg = qim.transformed(rotate)
-                pix = QPixmap.fromImage(qimg)
-                self.setImage(pix)   
-                
-                
-    
-    def getImgWidth(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]
-            else:
-                return 0            
-        
-    def getImgHeight(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]
-            else:
-                return 0  
-        
-    def getSliceMin(self):
-        return 0
-    
-    def getSliceMax(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]-1
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]-1
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]-1
-            else:
-                return 0
-    
-    def getSliceRange(self):
-        if self.__imgorientation == 1:   #x-y
-            if self.__pixeldims is not None:
-                return self.__pixeldims[2]
-            else:
-                return 0
-        elif self.__imgorientation == 2:  #x-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[1]
-            else:
-                return 0
-        else:                          #y-z
-            if self.__pixeldims is not None:
-                return self.__pixeldims[0]
-            else:
-                return 0
+            return [self._imageData.min(), self._imageData.max()]   
             
-    def getImageData(self):
-        return self.__imageData
-    
-    
-    def getSliceImageData(self):
-        if self.__imgorientation == 1:   #x-y
-            data = self.__imageData[:,:,self.__curSlice]               
-        elif self.__imgorientation == 2:  #x-z
-            data = self.__imageData[:,self.__curSlice,:]
-        else:                          #y-z
-            data = self.__imageData[self.__curSlice,:,:]
-        
-        return data
-    
-    def loadDicomSeries(self, folderName=""):  
+    def loadDicomSeries(self, folderName="", seriesID=None):  
         '''
         lstFilesDCM = []
             
@@ -799,120 +440,106 @@ class QtImageViewer(QGraphicsView):
         # Get ref file
         RefDs = dicom.read_file(lstFilesDCM[0])
         
-        self.__pixeldims = [int(RefDs.Rows), int(RefDs.Columns), len(lstFilesDCM)]
-        self.__pixelspacing = [(float)(RefDs.PixelSpacing[0]), (float)(RefDs.PixelSpacing[1]), (float)(RefDs.SliceThickness)]
+        self._pixeldims = [int(RefDs.Rows), int(RefDs.Columns), len(lstFilesDCM)]
+        self._pixelspacing = [(float)(RefDs.PixelSpacing[0]), (float)(RefDs.PixelSpacing[1]), (float)(RefDs.SliceThickness)]
         
-        self.__imageData = np.zeros(self.__pixeldims, dtype=float)
-        self.__fileName = folderName
+        self._imageData = np.zeros(self._pixeldims, dtype=float)
+        self._fileName = folderName
     
         # It cannot read compressed dicom data
         for filenameDCM in lstFilesDCM:
             # read the file
             ds = dicom.read_file(filenameDCM)
             # store the raw image data
-            self.__imageData[:, :, lstFilesDCM.index(filenameDCM)] = ds.pixel_array    
+            self._imageData[:, :, lstFilesDCM.index(filenameDCM)] = ds.pixel_array    
         '''
-        reader = sitk.ImageSeriesReader()
-        series_ids = reader.GetGDCMSeriesIDs(str(folderName))        
-        assert len(series_ids) == 1, 'Assuming only one series per folder.'
-        filenames = reader.GetGDCMSeriesFileNames(str(folderName), series_ids[0])
-        reader.SetFileNames(filenames)        
-        image = reader.Execute()
-        
-        self.__pixeldims = image.GetSize()
-        self.__pixelspacing = image.GetSpacing()
-        self.__imageData = sitk.GetArrayFromImage(image) #np.transpose(sitk.GetArrayFromImage(image), axes=[2,1,0])
-        self.__winlevel = self.__imageData.min()
-        self.__winwidth = self.__imageData.max()-self.__imageData.min()         
-        self.__imgorientation = 1 # x-y
-        self.__curSlice = self.__pixeldims[2]//2
-        self.setSlice(self.__curSlice) 
+        import dicomLoader
+
+        selected = dicomLoader.chooseSeries(folderName, seriesID, self)
+        if selected is None:
+            return
+        
+        self._imageData, info = dicomLoader.readSeries(*selected)
+        self._imageData = volumeCache.applyDtypePolicy(self._imageData, self._dtypePolicy)
+        self._pixeldims = list(self._imageData.shape)
+        self._pixelspacing = info['spacing']
+        self._affine = viewerCore.volumeAffine(info)
+        self._winlevel = info['stats']['min']
+        self._winwidth = info['stats']['max']-info['stats']['min']         
+        self._imgorientation = 1 # x-y
+        self._curSlice = self._pixeldims[2]//2
+        self.setSlice(self._curSlice) 
         
         #self.resampleImage() works, but it takes time to get isotropic image
         
-        self.__fileName = str(folderName)        
+        self._fileName = str(folderName)        
         
-    def loadNIFTI(self, fileName=""):
-        if len(fileName) and os.path.isfile(fileName):
-            img = nib.load(fileName)
-        
-            self.__pixeldims = list(img.shape)
-            self.__pixelspacing = list(img.header.get_zooms())
-            self.__imageData = img.get_data()
-            self.__winlevel = self.__imageData.min()
-            self.__winwidth = self.__imageData.max()-self.__imageData.min()  
-            self.__imgorientation = 1 # x-y   
-            self.__curSlice = self.__pixeldims[2]//2
-            self.setSlice(self.__curSlice)
-            
-            self.__fileName = fileName
-
     def loadFile(self, fileName="", orientation=1):
         if len(fileName) and os.path.isfile(fileName):
             ext = os.path.splitext(fileName)[-1]
             if("nii" in ext):
-                img = nib.load(fileName) 
+                self._imageData, info = volumeCache.loadNIFTI(fileName, self._dtypePolicy)
                 
-                self.__pixeldims = list(img.shape)
-                self.__imageData = img.get_data()
-                self.__imgorientation = orientation # x-y   
-                self.__curSlice = self.__pixeldims[2]//2
+                self._pixeldims = list(self._imageData.shape)
+                self._affine = viewerCore.volumeAffine(info)
+                self._imgorientation = orientation # x-y   
+                self._curSlice = self._pixeldims[2]//2
                 
                 
-                if self.__imgorientation == 1:   #x-y
-                    data = self.imgProcessing(self.__imageData[:,:,self.__curSlice]) 
-                    imgInt = (data/np.max(data)*255).astype(np.int)
-                    self.__winlevel = self.__imageData.min()
-                    self.__winwidth = self.__imageData.max()-self.__imageData.min()  
-                elif self.__imgorientation == 2:  #x-z
-                    data = self.imgProcessing(self.__imageData[:,self.__curSlice,:])  
-                    imgInt = (data/np.max(data)*255).astype(np.int)
-                    self.__winlevel = self.__imageData.min()
-                    self.__winwidth = self.__imageData.max()-self.__imageData.min()  
+                if self._imgorientation == 1:   #x-y
+                    data = self.imgProcessing(self._imageData[:,:,self._curSlice]) 
+                    imgInt = (data/np.max(data)*255).astype(int)
+                    self._winlevel = info['stats']['min']
+                    self._winwidth = info['stats']['max']-info['stats']['min']  
+                elif self._imgorientation == 2:  #x-z
+                    data = self.imgProcessing(self._imageData[:,self._curSlice,:])  
+                    imgInt = (data/np.max(data)*255).astype(int)
+                    self._winlevel = info['stats']['min']
+                    self._winwidth = info['stats']['max']-info['stats']['min']  
                 else:                          #y-z
-                    data = self.imgProcessing(self.__imageData[self.__curSlice,:,:])    
-                    imgInt = (data/np.max(data)*255).astype(np.int)
-                    self.__winlevel = self.__imageData.min()
-                    self.__winwidth = self.__imageData.max()-self.__imageData.min()
+                    data = self.imgProcessing(self._imageData[self._curSlice,:,:])    
+                    imgInt = (data/np.max(data)*255).astype(int)
+                    self._winlevel = info['stats']['min']
+                    self._winwidth = info['stats']['max']-info['stats']['min']
                     
-                self.setSlice(self.__curSlice)
+                self.setSlice(self._curSlice)
                 
             elif("mat" in ext):
                 #FIX THIS!!!!
-                img = scipy.io.loadmat(fileName)['a6_CORONALCHEST_']
+                self._imageData, info = volumeCache.loadMAT(fileName, 'a6_CORONALCHEST_', self._dtypePolicy)
         
-                self.__pixeldims = list(np.shape(img))
-                self.__imageData = img
-                self.__imgorientation = orientation # x-y   
-                self.__curSlice = self.__pixeldims[2]//2
+                self._pixeldims = list(np.shape(self._imageData))
+                self._affine = viewerCore.volumeAffine(info)
+                self._imgorientation = orientation # x-y   
+                self._curSlice = self._pixeldims[2]//2
                 
                 
-                if self.__imgorientation == 1:   #x-y
-                    data = self.imgProcessing(self.__imageData[:,:,self.__curSlice]) 
-                    imgInt = (data/np.max(data)*255).astype(np.int)
-                    self.__winlevel = self.__imageData.min()
-                    self.__winwidth = self.__imageData.max()-self.__imageData.min()  
-                elif self.__imgorientation == 2:  #x-z
-                    data = self.imgProcessing(self.__imageData[:,self.__curSlice,:])  
-                    imgInt = (data/np.max(data)*255).astype(np.int)
-                    self.__winlevel = self.__imageData.min()
-                    self.__winwidth = self.__imageData.max()-self.__imageData.min()  
+                if self._imgorientation == 1:   #x-y
+                    data = self.imgProcessing(self._imageData[:,:,self._curSlice]) 
+                    imgInt = (data/np.max(data)*255).astype(int)
+                    self._winlevel = info['stats']['min']
+                    self._winwidth = info['stats']['max']-info['stats']['min']  
+                elif self._imgorientation == 2:  #x-z
+                    data = self.imgProcessing(self._imageData[:,self._curSlice,:])  
+                    imgInt = (data/np.max(data)*255).astype(int)
+                    self._winlevel = info['stats']['min']
+                    self._winwidth = info['stats']['max']-info['stats']['min']  
                 else:                          #y-z
-                    data = self.imgProcessing(self.__imageData[self.__curSlice,:,:])    
-                    imgInt = (data/np.max(data)*255).astype(np.int)
-                    self.__winlevel = self.__imageData.min()
-                    self.__winwidth = self.__imageData.max()-self.__imageData.min() 
+                    data = self.imgProcessing(self._imageData[self._curSlice,:,:])    
+                    imgInt = (data/np.max(data)*255).astype(int)
+                    self._winlevel = info['stats']['min']
+                    self._winwidth = info['stats']['max']-info['stats']['min'] 
                 
-                self.setSlice(self.__curSlice)
+                self.setSlice(self._curSlice)
                 
             else:
                 print("File type error -- please use an accepted file type")
             
-            self.__fileName = fileName
+            self._fileName = fileName
             
             
     def loadCmap(self, img):
-        self.__imageData = img
+        self._imageData = img
 
     def updateViewer(self):
         """ Show current zoom (if showing entire image, apply current aspect ratio mode).
@@ -925,20 +552,15 @@ class QtImageViewer(QGraphicsView):
             self.zoomStack = []  # Clear the zoom stack (in case we got here because of an invalid zoom).
             self.fitInView(self.sceneRect(), self.aspectRatioMode)  # Show entire image (use current aspect ratio mode).
 
-    def resizeEvent(self, event):
-        """ Maintain current zoom on resize.
-        """
-        self.updateViewer()
-
     def mousePressEvent(self, event):
         """ Start mouse pan or zoom mode.
         """
         scenePos = self.mapToScene(event.pos())
-        if event.button() == Qt.RightButton:
+        if event.button() == Qt.LeftButton:
             if self.canPan:
                 self.setDragMode(QGraphicsView.ScrollHandDrag)
             self.leftMouseButtonPressed.emit(scenePos.x(), scenePos.y())
-        elif event.button() == Qt.LeftButton:
+        elif event.button() == Qt.RightButton:
             if self.canZoom:
                 self.setDragMode(QGraphicsView.RubberBandDrag)
             self.rightMouseButtonPressed.emit(scenePos.x(), scenePos.y())
@@ -949,10 +571,10 @@ class QtImageViewer(QGraphicsView):
         """
         QGraphicsView.mouseReleaseEvent(self, event)
         scenePos = self.mapToScene(event.pos())
-        if event.button() == Qt.RightButton:
+        if event.button() == Qt.LeftButton:
             self.setDragMode(QGraphicsView.NoDrag)
             self.leftMouseButtonReleased.emit(scenePos.x(), scenePos.y())
-        elif event.button() == Qt.LeftButton:
+        elif event.button() == Qt.RightButton:
             if self.canZoom:
 #                 viewBBox = self.zoomStack[-1] if len(self.zoomStack) else self.sceneRect()
                 viewBBox = self.sceneRect()
@@ -968,36 +590,12 @@ class QtImageViewer(QGraphicsView):
         """ Show entire image.
         """
         scenePos = self.mapToScene(event.pos())
-        if event.button() == Qt.RightButton:
+        if event.button() == Qt.LeftButton:
             self.leftMouseButtonDoubleClicked.emit(scenePos.x(), scenePos.y())
-        elif event.button() == Qt.LeftButton:
+        elif event.button() == Qt.RightButton:
             if self.canZoom:
                 self.zoomStack = []  # Clear zoom stack.
                 self.updateViewer()
             self.rightMouseButtonDoubleClicked.emit(scenePos.x(), scenePos.y())
         QGraphicsView.mouseDoubleClickEvent(self, event)
         
-    def mouseMoveEvent(self, event):
-        scenePos = self.mapToScene(event.pos())
-        
-        # record the position for cross drawing
-        self.__lineX.setLine(scenePos.x(),self.sceneRect().y(),scenePos.x(), self.sceneRect().y()+ self.sceneRect().height())      
-        self.__lineY.setLine(self.sceneRect().x(),scenePos.y(),self.sceneRect().x()+ self.sceneRect().width(),scenePos.y())  
-        
-        self.scene.invalidate(self.scene.sceneRect())
-        QGraphicsView.mouseMoveEvent(self, event)  # in PyQt5, update() doesn't trigger drawForeground()
-        
-    def drawForeground(self, painter, rect):
-        if self.__crossshow == True:
-            painter.save()
-            pen = QPen()
-            pen.setWidth(2)
-            pen.setColor(QColor(255,0,0))
-            painter.setPen(pen)
-            painter.drawLine(self.__lineX)
-            pen.setColor(QColor(0,255,0))
-            painter.setPen(pen)        
-            painter.drawLine(self.__lineY)
-            painter.restore()
-        QGraphicsView.drawForeground(self, painter, rect)          
-
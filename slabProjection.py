@@ -0,0 +1,122 @@
+#! /usr/bin/env python3
+"""
+slabProjection.py: thick slab projections (MIP, MinIP, mean) of a volume.
+
+A slab of width slices is centered on the slice index and clipped at the volume
+ends. The mean comes from cumulative sums along the slab axis, so any slab is two
+planes of the sums apart. Max and min slabs use the van Herk/Gil-Werman sliding
+window, which computes the projection for every slice in three passes over the
+volume. Both are built for the current axis (and width) and kept, so stepping
+through the slabs costs one plane per step.
+
+"""
+
+import numpy as np
+
+__author__ = ""
+__version__ = ""
+
+SLAB_MODES = ['max', 'min', 'mean']
+
+
+def slabBounds(index, width, length):
+    """ Returns the [first, last) slices of a slab of width centered on index.
+    """
+    first = max(index - (width-1)//2, 0)
+    last = min(index + width//2, length-1) + 1
+    return first, last
+
+
+def projectSlab(data, axis, index, width, mode):
+    """ The slab of getSlab computed directly from its slices, for volumes shown only once.
+    """
+    if mode not in SLAB_MODES:
+        raise RuntimeError("Unknown slab mode %s, use one of %s" % (mode, SLAB_MODES))
+    first, last = slabBounds(index, width, data.shape[axis])
+    slab = np.take(data, range(first, last), axis=axis)
+    if mode == 'mean':
+        return slab.mean(axis=axis)
+    return slab.max(axis=axis) if mode == 'max' else slab.min(axis=axis)
+
+
+def slidingExtreme(data, axis, width, mode):
+    """ Max (mode 'max') or min (mode 'min') over a sliding window of width along axis,
+    for every position, by the van Herk/Gil-Werman algorithm.
+    """
+    func = np.maximum if mode == 'max' else np.minimum
+    if np.issubdtype(data.dtype, np.integer):
+        info = np.iinfo(data.dtype)
+        fill = info.min if mode == 'max' else info.max
+    else:
+        fill = -np.inf if mode == 'max' else np.inf
+
+    data = np.moveaxis(np.asarray(data), axis, 0)
+    length = data.shape[0]
+    before = (width-1)//2
+    padded = length + width - 1
+    blocks = -(-padded//width)
+
+    # blocks of width slices, the window of slice i is padded slices i to i+width-1
+    buf = np.full((blocks*width,) + data.shape[1:], fill, dtype=data.dtype)
+    buf[before:before+length] = data
+    buf = buf.reshape((blocks, width) + data.shape[1:])
+    prefix = func.accumulate(buf, axis=1).reshape((blocks*width,) + data.shape[1:])
+    suffix = func.accumulate(buf[:, ::-1], axis=1)[:, ::-1].reshape((blocks*width,) + data.shape[1:])
+    result = func(suffix[:length], prefix[width-1:width-1+length])
+    return np.moveaxis(result, 0, axis)
+
+
+class SlabProjector(object):
+    """ Slab projections of one volume, the precomputed sums and sliding extremes are
+    kept for the last axis, slab width and mode they were needed for.
+    """
+
+    def __init__(self, data):
+        self.__data = data
+        self.__key = self.dataKey(data)
+        self.__sums = None
+        self.__sumsAxis = None
+        self.__extreme = None
+        self.__extremeKey = None
+
+    @staticmethod
+    def dataKey(data):
+        return (data.__array_interface__['data'][0], data.shape, data.strides, data.dtype.str)
+
+    def matches(self, data):
+        """ True when data is the volume (the same memory, not only an equal copy) of this projector.
+        """
+        return self.dataKey(data) == self.__key
+
+    def getSums(self, axis):
+        """ Cumulative sums along axis, with a leading zero plane.
+        """
+        if self.__sumsAxis != axis:
+            self.__sums = None
+            data = np.moveaxis(np.asarray(self.__data), axis, 0)
+            dtype = np.int64 if np.issubdtype(data.dtype, np.integer) else np.float64
+            sums = np.zeros((data.shape[0]+1,) + data.shape[1:], dtype=dtype)
+            np.cumsum(data, axis=0, dtype=dtype, out=sums[1:])
+            self.__sums = sums
+            self.__sumsAxis = axis
+        return self.__sums
+
+    def getExtreme(self, axis, width, mode):
+        key = (axis, width, mode)
+        if self.__extremeKey != key:
+            self.__extreme = None  # release the previous one before building
+            self.__extreme = slidingExtreme(self.__data, axis, width, mode)
+            self.__extremeKey = key
+        return self.__extreme
+
+    def getSlab(self, axis, index, width, mode):
+        """ Returns the projection of the slab of width centered on slice index along axis,
+        with the remaining axes in order like a single slice.
+        """
+        if mode not in SLAB_MODES:
+            raise RuntimeError("Unknown slab mode %s, use one of %s" % (mode, SLAB_MODES))
+        if mode == 'mean':
+            first, last = slabBounds(index, width, self.__data.shape[axis])
+            sums = self.getSums(axis)
+            return (sums[last] - sums[first]) / float(last - first)
+        return np.take(self.getExtreme(axis, width, mode), index, axis=axis)
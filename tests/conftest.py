@@ -0,0 +1,15 @@
+import os
+import sys
+
+# the viewers are flat modules in the repository root, shown offscreen without the volume cache
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ.setdefault('IMAGEVIEWERS_NOCACHE', '1')
+
+import pytest
+from PyQt5.QtWidgets import QApplication
+
+
+@pytest.fixture(scope='session')
+def app():
+    return QApplication.instance() or QApplication(sys.argv)
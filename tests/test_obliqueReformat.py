@@ -0,0 +1,21 @@
+import numpy as np
+
+import obliqueReformat
+
+
+def test_trilinear_fortran_order():
+    data = np.random.rand(30, 20, 10).astype(np.float32)
+    coords = np.random.rand(3, 40, 50)*np.array([31, 21, 11])[:, None, None] - 1
+    result = obliqueReformat.trilinear(data, coords, fill_value=-1)
+    assert np.array_equal(result, obliqueReformat.trilinear(np.asfortranarray(data), coords, fill_value=-1))
+    # the general gather path, on a non contiguous view
+    padded = np.zeros((30, 20, 20), dtype=np.float32)
+    padded[:, :, ::2] = data
+    assert np.allclose(result, obliqueReformat.trilinear(padded[:, :, ::2], coords, fill_value=-1))
+
+
+def test_zero_tilt_is_slice():
+    data = np.asfortranarray(np.random.rand(30, 20, 10).astype(np.float32))
+    sampler = obliqueReformat.ObliqueSampler()
+    plane = sampler.samplePlane(data, [1.0, 1.0, 2.0], 2, [0, 1], (0.0, 0.0), 4)
+    assert np.allclose(plane, data[:, :, 4])
@@ -0,0 +1,34 @@
+import numpy as np
+import nibabel as nib
+
+import ViewerSetup
+
+
+def test_full_resample_after_on_demand(app, tmp_path):
+    fileName = str(tmp_path / 'volume.nii')
+    nib.save(nib.Nifti1Image(np.random.rand(20, 16, 10).astype(np.float32), np.diag([1.0, 1.0, 3.0, 1.0])), fileName)
+    viewer = ViewerSetup.QtImageViewer()
+    viewer.loadNIFTI(fileName)
+
+    viewer.resampleImage(onDemand=True)
+    assert viewer._pixeldims == [20, 16, 30]
+    assert viewer.getImageData().shape == (20, 16, 10)
+
+    viewer.resampleImage()
+    assert viewer.getImageData().shape == (20, 16, 30)
+    assert viewer._pixeldims == [20, 16, 30]
+    assert viewer._pixelspacing == [1.0, 1.0, 1.0]
+    assert np.allclose(viewer.physicalAffine(), np.eye(4))
+
+
+def test_on_demand_resample_twice(app, tmp_path):
+    fileName = str(tmp_path / 'volume.nii')
+    nib.save(nib.Nifti1Image(np.random.rand(20, 16, 10).astype(np.float32), np.diag([1.0, 1.0, 3.0, 1.0])), fileName)
+    viewer = ViewerSetup.QtImageViewer()
+    viewer.loadNIFTI(fileName)
+
+    viewer.resampleImage(onDemand=True)
+    viewer.resampleImage([2.0, 2.0, 2.0], onDemand=True)
+    assert viewer._pixeldims == [10, 8, 15]
+    assert viewer._pixelspacing == [2.0, 2.0, 2.0]
+    assert viewer.getPlane(1, 7).shape == (10, 8)
@@ -0,0 +1,1153 @@
+#! /usr/bin/env python3
+"""
+viewerCore.py: the QGraphicsView image viewer shared by the QtImageViewer widgets.
+
+ViewerCore holds the volume, the slice orientation, window/level, mouse zooming
+and panning and the render pipeline. A slice is drawn by
+
+    getPlane (slice source) -> windowPlane -> colormapPlane -> buildQImage -> rotate -> setImage
+
+and the viewers in ViewerSetup, CompareSetup, setup3D and SegmenterSetup override
+the steps they need, so changes to the pipeline reach all of them.
+
+"""
+
+import os.path
+import os
+import math
+import time
+
+import numpy as np
+import volumeCache
+import renderProfiler
+import slabProjection
+import obliqueReformat
+
+from PyQt5.QtCore import Qt, QRectF, QPointF, pyqtSignal, QLineF, QTimer
+from PyQt5.QtGui import QImage, QPixmap, QPainterPath, QPen, QColor, QTransform
+from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QFileDialog
+
+__author__ = ""
+__version__ = ""
+
+# Colormaps offered by the viewers, 'gray' is the plain Indexed8 image.
+COLORMAPS = ['gray', 'bone', 'hot', 'jet', 'viridis']
+
+# Part of the visible scene size also rendered on each side of it, so small pans need no new render.
+REGION_MARGIN = 0.25
+
+# Samples a preview renders at most during slider drags, see setPreview.
+PREVIEW_PIXELS = 256*256
+
+# Milliseconds a drag has to pause before the plane is rendered in full.
+PREVIEW_IDLE_MS = 250
+
+# Milliseconds between hover readouts, the mouse positions in between are coalesced.
+HOVER_INTERVAL_MS = 16
+
+GREY_TABLE = [0xff000000 | (i << 16) | (i << 8) | i for i in range(256)]
+
+
+def rgbTable(rgb):
+    """ Returns the QImage color table (256 QRgb values) of a (256, 3) array of 0-255 colors.
+    """
+    rgb = np.clip(np.round(rgb), 0, 255).astype(np.uint32)
+    return (0xff000000 | (rgb[:,0] << 16) | (rgb[:,1] << 8) | rgb[:,2]).tolist()
+
+
+def volumeAffine(info):
+    """ Returns the 4x4 matrix from voxel (x, y, z) indices to physical coordinates given by the
+    loader info of a volume: the NIfTI 'affine' (RAS), or the DICOM 'origin' and 'direction'
+    (LPS) with its 'spacing'. None when info has no geometry.
+    """
+    if 'affine' in info:
+        return np.array(info['affine'], dtype=float)
+    if 'origin' in info and 'direction' in info:
+        affine = np.eye(4)
+        affine[:3, :3] = np.reshape(info['direction'], (3, 3))*np.asarray(info['spacing'][:3], dtype=float)
+        affine[:3, 3] = info['origin']
+        return affine
+    return None
+
+
+def colormapTable(name):
+    """ Returns the color table of the matplotlib colormap name, None for 'gray'.
+    """
+    if name is None or name == 'gray':
+        return None
+    from matplotlib import colormaps
+    return rgbTable(colormaps[name](np.arange(256))[:,:3]*255)
+
+
+class ViewerCore(QGraphicsView):
+    """ PyQt image viewer widget for a QPixmap in a QGraphicsView scene with mouse zooming and panning.
+
+    Displays a QImage or QPixmap (QImage is internally converted to a QPixmap).
+    To display any other image format, you must first convert it to a QImage or QPixmap.
+
+    Mouse interaction:
+        Left mouse button drag: Pan image.
+        Right mouse button drag: Zoom box.
+        Right mouse button doubleclick: Zoom to show entire image.
+    """
+
+    # Mouse button signals emit image scene (x, y) coordinates.
+    # !!! For image (row, column) matrix indexing, row = y and column = x.
+    leftMouseButtonPressed = pyqtSignal(float, float)
+    rightMouseButtonPressed = pyqtSignal(float, float)
+    leftMouseButtonReleased = pyqtSignal(float, float)
+    rightMouseButtonReleased = pyqtSignal(float, float)
+    leftMouseButtonDoubleClicked = pyqtSignal(float, float)
+    rightMouseButtonDoubleClicked = pyqtSignal(float, float)
+    hoverChanged = pyqtSignal(object)
+
+    # Volume axis each slice orientation steps through, other orientations use axis 0.
+    # The displayed plane is the two remaining axes, in order, as (width, height).
+    ORIENTATION_AXES = {1: 2,    #x-y
+                        2: 1,    #x-z
+                        3: 0}    #y-z
+
+    # Render only the visible part of a plane, at about the viewport resolution.
+    REGION_RENDERING = True
+
+    def __init__(self):
+        QGraphicsView.__init__(self)
+
+        # Image is displayed as a QPixmap in a QGraphicsScene attached to this QGraphicsView.
+        self.scene = QGraphicsScene()
+        self.setScene(self.scene)
+
+        #set the focus to this viewer
+        self.setFocusPolicy(Qt.StrongFocus)
+
+        # Store a local handle to the scene's current image pixmap.
+        self._pixmapHandle = None
+
+        # Image aspect ratio mode.
+        # !!! ONLY applies to full image. Aspect ratio is always ignored when zooming.
+        #   Qt.IgnoreAspectRatio: Scale image to fit viewport.
+        #   Qt.KeepAspectRatio: Scale image to fit inside viewport, preserving aspect ratio.
+        #   Qt.KeepAspectRatioByExpanding: Scale image to fill the viewport, preserving aspect ratio.
+        self.aspectRatioMode = Qt.KeepAspectRatio
+
+        # Scroll bar behaviour.
+        #   Qt.ScrollBarAlwaysOff: Never shows a scroll bar.
+        #   Qt.ScrollBarAlwaysOn: Always shows a scroll bar.
+        #   Qt.ScrollBarAsNeeded: Shows a scroll bar only when zoomed.
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+
+        # Stack of QRectF zoom boxes in scene coordinates.
+        self.zoomStack = []
+
+        # -------------------
+        self._fileName = None
+        self._imageData = None
+        self._pixeldims = None
+        self._pixelspacing = None
+        self._affine = None
+        self._imgorientation = 1
+        self._curSlice = 0
+
+        # -------------------
+        self._crossshow = False
+        self._lineX = QLineF()
+        self._lineY = QLineF()
+
+        # -------------------
+        self._crosshair = 0
+        self._thruPlane = 0
+        self._vert = 0
+        self._horiz = 0
+        self._flipX = False
+        self._flipY = False
+        self._rotateAngle = 270
+
+        # -------------------
+        self._winlevel = 0
+        self._winwidth = 256
+        self._dtypePolicy = 'native'
+
+        # -------------------
+        # Colors of the 8 bit display values, None is grey. _displayImage is the
+        # last Indexed8 image shown, recolored by swapping its color table.
+        self._colorTable = None
+        self._displayImage = None
+
+        # -------------------
+        # Thick slab rendering, a width of 1 shows single slices.
+        self._slabWidth = 1
+        self._slabMode = 'max'
+        self._slabProjector = None
+
+        # -------------------
+        # Oblique reformatting, tilts (degrees) of the cutting plane about its
+        # width and height axes. Zero tilts show the axis aligned slices.
+        self._obliqueTilts = (0.0, 0.0)
+        self._obliqueSampler = obliqueReformat.ObliqueSampler()
+        self._obliqueView = None
+
+        # -------------------
+        # Viewport resolution rendering: the last plane displayed, the (rows, columns)
+        # slices of it that were rendered and the scene rectangle they cover.
+        self._lastPlane = None
+        self._lastFactor = 1
+        self._planeShape = None
+        self._planeRegion = None
+        self._imageRegion = None
+        self._regionStep = 1
+        self._refreshPending = False
+
+        # -------------------
+        # Decimated previews while a slider is dragged.
+        self._preview = False
+        self._previewTimer = QTimer(self)
+        self._previewTimer.setSingleShot(True)
+        self._previewTimer.timeout.connect(self.previewIdle)
+
+        # -------------------
+        # Hover readout, the last mouse scene position waits for the timer
+        self._hoverReadout = False
+        self._hoverPos = None
+        self._hoverTimer = QTimer(self)
+        self._hoverTimer.setSingleShot(True)
+        self._hoverTimer.timeout.connect(self.hoverUpdate)
+
+        # -------------------
+        self._profiler = None
+        self._showHUD = False
+
+        # Flags for enabling/disabling mouse interaction.
+        self.canZoom = True
+        self.canPan = True
+
+    def hasImage(self):
+        """ Returns whether or not the scene contains an image pixmap.
+        """
+        return self._pixmapHandle is not None
+
+    def clearImage(self):
+        """ Removes the current image pixmap from the scene if it exists.
+        """
+        if self.hasImage():
+            self.scene.removeItem(self._pixmapHandle)
+            self._pixmapHandle = None
+
+    def pixmap(self):
+        """ Returns the scene's current image pixmap as a QPixmap, or else None if no image exists.
+        :rtype: QPixmap | None
+        """
+        if self.hasImage():
+            return self._pixmapHandle.pixmap()
+        return None
+
+    def image(self):
+        """ Returns the scene's current image pixmap as a QImage, or else None if no image exists.
+        :rtype: QImage | None
+        """
+        if self.hasImage():
+            return self._pixmapHandle.pixmap().toImage()
+        return None
+
+    def setImage(self, image, region=None):
+        """ Set the scene's current image pixmap to the input QImage or QPixmap.
+        Raises a RuntimeError if the input image has type other than QImage or QPixmap.
+        region is the scene rectangle a partial image covers, the scene keeps its size.
+        Without it the image is the whole scene.
+        :type image: QImage | QPixmap
+        """
+        if type(image) is QPixmap:
+            pixmap = image
+        elif type(image) is QImage:
+            pixmap = QPixmap.fromImage(image)
+        else:
+            raise RuntimeError("ImageViewer.setImage: Argument must be a QImage or QPixmap.")
+
+        if self.hasImage():
+            self._pixmapHandle.setPixmap(pixmap)
+        else:
+            self._pixmapHandle = self.scene.addPixmap(pixmap)
+
+        if region is None:
+            self._pixmapHandle.setPos(0, 0)
+            self._pixmapHandle.setScale(1)
+            self.setSceneRect(QRectF(pixmap.rect()))  # Set scene size to image size.
+            self.updateViewer()
+        else:
+            # the scene is unchanged, keep the view where it was panned to
+            self._pixmapHandle.setPos(region.topLeft())
+            self._pixmapHandle.setScale(region.width()/pixmap.width())
+
+    # -------------------------------------------------
+    # Crosshairs
+    # -------------------------------------------------
+    def clearCrosshairPopup(self):
+        self.ch.close()
+        self._crosshair = 0
+        self.scene.removeItem(self.HLine)
+        self.scene.removeItem(self.VLine)
+        self.setHorizVal(0)
+        self.setVertVal(0)
+        if(self._thruPlane == 2):
+            self._thruPlane = 0
+            self.tp.close()
+
+    def clearCrosshairs(self):
+        self.scene.removeItem(self.HLine)
+        self.scene.removeItem(self.VLine)
+        self.setHorizVal(0)
+        self.setVertVal(0)
+        if(self._thruPlane == 2):
+            self._thruPlane = 0
+
+    def clearThruPlanePopup(self):
+        self.tp.close()
+
+    def display_VertLine(self, value):
+        try:
+            self.scene.removeItem(self.VLine)
+        except:
+            pass
+        self.VLine = self.scene.addLine(value, 0, value, self.getImgHeight(), QPen(Qt.red))
+
+    def display_HorizLine(self, value):
+        try:
+            self.scene.removeItem(self.HLine)
+        except:
+            pass
+        self.HLine = self.scene.addLine(0, value, self.getImgWidth(), value, QPen(Qt.green))
+
+    def getHorizVal(self):
+        return self._horiz
+
+    def getVertVal(self):
+        return self._vert
+
+    def setHorizVal(self, value):
+        self._horiz = value
+
+    def setVertVal(self, value):
+        self._vert = value
+
+    def setCrossShow(self, value):
+        if value == 0:
+            self._crossshow = False
+        else:
+            self._crossshow = True
+        self.scene.invalidate(self.scene.sceneRect())
+
+    def getCrosshair(self):
+        return self._crosshair
+
+    # -------------------------------------------------
+    # Window / level
+    # -------------------------------------------------
+    def setWindowLevel(self, value):
+        self._winlevel = value
+        self.imgWindowChange(self._winlevel, self._winwidth)
+
+    def setWindowWidth(self, value):
+        self._winwidth = value
+        self.imgWindowChange(self._winlevel, self._winwidth)
+
+    def getWindowLevel(self):
+        return self._winlevel
+
+    def getWindowWidth(self):
+        return self._winwidth
+
+    def setDtypePolicy(self, dtypePolicy):
+        """ Type volumes are loaded as, one of volumeCache.DTYPE_POLICIES.
+        'native' keeps the on-disk type, int16 CT stays int16.
+        """
+        volumeCache.checkDtypePolicy(dtypePolicy)
+        self._dtypePolicy = dtypePolicy
+
+    def getDtypePolicy(self):
+        return self._dtypePolicy
+
+    def imgWindowChange(self, winowlevel, windowwidth):
+        self._winlevel = winowlevel
+        self._winwidth = windowwidth
+
+        self.setSlice(self._curSlice)
+
+    def imgProcessing(self, data, winlevel=None):
+        # display levels
+        nlevels = 256    #int8
+        bpp = 8
+
+        y_min = 0
+        y_max = nlevels -1
+
+        if winlevel is None:
+            winlevel = self._winlevel
+
+        dout = ((data - (self._winwidth/2+winlevel - 0.5))/(self._winwidth - 1) + 0.5) * (y_max-y_min) + y_min
+
+        dout[dout<y_min] = y_min
+        dout[dout>y_max] = y_max
+
+        return dout.astype(np.uint8)
+
+    def getImageMaximum(self):
+        if self._imageData is not None:
+            return self._imageData.max()
+        else:
+            return 0
+
+    def getImageMinimum(self):
+        if self._imageData is not None:
+            return self._imageData.min()
+        else:
+            return 0
+
+    def getWinLevelRange(self):
+        if self._imageData is None:
+            return [0,1]
+        else:
+            return [self._imageData.min(), self._imageData.max()]
+
+    def getWinWidthRange(self):
+        if self._imageData is None:
+            return [0,1]
+        else:
+            return [0, self._imageData.max().item()-self._imageData.min().item()]
+
+    # -------------------------------------------------
+    # Orientation
+    # -------------------------------------------------
+    def sliceAxis(self, orientation):
+        return self.ORIENTATION_AXES.get(orientation, 0)
+
+    def planeAxes(self, orientation):
+        """ Returns the volume axes shown as the (width, height) of the plane of an orientation.
+        """
+        axis = self.sliceAxis(orientation)
+        return [a for a in range(3) if a != axis]
+
+    def setSliceOrientation(self, orientation):
+        self._imgorientation = orientation
+        if (self._imageData is not None):
+            self._curSlice = self._pixeldims[self.sliceAxis(orientation)]//2
+            self.setSlice(self._curSlice)
+
+    def orientationOfAxis(self, axis):
+        for orientation, a in sorted(self.ORIENTATION_AXES.items()):
+            if a == axis:
+                return orientation
+
+    def setSliceOrientationToXY(self):
+        self.setSliceOrientation(self.orientationOfAxis(2))
+
+    def setSliceOrientationToXZ(self):
+        self.setSliceOrientation(self.orientationOfAxis(1))
+
+    def setSliceOrientationToYZ(self):
+        self.setSliceOrientation(self.orientationOfAxis(0))
+
+    def setFlipX(self, value):
+        self._flipX = value
+        self.setSlice(self._curSlice)
+
+    def setFlipY(self, value):
+        self._flipY = value
+        self.setSlice(self._curSlice)
+
+    def setRotateAngle(self, value):
+        self._rotateAngle = value
+        self.setSlice(self._curSlice)
+
+    def getRotateAngle(self):
+        return self._rotateAngle
+
+    def getCurSlice(self):
+        return self._curSlice
+
+    def getImgOrientation(self):
+        return self._imgorientation
+
+    def getImgWidth(self):
+        if self._pixeldims is not None:
+            return self._pixeldims[self.planeAxes(self._imgorientation)[0]]
+        else:
+            return 0
+
+    def getImgHeight(self):
+        if self._pixeldims is not None:
+            return self._pixeldims[self.planeAxes(self._imgorientation)[1]]
+        else:
+            return 0
+
+    def getSliceMin(self):
+        return 0
+
+    def getSliceMax(self):
+        if self._pixeldims is not None:
+            return self._pixeldims[self.sliceAxis(self._imgorientation)]-1
+        else:
+            return 0
+
+    def getSliceRange(self):
+        if self._pixeldims is not None:
+            return self._pixeldims[self.sliceAxis(self._imgorientation)]
+        else:
+            return 0
+
+    # -------------------------------------------------
+    # Render pipeline
+    # -------------------------------------------------
+    def extractPlane(self, data, orientation, index):
+        """ Returns slice index of orientation from the (x, y, z) volume data, as a view.
+        """
+        key = [slice(None)]*3
+        key[self.sliceAxis(orientation)] = index
+        return data[tuple(key)]
+
+    def getSliceData(self, data, index):
+        return self.extractPlane(data, self._imgorientation, index)
+
+    def getImageData(self):
+        return self._imageData
+
+    def getSliceImageData(self):
+        return self.extractPlane(self._imageData, self._imgorientation, self._curSlice)
+
+    def getPlane(self, orientation, index, view=None):
+        """ Slice source of the render pipeline, the plane to display for (orientation, index).
+        view is the part of an oblique plane to sample, see obliqueView.
+        """
+        return self.samplePlane(self._imageData, orientation, index, view)
+
+    def samplePlane(self, data, orientation, index, view=None):
+        """ Plane index of orientation from data: tilted in oblique mode, a slab projection in
+        slab mode, otherwise the slice itself.
+        """
+        if self.isOblique():
+            return self.obliquePlane(data, orientation, index, view=view)
+        return self.slabPlane(data, orientation, index)
+
+    def setSlab(self, width, mode='max'):
+        """ Show the projection (one of slabProjection.SLAB_MODES) of width slices centered
+        on the current slice instead of the slice alone, a width of 1 turns it off.
+        """
+        if mode not in slabProjection.SLAB_MODES:
+            raise RuntimeError("Unknown slab mode %s, use one of %s" % (mode, slabProjection.SLAB_MODES))
+        self._slabWidth = max(int(width), 1)
+        self._slabMode = mode
+        if self._imageData is not None:
+            self.setSlice(self._curSlice)
+
+    def getSlabWidth(self):
+        return self._slabWidth
+
+    def getSlabMode(self):
+        return self._slabMode
+
+    def setObliqueTilts(self, tiltWidth, tiltHeight):
+        """ Tilt the cutting plane by tiltWidth and tiltHeight degrees about the width and
+        height axes of the displayed plane. The oblique plane is sampled with trilinear
+        interpolation over the visible region at the density of the device pixels, zero tilts
+        return to the axis aligned slices. Slab mode is not applied to oblique planes.
+        """
+        self._obliqueTilts = (float(tiltWidth), float(tiltHeight))
+        if self._imageData is not None:
+            self.setSlice(self._curSlice)
+
+    def getObliqueTilts(self):
+        return self._obliqueTilts
+
+    def isOblique(self):
+        return self._obliqueTilts != (0.0, 0.0)
+
+    def displayShape(self, orientation):
+        """ (rows, columns) of the planes of orientation of the displayed volume.
+        """
+        return [self._pixeldims[a] for a in self.planeAxes(orientation)]
+
+    def obliqueView(self, shape):
+        """ The part of an oblique plane of shape (rows, columns) to sample for the view:
+        the area (top, bottom, left, right) in plane pixels and the (rows, columns) samples
+        covering it. The visible region plus REGION_MARGIN is sampled at a power of two
+        samples per plane pixel at least as fine as the device pixels, fewer than
+        PREVIEW_PIXELS in preview mode. When the view is not fitted to the plane (see
+        renderRegion) the whole plane is sampled once per pixel. Call on the GUI thread.
+        """
+        whole = (0, shape[0], 0, shape[1]), tuple(shape)
+        if not (self.REGION_RENDERING and self.isVisible()) or self._rotateAngle % 90 != 0:
+            return whole
+        transform = self.planeTransform(shape)
+        full = transform.mapRect(QRectF(0, 0, shape[1], shape[0]))
+        if self.sceneRect() != full:
+            return whole
+        view = self.mapToScene(self.viewport().rect()).boundingRect()
+        visible = view.intersected(full)
+        if visible.isEmpty():
+            return whole
+
+        pixels = self.devicePixelRatioF()
+        density = min(view.width()/max(self.viewport().width()*pixels, 1),
+                      view.height()/max(self.viewport().height()*pixels, 1))
+        scale = 2.0**math.ceil(math.log2(1.0/max(density, 1e-6)))
+        margin = REGION_MARGIN*max(visible.width(), visible.height())
+        area = transform.inverted()[0].mapRect(visible.adjusted(-margin, -margin, margin, margin))
+        bottom = min(area.bottom(), shape[0])
+        right = min(area.right(), shape[1])
+        while True:
+            # start on a multiple of the sample size, so the samples stay the same while panning
+            top = max(math.floor(area.top()*scale)/scale, 0)
+            left = max(math.floor(area.left()*scale)/scale, 0)
+            rows = max(int(math.ceil((bottom - top)*scale)), 1)
+            columns = max(int(math.ceil((right - left)*scale)), 1)
+            if not self._preview or rows*columns <= PREVIEW_PIXELS:
+                break
+            scale /= 2
+        return (top, top + rows/scale, left, left + columns/scale), (rows, columns)
+
+    def obliquePlane(self, data, orientation, position, spacing=None, view=None):
+        """ The oblique plane through slice position (voxels, may be fractional) of orientation.
+        spacing is the voxel spacing of data, by default the one of the displayed volume.
+        view (area, size) is the part of the plane to sample, see obliqueView, by default
+        the whole plane once per pixel of the displayed planes.
+        """
+        if spacing is None:
+            spacing = [1.0]*3 if self._pixelspacing is None else [float(s) for s in self._pixelspacing[:3]]
+        area, size = (None, None) if view is None else view
+        return self._obliqueSampler.samplePlane(data, spacing, self.sliceAxis(orientation),
+                                                self.planeAxes(orientation), self._obliqueTilts,
+                                                position, self.displayShape(orientation), area, size)
+
+    def slabPlane(self, data, orientation, index):
+        """ Slice index of orientation from data, or the slab projection around it in slab mode.
+        """
+        if self._slabWidth <= 1:
+            return self.extractPlane(data, orientation, index)
+        axis = self.sliceAxis(orientation)
+        projector = self._slabProjector
+        if projector is None or not projector.matches(data):
+            if not slabProjection.SlabProjector.dataKey(data) == slabProjection.SlabProjector.dataKey(self._imageData):
+                # another volume than the displayed one (a prefetched frame), not worth precomputing
+                return slabProjection.projectSlab(data, axis, index, self._slabWidth, self._slabMode)
+            projector = slabProjection.SlabProjector(data)
+            self._slabProjector = projector
+        return projector.getSlab(axis, index, self._slabWidth, self._slabMode)
+
+    def windowPlane(self, plane):
+        """ Maps a plane to 8 bit display values.
+        """
+        return self.imgProcessing(plane)
+
+    def colormapPlane(self, data):
+        """ Colors the windowed plane: an 8 bit plane is colored by the color table of
+        buildQImage, a (width, height, 3) plane is RGB.
+        """
+        return data
+
+    def buildQImage(self, data):
+        if data.ndim == 3:
+            return self.get_qimage_rgb(data)
+        image = self.get_qimage(data)
+        if self._colorTable is not None:
+            image.setColorTable(self._colorTable)
+        return image
+
+    def setColorTable(self, table):
+        """ Colors the 8 bit display values with table (256 QRgb values), None for grey.
+        The displayed slice is recolored by swapping the color table of its Indexed8
+        image, the volume is not windowed again.
+        """
+        if table is not None and len(table) != 256:
+            raise RuntimeError("A color table needs 256 entries, got %d" % len(table))
+        self._colorTable = table
+        if self._displayImage is not None:
+            t = time.perf_counter()
+            self._displayImage.setColorTable(GREY_TABLE if table is None else table)
+            t = self.markStage('colormap', t)
+            self.setImage(self._displayImage, self._imageRegion)
+            self.markStage('pixmap', t)
+
+    def getColorTable(self):
+        return self._colorTable
+
+    def setColormap(self, name):
+        """ Colors the display with one of COLORMAPS.
+        """
+        if name not in COLORMAPS:
+            raise RuntimeError("Unknown colormap %s, use one of %s" % (name, COLORMAPS))
+        self.setColorTable(colormapTable(name))
+
+    def get_qimage(self,image:np.ndarray):
+#         assert (np.max(image) <= 256)
+        image8 = image.astype(np.uint8, order='C', casting='unsafe')
+        height, width = image8.shape
+        bytesPerLine = width
+        image = QImage(image8.data, width, height, bytesPerLine, QImage.Format_Indexed8)
+        return image
+
+    def get_qimage_rgb(self,image:np.ndarray):
+        image8 = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width, channels = image8.shape
+        bytesPerLine = width*channels
+        image = QImage(image8.data, width, height, bytesPerLine, QImage.Format_RGB888)
+        return image
+
+    def setSlice(self, slice):
+        if (self._imageData is not None) and (slice>=self.getSliceMin() and slice<=self.getSliceMax()):
+            self._curSlice = slice
+            t0 = time.perf_counter()
+            if self.isOblique():
+                shape = self.displayShape(self._imgorientation)
+                view = self.obliqueView(shape)
+                plane = self.getPlane(self._imgorientation, slice, view=view)
+                self.markStage('extract', t0)
+                self.displayPlane(plane, shape=shape, view=view)
+            else:
+                plane = self.getPlane(self._imgorientation, slice)
+                self.markStage('extract', t0)
+                self.displayPlane(plane)
+
+    def displayPlane(self, plane, factor=1, shape=None, view=None):
+        """ Render plane. A downsampled plane (a pyramid level) stands for a slice of shape
+        (rows, columns), each of its pixels covering factor x factor pixels of the slice.
+        An oblique plane sampled for view (see obliqueView) covers its area of a plane of shape.
+        """
+        t = time.perf_counter()
+        shape = plane.shape[:2] if shape is None else tuple(shape)
+        self._lastPlane = plane
+        self._lastFactor = factor
+        self._planeShape = shape
+        self._obliqueView = view
+        region = self.renderRegion(shape)
+        self._regionStep = 1 if region is None else region[1]
+        if self._preview:
+            region = self.previewRegion(shape, region)
+            self._previewTimer.start(PREVIEW_IDLE_MS)
+        if view is not None:
+            # already sampled for the view
+            self._planeRegion = None
+        elif region is None and factor == 1:
+            self._planeRegion = None
+        else:
+            if region is None:
+                region = (slice(0, shape[0], 1), slice(0, shape[1], 1)), 1
+            (rows, cols), step = region
+            step = max(step//factor, 1)
+            self._planeRegion = (slice(rows.start//factor, -(-rows.stop//factor), step),
+                                 slice(cols.start//factor, -(-cols.stop//factor), step))
+        plane = self.cropPlane(plane)
+        data = self.windowPlane(plane)
+        t = self.markStage('window', t)
+        data = self.colormapPlane(data)
+        t = self.markStage('colormap', t)
+        qimage = self.buildQImage(data)
+        t = self.markStage('qimage', t)
+#        qimage = qimage.mirrored(self._flipX, self._flipY)
+        rotate = QTransform()
+        rotate.rotate(self._rotateAngle)
+        qimg = qimage.transformed(rotate)
+        t = self.markStage('rotate', t)
+        self._displayImage = qimg if qimg.format() == QImage.Format_Indexed8 else None
+        if self._planeRegion is None and view is None:
+            self._imageRegion = None
+        else:
+            transform = self.planeTransform(shape)
+            if view is None:
+                rows, cols = self._planeRegion
+                covered = QRectF(cols.start*factor, rows.start*factor,
+                                 plane.shape[1]*cols.step*factor, plane.shape[0]*rows.step*factor)
+            else:
+                top, bottom, left, right = view[0]
+                covered = QRectF(left, top, right - left, bottom - top)
+            self._imageRegion = transform.mapRect(covered)
+            full = transform.mapRect(QRectF(0, 0, shape[1], shape[0]))
+            if self.sceneRect() != full:
+                self.setSceneRect(full)
+                self.updateViewer()
+        self.setImage(qimg, self._imageRegion)
+        self.markStage('pixmap', t)
+        if self._showHUD:
+            self.viewport().update()
+
+    # -------------------------------------------------
+    # Viewport resolution rendering
+    # -------------------------------------------------
+    def planeTransform(self, shape):
+        """ QTransform from the pixels of a plane of shape (rows, columns) to the scene.
+        """
+        rotate = QTransform()
+        rotate.rotate(self._rotateAngle)
+        return QImage.trueMatrix(rotate, shape[1], shape[0])
+
+    def renderRegion(self, shape):
+        """ Returns the (rows, columns) slices of a plane of shape covering the visible scene
+        plus REGION_MARGIN, stepping over the pixels finer than the viewport, and the step.
+        Returns None to render the whole plane: hidden viewers, rotations other than
+        multiples of 90 degrees, or a view not yet fitted to this plane.
+        """
+        if not (self.REGION_RENDERING and self.isVisible()) or self._rotateAngle % 90 != 0:
+            return None
+        transform = self.planeTransform(shape)
+        full = transform.mapRect(QRectF(0, 0, shape[1], shape[0]))
+        if self.sceneRect() != full:
+            return None
+        view = self.mapToScene(self.viewport().rect()).boundingRect()
+        visible = view.intersected(full)
+        if visible.isEmpty():
+            return None
+
+        # scene pixels per device pixel, zoomed out this is above 1. Taken from the whole
+        # viewport, the letterbox around a plane of another aspect ratio is not content.
+        pixels = self.devicePixelRatioF()
+        density = min(view.width()/max(self.viewport().width()*pixels, 1),
+                      view.height()/max(self.viewport().height()*pixels, 1))
+        step = max(int(density), 1)
+        margin = REGION_MARGIN*max(visible.width(), visible.height())
+        area = transform.inverted()[0].mapRect(visible.adjusted(-margin, -margin, margin, margin))
+
+        # start on a multiple of step, so the samples stay the same while panning
+        r0 = max(int(area.top()), 0)//step*step
+        c0 = max(int(area.left()), 0)//step*step
+        r1 = min(int(math.ceil(area.bottom())), shape[0])
+        c1 = min(int(math.ceil(area.right())), shape[1])
+        if step == 1 and (r0, c0, r1, c1) == (0, 0, shape[0], shape[1]):
+            return None
+        return (slice(r0, r1, step), slice(c0, c1, step)), step
+
+    def previewRegion(self, shape, region):
+        """ region (see renderRegion) of a plane of shape with its step raised so that it
+        has at most PREVIEW_PIXELS samples.
+        """
+        (rows, cols), step = region or ((slice(0, shape[0]), slice(0, shape[1])), 1)
+        samples = len(range(rows.start, rows.stop, step))*len(range(cols.start, cols.stop, step))
+        extra = int(math.ceil(math.sqrt(samples/float(PREVIEW_PIXELS))))
+        if extra <= 1:
+            return region
+        step *= extra
+        return (slice(rows.start, rows.stop, step), slice(cols.start, cols.stop, step)), step
+
+    def setPreview(self, value):
+        """ While on, planes are rendered with at most PREVIEW_PIXELS samples, for quick updates
+        during slider drags, and in full once nothing changed for PREVIEW_IDLE_MS.
+        Turning it off renders the current plane in full.
+        """
+        wasPreview = self._preview
+        self._preview = bool(value)
+        if wasPreview and not self._preview:
+            self._previewTimer.stop()
+            if self._lastPlane is not None:
+                self.refreshPlane()
+
+    def isPreview(self):
+        return self._preview
+
+    def previewIdle(self):
+        if self._preview and self._lastPlane is not None:
+            self._preview = False
+            self.refreshPlane()
+            self._preview = True
+
+    def cropPlane(self, data):
+        """ The part of a plane (or of a plane shaped array) rendered for the current view.
+        """
+        if self._planeRegion is None:
+            return data
+        return data[self._planeRegion]
+
+    def needsRefresh(self):
+        """ True when the rendered part of the last plane no longer matches the view.
+        """
+        if self._lastPlane is None or not self.hasImage():
+            return False
+        if self._obliqueView is not None:
+            # sampled again when the sample density changes or the view leaves the sampled area
+            area, size = self.obliqueView(self._planeShape)
+            lastArea, lastSize = self._obliqueView
+            if size[0]/(area[1] - area[0]) != lastSize[0]/(lastArea[1] - lastArea[0]):
+                return True
+            visible = self.mapToScene(self.viewport().rect()).boundingRect().intersected(self.sceneRect())
+            return not self._imageRegion.contains(visible)
+        region = self.renderRegion(self._planeShape)
+        if (1 if region is None else region[1]) != self._regionStep:
+            return True
+        if region is None:
+            # a decimated preview is rendered in full by the preview timer
+            return self._planeRegion is not None and self._lastFactor == 1 and not self._preview
+        if self._imageRegion is None:
+            return False
+        visible = self.mapToScene(self.viewport().rect()).boundingRect().intersected(self.sceneRect())
+        return not self._imageRegion.contains(visible)
+
+    def refreshRegion(self):
+        self._refreshPending = False
+        if self.needsRefresh():
+            self.refreshPlane()
+
+    def refreshPlane(self):
+        """ Render the last plane again for the current view.
+        """
+        if self._obliqueView is not None:
+            # an oblique plane is sampled for the view it was shown in
+            self.setSlice(self._curSlice)
+            return
+        self.displayPlane(self._lastPlane, self._lastFactor, self._planeShape)
+
+    # -------------------------------------------------
+    # Render profiling
+    # -------------------------------------------------
+    def setProfiling(self, value):
+        """ Time each render stage with a renderProfiler.RenderProfiler, see getRenderStats.
+        """
+        if value and self._profiler is None:
+            self._profiler = renderProfiler.RenderProfiler()
+        elif not value:
+            self._profiler = None
+
+    def isProfiling(self):
+        return self._profiler is not None
+
+    def markStage(self, stage, t0):
+        """ Record the time since t0 (time.perf_counter) for a render stage when profiling.
+        Returns the current time.
+        """
+        if self._profiler is None:
+            return t0
+        return self._profiler.mark(stage, t0)
+
+    def getRenderStats(self):
+        """ Returns {stage: stats} of the rolling render stage timings, empty when not profiling.
+        """
+        if self._profiler is None:
+            return {}
+        return self._profiler.getStats()
+
+    def resetRenderStats(self):
+        if self._profiler is not None:
+            self._profiler.reset()
+
+    def setShowHUD(self, value):
+        """ Overlay the render stage timings on the viewer, turns profiling on.
+        """
+        self._showHUD = bool(value)
+        if self._showHUD:
+            self.setProfiling(True)
+        self.viewport().update()
+
+    # -------------------------------------------------
+    # Hover readout
+    # -------------------------------------------------
+    def physicalAffine(self):
+        """ The 4x4 matrix from voxel indices to physical coordinates, from the pixel spacing
+        when the volume was loaded without geometry.
+        """
+        if self._affine is not None:
+            return self._affine
+        spacing = [1.0]*3 if self._pixelspacing is None else [float(s) for s in self._pixelspacing[:3]]
+        return np.diag(spacing + [1.0])
+
+    def rescaleAffine(self, oldSpacing, newSpacing):
+        """ Keep the physical coordinates of the volume when it is resampled from oldSpacing
+        to newSpacing, call before setting the new pixel spacing.
+        """
+        scale = [float(n)/float(o) for o, n in zip(oldSpacing[:3], newSpacing[:3])]
+        self._affine = self.physicalAffine().dot(np.diag(scale + [1.0]))
+
+    def hoverInfo(self, x, y):
+        """ Readout of the displayed plane at scene position (x, y): the voxel 'index' and its
+        'position' in physical coordinates (both None on oblique planes), the raw 'value'
+        and the windowed 8 bit 'display' value. None outside the plane.
+        """
+        if self._lastPlane is None or self._planeShape is None:
+            return None
+        toPlane, invertible = self.planeTransform(self._planeShape).inverted()
+        point = toPlane.map(QPointF(x, y))
+        row, column = int(math.floor(point.y())), int(math.floor(point.x()))
+        if not (invertible and 0 <= row < self._planeShape[0] and 0 <= column < self._planeShape[1]):
+            return None
+
+        if self._obliqueView is not None:
+            # the sample of the oblique plane covering the pixel center
+            (top, bottom, left, right), size = self._obliqueView
+            sampleRow = int((row + 0.5 - top)*size[0]/(bottom - top))
+            sampleColumn = int((column + 0.5 - left)*size[1]/(right - left))
+            if not (0 <= sampleRow < size[0] and 0 <= sampleColumn < size[1]):
+                return None
+            value = self._lastPlane[sampleRow, sampleColumn]
+        elif self._lastFactor == 1:
+            value = self._lastPlane[row, column]
+        else:
+            # a pyramid level is shown, read the voxel itself
+            value = self.extractPlane(self._imageData, self._imgorientation, self._curSlice)[row, column]
+        value = np.asarray(value)
+        display = None if value.ndim else self.imgProcessing(value.astype(np.float64).reshape(1))[0].item()
+
+        index = position = None
+        if not self.isOblique():
+            index = [0, 0, 0]
+            rowAxis, columnAxis = self.planeAxes(self._imgorientation)
+            index[rowAxis] = row
+            index[columnAxis] = column
+            index[self.sliceAxis(self._imgorientation)] = self._curSlice
+            position = self.physicalAffine().dot(index + [1])[:3].tolist()
+        return {'index': index, 'position': position, 'value': value.tolist(), 'display': display}
+
+    def setHoverReadout(self, value):
+        """ Send hoverChanged with the readout under the mouse (see hoverInfo) at most every
+        HOVER_INTERVAL_MS, also while no mouse button is pressed.
+        """
+        self._hoverReadout = bool(value)
+        self.viewport().setMouseTracking(self._hoverReadout)
+
+    def isHoverReadout(self):
+        return self._hoverReadout
+
+    def hoverUpdate(self):
+        if self._hoverPos is not None:
+            self.hoverChanged.emit(self.hoverInfo(*self._hoverPos))
+
+    def leaveEvent(self, event):
+        self._hoverPos = None
+        self._hoverTimer.stop()
+        if self._hoverReadout:
+            self.hoverChanged.emit(None)
+        QGraphicsView.leaveEvent(self, event)
+
+    # -------------------------------------------------
+    # Loading
+    # -------------------------------------------------
+    def loadNIFTI(self, fileName=""):
+        if len(fileName) and os.path.isfile(fileName):
+            self._imageData, info = volumeCache.loadNIFTI(fileName, self._dtypePolicy)
+
+            self._pixeldims = list(self._imageData.shape)
+            self._pixelspacing = info['spacing']
+            self._affine = volumeAffine(info)
+            self._winlevel = info['stats']['min']
+            self._winwidth = info['stats']['max']-info['stats']['min']
+            self._imgorientation = 1 # x-y
+            self._curSlice = self._pixeldims[self.sliceAxis(1)]//2
+            self.setSlice(self._curSlice)
+
+            self._fileName = fileName
+
+    def loadImageFromFile(self, fileName=""):
+        """ Load an image from file.
+        Without any arguments, loadImageFromFile() will popup a file dialog to choose the image file.
+        With a fileName argument, loadImageFromFile(fileName) will attempt to load the specified image file directly.
+        """
+        fileName, dummy = QFileDialog.getOpenFileName(self, "Open image file.")
+        if len(fileName) and os.path.isfile(fileName):
+            image = QImage(fileName)
+            self._displayImage = None
+            self._lastPlane = None
+            self.setImage(image)
+
+    # -------------------------------------------------
+    # View and mouse interaction
+    # -------------------------------------------------
+    def updateViewer(self):
+        """ Show current zoom (if showing entire image, apply current aspect ratio mode).
+        """
+        if not self.hasImage():
+            return
+        if len(self.zoomStack) and self.sceneRect().contains(self.zoomStack[-1]):
+            self.fitInView(self.zoomStack[-1], Qt.IgnoreAspectRatio)  # Show zoomed rect (ignore aspect ratio).
+        else:
+            self.zoomStack = []  # Clear the zoom stack (in case we got here because of an invalid zoom).
+            self.fitInView(self.sceneRect(), self.aspectRatioMode)  # Show entire image (use current aspect ratio mode).
+
+    def resizeEvent(self, event):
+        """ Maintain current zoom on resize.
+        """
+        self.updateViewer()
+
+    def mousePressEvent(self, event):
+        """ Start mouse pan or zoom mode.
+        """
+        scenePos = self.mapToScene(event.pos())
+        if event.button() == Qt.LeftButton:
+            if self.canPan:
+                self.setDragMode(QGraphicsView.ScrollHandDrag)
+            self.leftMouseButtonPressed.emit(scenePos.x(), scenePos.y())
+        elif event.button() == Qt.RightButton:
+            if self.canZoom:
+                self.setDragMode(QGraphicsView.RubberBandDrag)
+            self.rightMouseButtonPressed.emit(scenePos.x(), scenePos.y())
+        QGraphicsView.mousePressEvent(self, event)
+
+    def mouseReleaseEvent(self, event):
+        """ Stop mouse pan or zoom mode (apply zoom if valid).
+        """
+        QGraphicsView.mouseReleaseEvent(self, event)
+        scenePos = self.mapToScene(event.pos())
+        if event.button() == Qt.LeftButton:
+            self.setDragMode(QGraphicsView.NoDrag)
+            self.leftMouseButtonReleased.emit(scenePos.x(), scenePos.y())
+        elif event.button() == Qt.RightButton:
+            if self.canZoom:
+                viewBBox = self.zoomStack[-1] if len(self.zoomStack) else self.sceneRect()
+                selectionBBox = self.scene.selectionArea().boundingRect().intersected(viewBBox)
+                self.scene.setSelectionArea(QPainterPath())  # Clear current selection area.
+                if selectionBBox.isValid() and (selectionBBox != viewBBox):
+                    self.zoomStack.append(selectionBBox)
+                    self.updateViewer()
+            self.setDragMode(QGraphicsView.NoDrag)
+            self.rightMouseButtonReleased.emit(scenePos.x(), scenePos.y())
+
+    def mouseDoubleClickEvent(self, event):
+        """ Show entire image.
+        """
+        scenePos = self.mapToScene(event.pos())
+        if event.button() == Qt.LeftButton:
+            self.leftMouseButtonDoubleClicked.emit(scenePos.x(), scenePos.y())
+        elif event.button() == Qt.RightButton:
+            if self.canZoom:
+                self.zoomStack = []  # Clear zoom stack.
+                self.updateViewer()
+            self.rightMouseButtonDoubleClicked.emit(scenePos.x(), scenePos.y())
+        QGraphicsView.mouseDoubleClickEvent(self, event)
+
+    def mouseMoveEvent(self, event):
+        scenePos = self.mapToScene(event.pos())
+
+        # record the position for cross drawing
+        self._lineX.setLine(scenePos.x(),self.sceneRect().y(),scenePos.x(), self.sceneRect().y()+ self.sceneRect().height())
+        self._lineY.setLine(self.sceneRect().x(),scenePos.y(),self.sceneRect().x()+ self.sceneRect().width(),scenePos.y())
+
+        # the readout of the last position is sent once the timer runs out
+        if self._hoverReadout:
+            self._hoverPos = (scenePos.x(), scenePos.y())
+            if not self._hoverTimer.isActive():
+                self._hoverTimer.start(HOVER_INTERVAL_MS)
+
+        if self._crossshow:
+            self.scene.invalidate(self.scene.sceneRect())
+        QGraphicsView.mouseMoveEvent(self, event)  # in PyQt5, update() doesn't trigger drawForeground()
+
+    def drawForeground(self, painter, rect):
+        if self._crossshow == True:
+            painter.save()
+            pen = QPen()
+            pen.setWidth(2)
+            pen.setColor(QColor(255,0,0))
+            painter.setPen(pen)
+            painter.drawLine(self._lineX)
+            pen.setColor(QColor(0,255,0))
+            painter.setPen(pen)
+            painter.drawLine(self._lineY)
+            painter.restore()
+        if self._showHUD and self._profiler is not None:
+            # in viewport coordinates, so it stays in the corner when zooming
+            painter.save()
+            painter.resetTransform()
+            self._profiler.drawHUD(painter)
+            painter.restore()
+        QGraphicsView.drawForeground(self, painter, rect)
+
+    def paintEvent(self, event):
+        t0 = time.perf_counter()
+        QGraphicsView.paintEvent(self, event)
+        self.markStage('paint', t0)
+        # after a pan, zoom or resize render the newly visible part once the events are handled
+        if self.REGION_RENDERING and not self._refreshPending and self.needsRefresh():
+            self._refreshPending = True
+            QTimer.singleShot(0, self.refreshRegion)
@@ -0,0 +1,197 @@
+#! /usr/bin/env python3
+"""
+volumeCache.py: local cache of decoded image volumes for the viewers.
+
+Each entry is the decoded volume saved as a raw .npy array, memory mapped on reuse,
+and a .json file with its header, pixel spacing and intensity statistics. File
+entries are keyed by a hash of the source content (size plus its first and last
+megabyte, which for gzip files includes the CRC of the whole stream) and are only
+used while the source size and modification time still match.
+
+"""
+
+import os
+import json
+import hashlib
+
+import numpy as np
+
+__author__ = ""
+__version__ = ""
+
+# Location of the cache, override with the IMAGEVIEWERS_CACHE environment variable.
+CACHE_DIR = os.environ.get('IMAGEVIEWERS_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'ImageViewers'))
+
+# Set IMAGEVIEWERS_NOCACHE to always decode from the source.
+ENABLED = os.environ.get('IMAGEVIEWERS_NOCACHE') is None
+
+SAMPLE_BYTES = 1 << 20
+
+# Types a volume can be loaded as, 'native' keeps the on-disk type.
+DTYPE_POLICIES = ['native', 'float32', 'float64']
+
+
+def entryPaths(key):
+    folder = os.path.join(CACHE_DIR, 'volumes')
+    return os.path.join(folder, key + '.npy'), os.path.join(folder, key + '.json')
+
+
+def fileSignature(fileName):
+    stat = os.stat(fileName)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def sourceKey(fileName, variant=''):
+    """ Returns the cache key of a source file: a hash of its size, first and last megabyte.
+    variant separates entries decoded differently from the same file.
+    """
+    size = os.path.getsize(fileName)
+    digest = hashlib.sha1()
+    digest.update(('%d:%s:' % (size, variant)).encode())
+    with open(fileName, 'rb') as f:
+        digest.update(f.read(SAMPLE_BYTES))
+        if size > SAMPLE_BYTES:
+            f.seek(max(size - SAMPLE_BYTES, SAMPLE_BYTES))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def volumeStats(volume):
+    """ Returns min, max, mean and std of volume, reading it one block of slices at a time.
+    """
+    count = 0
+    total = 0.0
+    totalSq = 0.0
+    vmin = None
+    vmax = None
+    step = max(1, (1 << 24) // max(1, volume[..., 0].size))
+    for start in range(0, volume.shape[-1], step):
+        block = np.asarray(volume[..., start:start+step])
+        bmin = block.min()
+        bmax = block.max()
+        vmin = bmin if vmin is None else min(vmin, bmin)
+        vmax = bmax if vmax is None else max(vmax, bmax)
+        total += block.sum(dtype=np.float64)
+        totalSq += np.square(block, dtype=np.float64).sum()
+        count += block.size
+    mean = total / count
+    return {'min': vmin.item(), 'max': vmax.item(), 'mean': mean,
+            'std': float(np.sqrt(max(totalSq / count - mean*mean, 0.0)))}
+
+
+def openEntry(key, signature):
+    """ Returns (volume, info) for a valid cache entry, or None.
+    The volume is mapped copy-on-write so viewers may draw into it.
+    """
+    if not ENABLED:
+        return None
+    volumeFile, infoFile = entryPaths(key)
+    if not (os.path.isfile(volumeFile) and os.path.isfile(infoFile)):
+        return None
+    with open(infoFile) as f:
+        info = json.load(f)
+    if info.get('signature') != signature:
+        return None
+    return np.load(volumeFile, mmap_mode='c'), info
+
+
+def createEntry(key, shape, dtype, fortranOrder=False):
+    """ Returns a writable memory mapped array to decode a volume straight into the cache.
+    Finish it with commitEntry.
+    """
+    volumeFile, infoFile = entryPaths(key)
+    os.makedirs(os.path.dirname(volumeFile), exist_ok=True)
+    return np.lib.format.open_memmap(volumeFile + '.part', mode='w+', dtype=dtype,
+                                     shape=tuple(shape), fortran_order=fortranOrder)
+
+
+def commitEntry(key, volume, info):
+    """ Publish an entry made with createEntry. Returns the mapped volume and its info with statistics.
+    """
+    volumeFile, infoFile = entryPaths(key)
+    info = dict(info)
+    info['stats'] = volumeStats(volume)
+    volume.flush()
+    del volume
+    os.replace(volumeFile + '.part', volumeFile)
+    with open(infoFile, 'w') as f:
+        json.dump(info, f)
+    return np.load(volumeFile, mmap_mode='c'), info
+
+
+def storeEntry(key, volume, info):
+    """ Save an already decoded volume. Returns the mapped volume and its info with statistics.
+    """
+    if not ENABLED:
+        info = dict(info)
+        info['stats'] = volumeStats(volume)
+        return volume, info
+    entry = createEntry(key, volume.shape, volume.dtype, np.isfortran(volume))
+    entry[...] = volume
+    return commitEntry(key, entry, info)
+
+
+def loadFile(fileName, decode, variant=''):
+    """ Returns (volume, info) for fileName, decoding it with decode(fileName) on a cache miss.
+    decode returns the volume and an info dict holding at least its 'spacing'.
+    """
+    key = sourceKey(fileName, variant)
+    signature = fileSignature(fileName)
+    cached = openEntry(key, signature)
+    if cached is not None:
+        return cached
+
+    volume, info = decode(fileName)
+    info = dict(info)
+    info['source'] = os.path.abspath(fileName)
+    info['signature'] = signature
+    return storeEntry(key, volume, info)
+
+
+def checkDtypePolicy(dtypePolicy):
+    if dtypePolicy not in DTYPE_POLICIES:
+        raise RuntimeError("Unknown dtype policy %s, use one of %s" % (dtypePolicy, DTYPE_POLICIES))
+
+
+def applyDtypePolicy(volume, dtypePolicy='native'):
+    """ Returns volume in the type asked for by dtypePolicy, one of DTYPE_POLICIES.
+    'native' keeps the type it was decoded in.
+    """
+    checkDtypePolicy(dtypePolicy)
+    if dtypePolicy == 'native':
+        return volume
+    return np.asarray(volume).astype(dtypePolicy, copy=False)
+
+
+def readNIFTI(fileName, dtypePolicy='native'):
+    """ Decode a NIfTI file. With the 'native' policy the on-disk type is kept (int16 stays int16)
+    unless the header scales the data, in which case nibabel promotes it to float.
+    """
+    import nibabel as nib   # only needed on a cache miss
+
+    checkDtypePolicy(dtypePolicy)
+    img = nib.load(fileName)
+    info = {'spacing': [float(z) for z in img.header.get_zooms()],
+            'affine': img.affine.tolist()}
+    if dtypePolicy == 'native':
+        return np.asanyarray(img.dataobj), info
+    return img.get_fdata(dtype=dtypePolicy), info
+
+
+def readMAT(fileName, varName, dtypePolicy='native'):
+    import scipy.io
+
+    img = applyDtypePolicy(scipy.io.loadmat(fileName)[varName], dtypePolicy)
+    return img, {'spacing': [1.0]*img.ndim}
+
+
+def loadNIFTI(fileName, dtypePolicy='native'):
+    """ Returns (volume, info) of a NIfTI file through the cache.
+    """
+    return loadFile(fileName, lambda f: readNIFTI(f, dtypePolicy), dtypePolicy)
+
+
+def loadMAT(fileName, varName, dtypePolicy='native'):
+    """ Returns (volume, info) of variable varName of a MAT file through the cache.
+    """
+    return loadFile(fileName, lambda f: readMAT(f, varName, dtypePolicy), varName + ':' + dtypePolicy)